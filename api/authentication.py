@@ -0,0 +1,31 @@
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+from api import tokens
+
+
+class SignedTokenAuthentication(BaseAuthentication):
+    """``Authorization: Bearer <access token>``, verified without a database hit (see api.tokens)."""
+    keyword = b'bearer'
+
+    def authenticate(self, request):
+        header = get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword:
+            return None
+        if len(header) != 2:
+            raise AuthenticationFailed("Invalid Authorization header.")
+
+        try:
+            payload = tokens.verify(header[1].decode(), tokens.ACCESS)
+        except UnicodeError:
+            raise AuthenticationFailed("Invalid token.")
+        except tokens.InvalidToken as exc:
+            raise AuthenticationFailed(str(exc))
+
+        user = tokens.user_for(payload)
+        if user is None:
+            raise AuthenticationFailed("Invalid token.")
+        return user, payload
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="api"'
@@ -0,0 +1,119 @@
+from django.core.paginator import InvalidPage
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from goodreads.pagination import CursorPaginator, InvalidCursor, LookaheadPaginator, get_page_size, wants_count
+
+
+class ReviewCursorPagination(BasePagination):
+    """Keyset pagination over (created_at, id); responses carry no count."""
+    cursor_query_param = 'cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = CursorPaginator(queryset, get_page_size(request, request.query_params))
+
+        try:
+            self.page = paginator.get_page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound("Invalid cursor")
+
+        return list(self.page)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = CursorPaginator(queryset, get_page_size(request, request.query_params))
+
+        try:
+            self.page = await paginator.aget_page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound("Invalid cursor")
+
+        return list(self.page)
+
+    def get_next_link(self):
+        if not self.page.has_next():
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.page.next_cursor)
+
+    def get_previous_link(self):
+        if not self.page.has_previous():
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.page.previous_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class BoundedPageNumberPagination(PageNumberPagination):
+    """
+    Page-number pagination under the endpoint's pagination policy: bounded
+    ``?page_size=``, and no ``count`` (nor COUNT(*)) where the policy or the
+    client's ``?count=false`` turns it off.
+    """
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        return get_page_size(request, request.query_params, self.page_size_query_param)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.counted = wants_count(request, request.query_params)
+        if self.counted:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        paginator = LookaheadPaginator(queryset, self.get_page_size(request))
+        self.page = paginator.get_page(request.query_params.get(self.page_query_param))
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        if self.counted:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class AsyncPageNumberPagination(BoundedPageNumberPagination):
+    """BoundedPageNumberPagination whose count and page fetch go through the async ORM."""
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.counted = wants_count(request, request.query_params)
+        if not self.counted:
+            paginator = LookaheadPaginator(queryset, self.get_page_size(request))
+            self.page = await paginator.aget_page(request.query_params.get(self.page_query_param))
+            return list(self.page)
+
+        paginator = self.django_paginator_class(queryset, self.get_page_size(request))
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        self.page.object_list = [obj async for obj in self.page.object_list]
+        return list(self.page)
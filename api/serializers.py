@@ -1,22 +1,115 @@
 from rest_framework import serializers
 
-from books.models import Book, BookReview
+from books.models import Book, BookPopularity, BookReview, BookSimilarity
+from books.rankings import current_score
+from goodreads.images import variant_images
+from goodreads.metrics import timed
 from users.models import CustomUser
 
 
-class BookSerializer(serializers.ModelSerializer):
+class TimedSerializerMixin:
+    """Count the top-level ``to_representation`` calls as serializer time in request metrics."""
+
+    def to_representation(self, instance):
+        with timed('serializer'):
+            return super().to_representation(instance)
+
+
+class ResponsiveImageField(serializers.Field):
+    """Read-only original URL plus the generated WebP/JPEG variants, smallest first."""
+
+    def __init__(self, image_field, variants_field, **kwargs):
+        self.image_field = image_field
+        self.variants_field = variants_field
+        kwargs.setdefault('source', '*')
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, instance):
+        field = getattr(instance, self.image_field)
+        return image_representation(field, getattr(instance, self.variants_field), self.context.get('request'))
+
+
+def image_representation(field, variants, request=None):
+    absolute = request.build_absolute_uri if request is not None else (lambda url: url)
+    return {
+        'url': absolute(field.url) if field else None,
+        'variants': [
+            {**image, 'webp': absolute(image['webp']), 'jpeg': absolute(image['jpeg'])}
+            for image in variant_images(field, variants)
+        ],
+    }
+
+
+class BookSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    cover = ResponsiveImageField('cover_picture', 'cover_variants')
+
     class Meta:
         model = Book
-        fields = ('id', 'title', 'description', 'isbn')
+        fields = ('id', 'title', 'description', 'isbn', 'cover')
+
+
+class BookSearchSerializer(BookSerializer):
+    """A search result with its authors; the books must have gone through ``books.authors.load_authors``."""
+    authors = serializers.SerializerMethodField()
+
+    class Meta(BookSerializer.Meta):
+        fields = (*BookSerializer.Meta.fields, 'authors')
+
+    def get_authors(self, book):
+        return [{'id': author.id, 'name': author.full_name()} for author in book.author_list]
+
+
+class SimilarBookSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(source='similar_book.id')
+    title = serializers.CharField(source='similar_book.title')
+    cover = ResponsiveImageField('cover_picture', 'cover_variants', source='similar_book')
+    average_rating = serializers.FloatField(source='similar_book.average_rating')
+    review_count = serializers.IntegerField(source='similar_book.review_count')
+
+    class Meta:
+        model = BookSimilarity
+        fields = ('id', 'title', 'cover', 'average_rating', 'review_count', 'score')
+
+
+class RankedBookSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """A BookPopularity row; ``context['field']`` names the ranking's score column."""
+    id = serializers.IntegerField(source='book.id')
+    title = serializers.CharField(source='book.title')
+    cover = ResponsiveImageField('cover_picture', 'cover_variants', source='book')
+    average_rating = serializers.FloatField(source='book.average_rating')
+    review_count = serializers.IntegerField(source='book.review_count')
+    score = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BookPopularity
+        fields = ('id', 'title', 'cover', 'average_rating', 'review_count', 'score')
 
+    def get_score(self, popularity):
+        field = self.context['field']
+        return round(current_score(field, getattr(popularity, field), self.context.get('now')), 4)
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    picture = ResponsiveImageField('profile_picture', 'profile_picture_variants')
 
-class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUser
-        fields = ('id', 'username', 'first_name', 'last_name', 'email')
+        fields = ('id', 'username', 'first_name', 'last_name', 'email', 'picture')
+
 
+class UserActivitySerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    picture = ResponsiveImageField('profile_picture', 'profile_picture_variants')
+
+    class Meta:
+        model = CustomUser
+        fields = (
+            'id', 'username', 'first_name', 'last_name', 'picture',
+            'review_count', 'average_stars_given', 'last_active_at',
+        )
 
-class BookReviewSerializer(serializers.ModelSerializer):
+
+class BookReviewSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     book = BookSerializer(read_only=True)
     user_id = serializers.IntegerField(write_only=True)
@@ -26,3 +119,116 @@ class BookReviewSerializer(serializers.ModelSerializer):
         model = BookReview
         fields = ('id', 'stars_given', 'comment', 'book', 'user', 'book_id', 'user_id')
 
+
+class BookReviewRowSerializer:
+    """
+    Read-only fast path for review lists: the same output as
+    BookReviewSerializer, built from ``.values()`` rows with no model
+    instances or field objects, and each book and user dict built once per
+    page however many of its reviews are on it.
+
+    ``fields`` (e.g. ``id,stars_given,book.title``) limits the output; with it,
+    a bare ``book`` or ``user`` is just the related id unless also named in
+    ``expand``. Only the columns (and joins) the output needs are selected.
+    """
+    review_fields = ('id', 'stars_given', 'comment')
+    related_fields = {
+        'book': ('id', 'title', 'description', 'isbn', 'cover'),
+        'user': ('id', 'username', 'first_name', 'last_name', 'email', 'picture'),
+    }
+    image_fields = {
+        ('book', 'cover'): (Book, 'cover_picture', 'cover_variants'),
+        ('user', 'picture'): (CustomUser, 'profile_picture', 'profile_picture_variants'),
+    }
+
+    def __init__(self, fields=None, expand=None, context=None):
+        self.context = context or {}
+        self.fields, self.related = self.parse(fields, expand)
+        self._related_cache = {relation: {} for relation in self.related}
+
+    @classmethod
+    def from_request(cls, request):
+        params = request.query_params
+        return cls(params.get('fields'), params.get('expand'))
+
+    def parse(self, fields, expand):
+        expand = {name for name in (expand or '').split(',') if name}
+        unknown = expand - set(self.related_fields)
+        if not fields:
+            if unknown:
+                raise serializers.ValidationError({'expand': [f"Unknown relations: {', '.join(sorted(unknown))}."]})
+            return list(self.review_fields), {relation: list(subfields) for relation, subfields in self.related_fields.items()}
+
+        requested = [name for name in fields.split(',') if name]
+        selected, related = set(), {}
+        for name in requested:
+            relation, _, subfield = name.partition('.')
+            if relation in self.related_fields and (not subfield or subfield in self.related_fields[relation]):
+                subfields = related.setdefault(relation, set())
+                if subfield:
+                    subfields.add(subfield)
+            elif name in self.review_fields:
+                selected.add(name)
+            else:
+                unknown.add(name)
+        if unknown:
+            raise serializers.ValidationError({'fields': [f"Unknown fields: {', '.join(sorted(unknown))}."]})
+
+        for relation in expand:
+            subfields = related.setdefault(relation, set())
+            if not subfields:
+                subfields.update(self.related_fields[relation])
+
+        return (
+            [name for name in self.review_fields if name in selected],
+            {
+                relation: [name for name in self.related_fields[relation] if name in related[relation]] or None
+                for relation in self.related_fields if relation in related
+            },
+        )
+
+    def columns(self):
+        # id and created_at are always fetched for the cursor paginator.
+        columns = {'id', 'created_at', *self.fields}
+        for relation, subfields in self.related.items():
+            columns.add(f'{relation}_id')
+            for subfield in subfields or ():
+                image = self.image_fields.get((relation, subfield))
+                if image:
+                    columns.update(f'{relation}__{name}' for name in image[1:])
+                elif subfield != 'id':
+                    columns.add(f'{relation}__{subfield}')
+        return sorted(columns)
+
+    def values(self, queryset):
+        return queryset.values(*self.columns())
+
+    def related_value(self, row, relation, subfield):
+        if subfield == 'id':
+            return row[f'{relation}_id']
+        image = self.image_fields.get((relation, subfield))
+        if image is None:
+            return row[f'{relation}__{subfield}']
+
+        model, image_field, variants_field = image
+        field = model._meta.get_field(image_field)
+        file = field.attr_class(None, field, row[f'{relation}__{image_field}'])
+        return image_representation(file, row[f'{relation}__{variants_field}'], self.context.get('request'))
+
+    def to_representation(self, row):
+        data = {name: row[name] for name in self.fields}
+        for relation, subfields in self.related.items():
+            related_id = row[f'{relation}_id']
+            if subfields is None:
+                data[relation] = related_id
+                continue
+
+            cache = self._related_cache[relation]
+            if related_id not in cache:
+                cache[related_id] = {subfield: self.related_value(row, relation, subfield) for subfield in subfields}
+            data[relation] = cache[related_id]
+        return data
+
+    def serialize(self, rows):
+        with timed('serializer'):
+            return [self.to_representation(row) for row in rows]
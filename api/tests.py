@@ -1,10 +1,21 @@
+import json
+from datetime import timedelta
+from unittest import skipUnless
+
+from django.conf import settings
+from django.test import override_settings
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APITestCase
 
 from django.shortcuts import reverse
 
+from api import tokens
+from api.serializers import BookReviewRowSerializer, BookReviewSerializer
+from goodreads.testing import QueryCountMixin
 from users.models import CustomUser
-from books.models import Book, BookReview
+from books.events import drain
+from books.models import Author, Book, BookAuthor, BookPopularity, BookReview, BookSimilarity, Follow
 
 
 class BookReviewAPITestCase(APITestCase):
@@ -32,6 +43,22 @@ class BookReviewAPITestCase(APITestCase):
         self.assertEqual(response.data['user']['first_name'], "sayitkamol")
         self.assertEqual(response.data['user']['username'], "sayitkamol")
 
+    def test_book_review_detail_images(self):
+        book = Book.objects.create(title="book1", description="description1", isbn="12334543")
+        br = BookReview.objects.create(book=book, user=self.user, stars_given=4, comment="very good")
+        Book.objects.filter(pk=book.pk).update(cover_variants={
+            'source': book.cover_picture.name, 'hash': 'abc',
+            'images': [{'width': 200, 'height': 300, 'webp': 'v/200x300.webp', 'jpeg': 'v/200x300.jpg'}],
+        })
+
+        response = self.client.get(reverse("api:review-detail", kwargs={"id": br.id}))
+
+        self.assertEqual(response.data['book']['cover'], {
+            'url': '/media/default_cover.jpg',
+            'variants': [{'width': 200, 'height': 300, 'webp': '/media/v/200x300.webp', 'jpeg': '/media/v/200x300.jpg'}],
+        })
+        self.assertEqual(response.data['user']['picture'], {'url': '/media/default.jpg', 'variants': []})
+
     def test_book_review_list(self):
         user_two = CustomUser.objects.create(username='jasur', first_name='Jasurbek')
         book = Book.objects.create(title="book1", description="description1", isbn="12334543")
@@ -52,6 +79,30 @@ class BookReviewAPITestCase(APITestCase):
         self.assertEqual(response.data['results'][0]['comment'], br_two.comment)
         self.assertEqual(response.data['results'][1]['comment'], br.comment)
 
+    def test_book_review_list_cursor(self):
+        user_two = CustomUser.objects.create(username='jasur', first_name='Jasurbek')
+        book = Book.objects.create(title="book1", description="description1", isbn="12334543")
+        br = BookReview.objects.create(book=book, user=self.user, stars_given=4, comment="very good")
+        br_two = BookReview.objects.create(book=book, user=user_two, stars_given=2, comment="Not good")
+        br_three = BookReview.objects.create(book=book, user=user_two, stars_given=5, comment="Great")
+
+        response = self.client.get(reverse("api:review-list") + "?cursor=&page_size=2")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn("count", response.data)
+        self.assertIsNone(response.data['previous'])
+        self.assertEqual([r['id'] for r in response.data['results']], [br_three.id, br_two.id])
+
+        response = self.client.get(response.data['next'])
+
+        self.assertEqual([r['id'] for r in response.data['results']], [br.id])
+        self.assertIsNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+
+        response = self.client.get(reverse("api:review-list") + "?cursor=garbage")
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
     def test_delete_review(self):
         book = Book.objects.create(title="book1", description="description1", isbn="12334543")
         br = BookReview.objects.create(book=book, user=self.user, stars_given=5, comment="very good")
@@ -99,3 +150,467 @@ class BookReviewAPITestCase(APITestCase):
         self.assertEqual(response.data['stars_given'], 4)
         self.assertEqual(response.data['comment'], "very good")
         self.assertEqual(response.data['user']['id'], br.user.id)
+
+    def test_book_search(self):
+        book = Book.objects.create(title="Mehrobdan chayon", description="novel", isbn="12334543")
+        Book.objects.create(title="O'tgan kunlar", description="novel", isbn="5555555")
+
+        response = self.client.get(reverse('api:book-search') + "?q=chayon")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['id'], book.id)
+        self.assertEqual(response.data['results'][0]['title'], book.title)
+        self.assertEqual(response.data['results'][0]['authors'], [])
+
+    def test_write_paths_update_book_ratings(self):
+        book = Book.objects.create(title="book1", description="description1", isbn="12334543")
+        other = Book.objects.create(title="book2", description="description2", isbn="5555555")
+
+        response = self.client.post(reverse('api:review-list'), data={
+            "stars_given": 4, "comment": "very good", "user_id": self.user.id, "book_id": book.id
+        })
+        review_id = response.data['id']
+        drain()
+        book.refresh_from_db()
+        self.assertEqual((book.review_count, book.stars_total, book.stars_4), (1, 4, 1))
+
+        self.client.patch(reverse('api:review-detail', kwargs={'id': review_id}), data={"stars_given": 2})
+        drain()
+        book.refresh_from_db()
+        self.assertEqual((book.review_count, book.stars_total, book.stars_4, book.stars_2), (1, 2, 0, 1))
+
+        self.client.put(reverse('api:review-detail', kwargs={'id': review_id}), data={
+            "stars_given": 5, "comment": "moved", "user_id": self.user.id, "book_id": other.id
+        })
+        drain()
+        book.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((book.review_count, book.stars_total, book.average_rating), (0, 0, 0.0))
+        self.assertEqual((other.review_count, other.stars_total, other.stars_5), (1, 5, 1))
+
+        self.client.delete(reverse('api:review-detail', kwargs={'id': review_id}))
+        drain()
+        other.refresh_from_db()
+        self.assertEqual((other.review_count, other.stars_total, other.stars_5), (0, 0, 0))
+
+    def test_cache_stats_requires_staff(self):
+        response = self.client.get(reverse('api:cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+
+        response = self.client.get(reverse('api:cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_db_stats_requires_staff(self):
+        response = self.client.get(reverse('api:db-stats'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.is_staff = True
+        self.user.save()
+
+        response = self.client.get(reverse('api:db-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bulk_import_reviews(self):
+        self.user.is_staff = True
+        self.user.save()
+        book = Book.objects.create(title="book1", description="description1", isbn="12334543")
+
+        body = b"\n".join([
+            json.dumps({"book_id": book.id, "user_id": self.user.id, "stars_given": 5, "comment": "great"}).encode(),
+            b"not json",
+            json.dumps({"book_id": book.id, "user_id": self.user.id, "stars_given": 9, "comment": "too many"}).encode(),
+            json.dumps({"book_id": 0, "user_id": self.user.id, "stars_given": 3, "comment": "no book"}).encode(),
+            b'{"comment": "\xff"}',
+            json.dumps({"book_id": book.id, "user_id": self.user.id, "stars_given": 3, "comment": "fine"}).encode(),
+        ])
+        response = self.client.post(reverse('api:review-bulk') + '?chunk_size=2', data=body,
+                                    content_type='application/x-ndjson')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 4)
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3, 4, 5])
+        self.assertIn('stars_given', response.data['errors'][1]['errors'])
+        self.assertIn('book_id', response.data['errors'][2]['errors'])
+        self.assertIn("Invalid UTF-8", response.data['errors'][3]['errors']['__all__'][0])
+
+        drain()
+        book.refresh_from_db()
+        self.assertEqual((book.review_count, book.stars_total), (2, 8))
+
+        body = f"book_id,user_id,stars_given,comment\n{book.id},{self.user.id},4,from csv\n"
+        response = self.client.post(reverse('api:review-bulk'), data=body, content_type='text/csv')
+        self.assertEqual(response.data['created'], 1)
+
+        body = f"book_id,user_id,stars_given,comment\n{book.id},{self.user.id},4,\xff\n".encode('latin-1')
+        response = self.client.post(reverse('api:review-bulk'), data=body, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([error['row'] for error in response.data['errors']], [1])
+        self.assertIn("Invalid UTF-8", response.data['errors'][0]['errors']['__all__'][0])
+
+        response = self.client.post(reverse('api:review-bulk'), format='json', data=[
+            {"book_id": book.id, "user_id": self.user.id, "stars_given": 1, "comment": "json"},
+        ])
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(BookReview.objects.filter(book=book).count(), 4)
+
+    def test_bulk_import_requires_staff(self):
+        response = self.client.post(reverse('api:review-bulk'), format='json', data=[])
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_streams_rows(self):
+        self.user.is_staff = True
+        self.user.save()
+        book = Book.objects.create(title="book1", description="description1", isbn="12334543")
+        old = BookReview.objects.create(book=book, user=self.user, stars_given=4, comment="old",
+                                        created_at=timezone.now() - timedelta(days=2))
+        new = BookReview.objects.create(book=book, user=self.user, stars_given=5, comment="new")
+
+        response = self.client.get(reverse('api:export', kwargs={'name': 'reviews', 'fmt': 'ndjson'}))
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [old.id, new.id])
+        self.assertEqual(rows[0]['stars_given'], 4)
+
+        since = (timezone.now() - timedelta(days=1)).isoformat()
+        response = self.client.get(reverse('api:export', kwargs={'name': 'reviews', 'fmt': 'ndjson'}),
+                                   data={'since': since})
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [new.id])
+
+        for since in ('yesterday', '2024-13-45T00:00'):
+            response = self.client.get(reverse('api:export', kwargs={'name': 'reviews', 'fmt': 'ndjson'}),
+                                       data={'since': since})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get(reverse('api:export', kwargs={'name': 'books', 'fmt': 'csv'}))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,title,description,isbn,cover_picture,created_at')
+        self.assertTrue(lines[1].startswith(f'{book.id},book1,description1,12334543'))
+
+    def test_export_requires_staff(self):
+        response = self.client.get(reverse('api:export', kwargs={'name': 'reviews', 'fmt': 'csv'}))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class BookReviewRowSerializerTestCase(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='sayitkamol', first_name='sayitkamol')
+        self.client.force_login(self.user)
+        self.book = Book.objects.create(title="book1", description="description1", isbn="12334543")
+        Book.objects.filter(pk=self.book.pk).update(cover_variants={
+            'source': self.book.cover_picture.name, 'hash': 'abc',
+            'images': [{'width': 200, 'height': 300, 'webp': 'v/200x300.webp', 'jpeg': 'v/200x300.jpg'}],
+        })
+        for stars in range(1, 4):
+            BookReview.objects.create(book=self.book, user=self.user, stars_given=stars, comment=f"comment {stars}")
+
+    def test_matches_model_serializer(self):
+        reviews = BookReview.objects.order_by('-created_at', '-id')
+        serializer = BookReviewRowSerializer()
+        rows = serializer.serialize(serializer.values(reviews))
+
+        self.assertEqual(rows, BookReviewSerializer(reviews.for_api(), many=True).data)
+        # One dict per book, shared by all of its reviews on the page.
+        self.assertIs(rows[0]['book'], rows[1]['book'])
+
+    def test_sparse_fields(self):
+        response = self.client.get(reverse("api:review-list"), {'fields': 'id,stars_given,book.title'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0], {
+            'id': response.data['results'][0]['id'], 'stars_given': 3, 'book': {'title': 'book1'},
+        })
+
+    def test_expand(self):
+        response = self.client.get(reverse("api:review-list"), {'fields': 'id,book,user', 'expand': 'user'})
+
+        result = response.data['results'][0]
+        self.assertEqual(result['book'], self.book.id)
+        self.assertEqual(result['user']['username'], 'sayitkamol')
+        self.assertEqual(sorted(result['user']), ['email', 'first_name', 'id', 'last_name', 'picture', 'username'])
+
+    def test_sparse_columns(self):
+        serializer = BookReviewRowSerializer('id,book', None)
+        self.assertEqual(serializer.columns(), ['book_id', 'created_at', 'id'])
+
+    def test_sparse_cursor_page(self):
+        response = self.client.get(reverse("api:review-list"), {'fields': 'stars_given', 'cursor': '', 'page_size': 2})
+
+        self.assertEqual([result['stars_given'] for result in response.data['results']], [3, 2])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results'], [{'stars_given': 1}])
+
+    def test_unknown_fields(self):
+        response = self.client.get(reverse("api:review-list"), {'fields': 'id,book.secret'})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse("api:review-list"), {'expand': 'author'})
+        self.assertEqual(response.status_code, 400)
+
+
+class BookReviewAPIQueryCountTestCase(QueryCountMixin, APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='sayitkamol', first_name='sayitkamol')
+        self.client.force_login(self.user)
+
+        for i in range(5):
+            book = Book.objects.create(title=f"book{i}", description="description", isbn=f"99{i}")
+            user = CustomUser.objects.create(username=f'user{i}')
+            self.review = BookReview.objects.create(book=book, user=user, stars_given=3, comment="good")
+
+    def test_review_list_queries(self):
+        self.assertEndpointQueries(3, reverse("api:review-list"))
+
+    def test_review_list_cursor_queries(self):
+        self.assertEndpointQueries(2, reverse("api:review-list") + "?cursor=")
+
+    def test_review_detail_queries(self):
+        self.assertEndpointQueries(3, reverse("api:review-detail", kwargs={"id": self.review.id}))
+
+    def test_review_detail_not_modified(self):
+        url = reverse("api:review-detail", kwargs={"id": self.review.id})
+        response = self.client.get(url)
+
+        # The session and user are cached by now; only the validators are read.
+        not_modified = self.assertEndpointQueries(1, url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        not_modified = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.review.book.title = "renamed"
+        self.review.book.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, status.HTTP_200_OK)
+
+    def test_review_detail_missing(self):
+        response = self.client.get(reverse("api:review-detail", kwargs={"id": 0}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class UserActivityAPITestCase(QueryCountMixin, APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='sayitkamol', first_name='sayitkamol')
+        self.client.force_login(self.user)
+        self.reader = CustomUser.objects.create(username='jasur', first_name='Jasurbek')
+
+        now = timezone.now()
+        for i in range(5):
+            book = Book.objects.create(title=f"book{i}", description="description", isbn=f"99{i}")
+            BookReview.objects.create(book=book, user=self.reader, stars_given=i + 1, comment=f"review{i}",
+                                      created_at=now - timedelta(minutes=i))
+        BookReview.objects.create(book=book, user=self.user, stars_given=5, comment="mine")
+        drain()
+
+    def test_user_activity(self):
+        response = self.assertEndpointQueries(2, reverse('api:user-activity', kwargs={'id': self.reader.id}))
+
+        self.assertEqual(response.data['username'], 'jasur')
+        self.assertEqual(response.data['review_count'], 5)
+        self.assertEqual(response.data['average_stars_given'], 3.0)
+        self.assertIsNotNone(response.data['last_active_at'])
+        self.assertNotIn('email', response.data)
+
+    def test_user_reviews_are_cursor_paginated(self):
+        url = reverse('api:user-reviews', kwargs={'id': self.reader.id}) + '?page_size=2'
+
+        response = self.assertEndpointQueries(3, url)
+        self.assertEqual([review['comment'] for review in response.data['results']], ['review0', 'review1'])
+        self.assertIsNone(response.data['previous'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([review['comment'] for review in response.data['results']], ['review2', 'review3'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual([review['comment'] for review in response.data['results']], ['review4'])
+        self.assertIsNone(response.data['next'])
+
+    def test_unknown_user(self):
+        self.assertEqual(self.client.get(reverse('api:user-activity', kwargs={'id': 0})).status_code, 404)
+        self.assertEqual(self.client.get(reverse('api:user-reviews', kwargs={'id': 0})).status_code, 404)
+
+
+class SimilarBooksAPITestCase(QueryCountMixin, APITestCase):
+    def test_similar_books(self):
+        user = CustomUser.objects.create(username='sayitkamol')
+        self.client.force_login(user)
+        book, first, second = [
+            Book.objects.create(title=f"book{i}", description="description", isbn=f"99{i}") for i in range(3)
+        ]
+        BookSimilarity.objects.create(book=book, similar_book=second, score=0.4, rank=1)
+        BookSimilarity.objects.create(book=book, similar_book=first, score=0.9, rank=0)
+
+        response = self.assertEndpointQueries(2, reverse('api:book-similar', kwargs={'id': book.id}))
+
+        self.assertEqual([(item['id'], item['title'], item['score']) for item in response.data['results']],
+                         [(first.id, 'book1', 0.9), (second.id, 'book2', 0.4)])
+        self.assertEqual(response.data['results'][0]['cover']['url'], '/media/default_cover.jpg')
+
+        response = self.client.get(reverse('api:book-similar', kwargs={'id': first.id}))
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get(reverse('api:book-similar', kwargs={'id': 0}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TrendingBooksAPITestCase(QueryCountMixin, APITestCase):
+    def test_trending_books(self):
+        user = CustomUser.objects.create(username='sayitkamol')
+        self.client.force_login(user)
+        first, second = [
+            Book.objects.create(title=f"book{i}", description="description", isbn=f"99{i}") for i in range(2)
+        ]
+        BookPopularity.objects.create(book=first, weekly_score=1.0, monthly_score=2.0, rating_score=3.5)
+        BookPopularity.objects.create(book=second, weekly_score=2.0, monthly_score=1.0, rating_score=4.5)
+
+        response = self.assertEndpointQueries(2, reverse('api:book-trending'))
+        self.assertEqual(response.data['ranking'], 'weekly')
+        self.assertEqual([item['id'] for item in response.data['results']], [second.id, first.id])
+
+        response = self.client.get(reverse('api:book-trending') + '?ranking=top-rated&page_size=1')
+        self.assertEqual([(item['id'], item['score']) for item in response.data['results']], [(second.id, 4.5)])
+
+        response = self.client.get(reverse('api:book-trending') + '?ranking=daily')
+        self.assertEqual(response.status_code, 400)
+
+
+class FollowAPITestCase(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='sayitkamol')
+        self.critic = CustomUser.objects.create(username='critic')
+        self.author = Author.objects.create(first_name='Jane', last_name='Austen', email='jane@example.com', bio='')
+        self.client.force_login(self.user)
+
+    def test_follow_and_unfollow(self):
+        url = reverse('api:user-follow', kwargs={'id': self.critic.id})
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('api:author-follow', kwargs={'id': self.author.id}))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.critic.refresh_from_db()
+        self.assertEqual(self.critic.follower_count, 1)
+        self.assertEqual(Follow.objects.filter(follower=self.user).count(), 2)
+
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT)
+        self.critic.refresh_from_db()
+        self.assertEqual(self.critic.follower_count, 0)
+        self.assertFalse(Follow.objects.filter(user=self.critic).exists())
+
+    def test_invalid_follows(self):
+        response = self.client.post(reverse('api:user-follow', kwargs={'id': self.user.id}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.post(reverse('api:author-follow', kwargs={'id': 0}))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BookSearchAPIQueryCountTestCase(QueryCountMixin, APITestCase):
+    def test_authors_are_loaded_in_one_query(self):
+        self.client.force_login(CustomUser.objects.create(username='sayitkamol'))
+        for i in range(3):
+            book = Book.objects.create(title=f"book{i}", description="novel", isbn=f"99{i}")
+            for j in range(2):
+                author = Author.objects.create(first_name=f"first{i}{j}", last_name="last", email="a@a.com", bio="")
+                BookAuthor.objects.create(book=book, author=author)
+
+        # User, count, page, authors.
+        response = self.assertEndpointQueries(4, reverse('api:book-search'))
+        self.assertEqual(
+            [[author['name'] for author in result['authors']] for result in response.data['results']],
+            [['first00 last', 'first01 last'], ['first10 last', 'first11 last'], ['first20 last', 'first21 last']],
+        )
+
+
+
+class TokenAuthTestCase(QueryCountMixin, APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='sayitkamol', first_name='sayitkamol')
+        self.user.set_password('qiyinparol')
+        self.user.save()
+
+    def obtain(self):
+        response = self.client.post(reverse('api:token-obtain'), data={
+            'username': 'sayitkamol', 'password': 'qiyinparol',
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_obtain_and_authenticate(self):
+        pair = self.obtain()
+        self.assertEqual(set(pair), {'access', 'refresh', 'expires_in'})
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {pair['access']}")
+        self.client.get(reverse('api:review-list'))
+        # The user comes from the cache, so only the count runs on an empty list.
+        response = self.assertEndpointQueries(1, reverse('api:review-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_wrong_password(self):
+        response = self.client.post(reverse('api:token-obtain'), data={'username': 'sayitkamol', 'password': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_tokens_are_rejected(self):
+        access = self.obtain()['access']
+        with override_settings(API_ACCESS_TOKEN_SECONDS=-1):
+            self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+            response = self.client.get(reverse('api:review-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['detail'], "Token has expired.")
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access[:-2]}xx")
+        response = self.client.get(reverse('api:review-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+
+        # A refresh token is not an access token.
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {self.obtain()['refresh']}")
+        response = self.client.get(reverse('api:review-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_tokens_rotate_once(self):
+        refresh = self.obtain()['refresh']
+
+        response = self.client.post(reverse('api:token-refresh'), data={'refresh': refresh})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.data['refresh'], refresh)
+
+        response = self.client.post(reverse('api:token-refresh'), data={'refresh': refresh})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoke(self):
+        access = self.obtain()['access']
+
+        response = self.client.post(reverse('api:token-revoke'), data={'token': access})
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        response = self.client.post(reverse('api:token-revoke'), data={'token': access})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+        response = self.client.get(reverse('api:review-list'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response.data['detail'], "Token has been revoked.")
+
+    @skipUnless('api_tokens' in settings.CACHES, "Only configured without a shared cache.")
+    def test_revocations_fall_back_to_the_database(self):
+        access = self.obtain()['access']
+        with override_settings(API_TOKEN_DENYLIST_CACHE='api_tokens'):
+            self.assertTrue(tokens.revoke(access))
+            with self.assertRaisesMessage(tokens.InvalidToken, "Token has been revoked."):
+                tokens.verify(access, tokens.ACCESS)
+
+    def test_password_change_ends_tokens(self):
+        pair = self.obtain()
+        self.user.set_password('yangiparol')
+        self.user.save()
+
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {pair['access']}")
+        self.assertEqual(self.client.get(reverse('api:review-list')).status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post(reverse('api:token-refresh'), data={'refresh': pair['refresh']})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIsNone(tokens.user_for(tokens.verify(pair['access'], tokens.ACCESS)))
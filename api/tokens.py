@@ -0,0 +1,104 @@
+"""
+Stateless signed API tokens.
+
+Tokens are ``django.core.signing`` payloads, so checking one costs an HMAC
+and a cache lookup: no database hit and no password hashing, unlike HTTP
+Basic. An access token authenticates requests for API_ACCESS_TOKEN_SECONDS;
+a refresh token is exchanged, once, for a new pair. Revoked token ids sit
+in a cache denylist until the token would have expired anyway, and every
+token carries a digest of the user's password hash, so changing the
+password ends all of them.
+
+The denylist and the user cache must be shared between processes (e.g.
+Redis) for revocations to reach every worker.
+"""
+import secrets
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.utils.crypto import constant_time_compare
+
+from goodreads.auth import CachedModelBackend
+
+ACCESS = 'access'
+REFRESH = 'refresh'
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def lifetime(kind):
+    return settings.API_ACCESS_TOKEN_SECONDS if kind == ACCESS else settings.API_REFRESH_TOKEN_SECONDS
+
+
+def password_digest(user):
+    return user.get_session_auth_hash()[:16]
+
+
+def issue(user, kind):
+    payload = {'u': user.pk, 'j': secrets.token_urlsafe(12), 'p': password_digest(user)}
+    return signing.dumps(payload, salt=f'api.tokens.{kind}')
+
+
+def issue_pair(user):
+    return {
+        'access': issue(user, ACCESS),
+        'refresh': issue(user, REFRESH),
+        'expires_in': settings.API_ACCESS_TOKEN_SECONDS,
+    }
+
+
+def verify(token, kind):
+    """The token's payload; raises InvalidToken if it is forged, expired or revoked."""
+    try:
+        payload = signing.loads(token, salt=f'api.tokens.{kind}', max_age=lifetime(kind))
+    except signing.SignatureExpired:
+        raise InvalidToken("Token has expired.")
+    except signing.BadSignature:
+        raise InvalidToken("Invalid token.")
+
+    if denylist().get(denylist_key(payload['j'])) is not None:
+        raise InvalidToken("Token has been revoked.")
+    return payload
+
+
+def user_for(payload):
+    """The token's user, from the auth user cache; None if gone, inactive or their password changed."""
+    user = CachedModelBackend().get_user(payload['u'])
+    if user is None or not constant_time_compare(password_digest(user), payload['p']):
+        return None
+    return user
+
+
+def denylist():
+    return caches[settings.API_TOKEN_DENYLIST_CACHE]
+
+
+def denylist_key(token_id):
+    return f'api-token:revoked:{token_id}'
+
+
+def revoke(token):
+    """Revoke an access or refresh token; return False if it wasn't valid."""
+    for kind in (ACCESS, REFRESH):
+        try:
+            payload = verify(token, kind)
+        except InvalidToken:
+            continue
+        denylist().set(denylist_key(payload['j']), True, lifetime(kind))
+        return True
+    return False
+
+
+def rotate(refresh_token):
+    """Exchange a refresh token for a new pair; each refresh token works once."""
+    payload = verify(refresh_token, REFRESH)
+    user = user_for(payload)
+    if user is None:
+        raise InvalidToken("Invalid token.")
+    # add() only succeeds once, so two concurrent refreshes can't both rotate.
+    if not denylist().add(denylist_key(payload['j']), True, lifetime(REFRESH)):
+        raise InvalidToken("Token has been revoked.")
+    return issue_pair(user)
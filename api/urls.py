@@ -1,6 +1,14 @@
 from django.urls import path
+from django.views.decorators.csrf import csrf_exempt
 
-from api.views import BookReviewDetailAPIView, BookReviewsAPIView
+from api.views import (
+    BookReviewDetailAPIView, BookReviewsAPIView, BookSearchAPIView, BulkBookReviewsAPIView, CacheStatsAPIView,
+    DatabaseStatsAPIView, ExportAPIView, FollowAuthorAPIView, FollowUserAPIView, ObtainTokenAPIView,
+    RefreshTokenAPIView, RevokeTokenAPIView, SimilarBooksAPIView, TrendingBooksAPIView, UserActivityAPIView,
+    UserReviewsAPIView,
+    AsyncBookReviewDetailAPIView, AsyncBookReviewsAPIView,
+)
+from goodreads.routing import select_view
 from rest_framework import routers
 from api.views import BookReviewViewSet
 
@@ -12,7 +20,39 @@ app_name = 'api'
 # urlpatterns = router.urls
 
 urlpatterns = [
-    path("reviews/", BookReviewsAPIView.as_view(), name="review-list"),
+    path("token/", ObtainTokenAPIView.as_view(), name="token-obtain"),
+    path("token/refresh/", RefreshTokenAPIView.as_view(), name="token-refresh"),
+    path("token/revoke/", RevokeTokenAPIView.as_view(), name="token-revoke"),
 
-    path("reviews/<int:id>/", BookReviewDetailAPIView.as_view(), name="review-detail"),
+    path("reviews/",
+         select_view("api:review-list",
+                     BookReviewsAPIView.as_view(),
+                     csrf_exempt(AsyncBookReviewsAPIView.as_view())),
+         name="review-list"),
+
+    path("reviews/bulk/", BulkBookReviewsAPIView.as_view(), name="review-bulk"),
+
+    path("reviews/<int:id>/",
+         select_view("api:review-detail",
+                     BookReviewDetailAPIView.as_view(),
+                     csrf_exempt(AsyncBookReviewDetailAPIView.as_view())),
+         name="review-detail"),
+
+    path("books/search/", BookSearchAPIView.as_view(), name="book-search"),
+
+    path("books/<int:id>/similar/", SimilarBooksAPIView.as_view(), name="book-similar"),
+
+    path("books/trending/", TrendingBooksAPIView.as_view(), name="book-trending"),
+
+    path("users/<int:id>/", UserActivityAPIView.as_view(), name="user-activity"),
+
+    path("users/<int:id>/reviews/", UserReviewsAPIView.as_view(), name="user-reviews"),
+
+    path("users/<int:id>/follow/", FollowUserAPIView.as_view(), name="user-follow"),
+    path("authors/<int:id>/follow/", FollowAuthorAPIView.as_view(), name="author-follow"),
+
+    path("cache/stats/", CacheStatsAPIView.as_view(), name="cache-stats"),
+    path("db/stats/", DatabaseStatsAPIView.as_view(), name="db-stats"),
+
+    path("export/<slug:name>.<slug:fmt>", ExportAPIView.as_view(), name="export"),
 ]
\ No newline at end of file
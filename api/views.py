@@ -1,21 +1,55 @@
-from django.shortcuts import render
+from asgiref.sync import sync_to_async
+from django.contrib.auth import authenticate
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date
+from django.views import View
 from rest_framework import status, generics, viewsets
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.exceptions import (
+    APIException, AuthenticationFailed, NotAuthenticated, NotFound, ValidationError,
+)
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.request import Request
 from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
 from rest_framework.views import APIView
 
-from books.models import BookReview, Book
-from api.serializers import BookReviewSerializer
+from api import tokens
+from api.authentication import SignedTokenAuthentication
+from books import cache, rankings
+from books.authors import load_authors
+from books.conditional import review_validators
+from books.models import Author, BookReview, Book, BookSimilarity, Follow
+from api.pagination import AsyncPageNumberPagination, BoundedPageNumberPagination, ReviewCursorPagination
+from api.serializers import (
+    BookReviewRowSerializer, BookReviewSerializer, BookSearchSerializer, RankedBookSerializer, SimilarBookSerializer,
+    UserActivitySerializer,
+)
+from books.export import EXPORTS, FORMATS, stream_export
+from books.ingest import ReviewImporter, parse_csv, parse_ndjson, parse_rows
+from books.search import search_books
+from goodreads.db import connection_stats, pin_to_primary, replica_reads
+from goodreads.pagination import get_page_size
+from goodreads.routing import resolve_user
+from users.models import CustomUser
 
 
 ''' Pastdagi barcha kodlarni shu 5 qator kodda jamlash mumkin '''
 class BookReviewViewSet(viewsets.ModelViewSet):
     permission_classes = (IsAuthenticated,)
     serializer_class = BookReviewSerializer
-    queryset = BookReview.objects.all().order_by('-created_at')
+    queryset = BookReview.objects.for_api().order_by('-created_at')
     lookup_field = 'id'
 
+    def list(self, request, *args, **kwargs):
+        serializer = BookReviewRowSerializer.from_request(request)
+        page = self.paginate_queryset(serializer.values(BookReview.objects.order_by('-created_at')))
+        return self.get_paginated_response(serializer.serialize(page))
+
 
 # class BookReviewDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
 #     permission_classes = (IsAuthenticated,)
@@ -24,35 +58,53 @@ class BookReviewViewSet(viewsets.ModelViewSet):
 #     lookup_field = 'id'
 
 
+@method_decorator(replica_reads, name='get')
 class BookReviewDetailAPIView(APIView):
     permission_classes = (IsAuthenticated,)
 
     def get(self, request, id):
-        book_review = BookReview.objects.get(id=id)
+        validators = review_validators(id)
+        if validators is None:
+            raise NotFound()
+
+        etag, last_modified = validators
+        not_modified = get_conditional_response(
+            request._request, etag=etag, last_modified=int(last_modified.timestamp()),
+        )
+        if not_modified is not None:
+            return not_modified
+
+        book_review = BookReview.objects.for_api().get(id=id)
         serializer = BookReviewSerializer(book_review)
-        return Response(data=serializer.data)
+        response = Response(data=serializer.data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
 
     def delete(self, request, id):
         book_review = BookReview.objects.get(id=id)
         book_review.delete()
+        pin_to_primary(request)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     def put(self, request, id):
-        book_review = BookReview.objects.get(id=id)
+        book_review = BookReview.objects.select_related('user', 'book').get(id=id)
         serializer = BookReviewSerializer(instance=book_review, data=request.data)
 
         if serializer.is_valid():
             serializer.save()
+            pin_to_primary(request)
             return Response(data=serializer.data, status=status.HTTP_200_OK)
 
         return Response(data=serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def patch(self, request, id):
-        book_review = BookReview.objects.get(id=id)
+        book_review = BookReview.objects.select_related('user', 'book').get(id=id)
         serializer = BookReviewSerializer(instance=book_review, data=request.data, partial=True)
 
         if serializer.is_valid():
             serializer.save()
+            pin_to_primary(request)
             return Response(data=serializer.data, status=status.HTTP_200_OK)
 
         return Response(data=serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -64,23 +116,331 @@ class BookReviewDetailAPIView(APIView):
 #     queryset = BookReview.objects.all().order_by('-created_at')
 
 
+@method_decorator(replica_reads, name='get')
 class BookReviewsAPIView(APIView):
     permission_classes = (IsAuthenticated,)
 
     def get(self, request):
-        book_reviews = BookReview.objects.all().order_by("-created_at")
+        serializer = BookReviewRowSerializer.from_request(request)
+        book_reviews = serializer.values(BookReview.objects.order_by("-created_at"))
 
-        paginator = PageNumberPagination()
+        if 'cursor' in request.query_params:
+            paginator = ReviewCursorPagination()
+        else:
+            paginator = BoundedPageNumberPagination()
         page_obj = paginator.paginate_queryset(book_reviews, request)
-        serializer = BookReviewSerializer(page_obj, many=True)
 
-        return paginator.get_paginated_response(serializer.data)
+        return paginator.get_paginated_response(serializer.serialize(page_obj))
 
     def post(self, request):
         serializer = BookReviewSerializer(data=request.data)
 
         if serializer.is_valid():
             serializer.save()
+            pin_to_primary(request)
             return Response(data=serializer.data, status=status.HTTP_201_CREATED)
 
         return Response(data=serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@method_decorator(replica_reads, name='get')
+class UserActivityAPIView(APIView):
+    """A reader's profile and review counters, served from their user row alone."""
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, id):
+        user = get_object_or_404(CustomUser.objects.only(
+            'id', 'username', 'first_name', 'last_name', 'profile_picture', 'profile_picture_variants',
+            'review_count', 'average_stars_given', 'last_active_at',
+        ), pk=id)
+        return Response(data=UserActivitySerializer(user).data)
+
+
+@method_decorator(replica_reads, name='get')
+class UserReviewsAPIView(APIView):
+    """A reader's reviews, newest first, keyset-paginated on the (user, created_at) index."""
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, id):
+        if not CustomUser.objects.filter(pk=id).exists():
+            raise NotFound()
+
+        serializer = BookReviewRowSerializer.from_request(request)
+        paginator = ReviewCursorPagination()
+        page_obj = paginator.paginate_queryset(serializer.values(BookReview.objects.filter(user_id=id)), request)
+
+        return paginator.get_paginated_response(serializer.serialize(page_obj))
+
+
+class BulkBookReviewsAPIView(APIView):
+    """
+    Import many reviews in one request. Send a JSON array, or stream
+    ``application/x-ndjson`` / ``text/csv`` bodies, which are read line by
+    line instead of being parsed into memory up front.
+    """
+    permission_classes = (IsAdminUser,)
+    chunk_size = 1000
+
+    def post(self, request):
+        content_type = request.content_type.split(';')[0].strip()
+
+        if content_type == 'application/x-ndjson':
+            rows = parse_ndjson(request._request)
+        elif content_type == 'text/csv':
+            rows = parse_csv(request._request)
+        elif isinstance(request.data, list):
+            rows = parse_rows(request.data)
+        else:
+            return Response(data={'detail': "Expected a JSON array of reviews."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            chunk_size = max(1, int(request.query_params.get('chunk_size', self.chunk_size)))
+        except ValueError:
+            return Response(data={'detail': "chunk_size must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        result = ReviewImporter(chunk_size=chunk_size).run(rows)
+        pin_to_primary(request)
+
+        return Response(data=result.as_dict(), status=status.HTTP_200_OK)
+
+
+class ExportAPIView(APIView):
+    permission_classes = (IsAdminUser,)
+    content_types = {
+        'ndjson': 'application/x-ndjson',
+        'csv': 'text/csv',
+    }
+
+    def get(self, request, name, fmt):
+        if name not in EXPORTS or fmt not in FORMATS:
+            return Response(data={'detail': "Unknown export."}, status=status.HTTP_404_NOT_FOUND)
+
+        since = request.query_params.get('since')
+        if since:
+            try:
+                since = parse_datetime(since)
+            except ValueError:
+                # Well formed but not a real date, e.g. month 13.
+                since = None
+            if since is None:
+                return Response(data={'detail': "since must be an ISO 8601 timestamp."},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        response = StreamingHttpResponse(stream_export(name, fmt, since=since), content_type=self.content_types[fmt])
+        response['Content-Disposition'] = f'attachment; filename="{name}.{fmt}"'
+        return response
+
+
+@method_decorator(replica_reads, name='get')
+class BookSearchAPIView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        books = Book.objects.only('id', 'title', 'description', 'isbn', 'cover_picture', 'cover_variants').order_by('id')
+        search_query = request.query_params.get('q', '')
+        if search_query:
+            books = search_books(books, search_query)
+
+        paginator = BoundedPageNumberPagination()
+        page_obj = paginator.paginate_queryset(books, request)
+        serializer = BookSearchSerializer(load_authors(page_obj), many=True)
+
+        return paginator.get_paginated_response(serializer.data)
+
+
+@method_decorator(replica_reads, name='get')
+class SimilarBooksAPIView(APIView):
+    """"Readers also liked": the precomputed neighbour list, best first, in one indexed query."""
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, id):
+        similar = list(BookSimilarity.objects.for_book(id))
+        # Only a book without neighbours costs the extra lookup.
+        if not similar and not Book.objects.filter(pk=id).exists():
+            raise NotFound()
+        return Response({'results': SimilarBookSerializer(similar, many=True).data})
+
+
+@method_decorator(replica_reads, name='get')
+class TrendingBooksAPIView(APIView):
+    """Top books of a precomputed ranking (?ranking=weekly|monthly|top-rated), in one indexed read."""
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        ranking = request.query_params.get('ranking', 'weekly')
+        if ranking not in rankings.RANKINGS:
+            raise ValidationError({'ranking': [f"Choose one of: {', '.join(rankings.RANKINGS)}."]})
+
+        books = rankings.ranked(ranking, get_page_size(request, request.query_params))
+        context = {'field': rankings.RANKINGS[ranking], 'now': timezone.now()}
+        return Response({'ranking': ranking, 'results': RankedBookSerializer(books, many=True, context=context).data})
+
+
+class FollowAPIView(APIView):
+    """Follow (POST) or unfollow (DELETE) an account; its new reviews then reach your home feed."""
+    permission_classes = (IsAuthenticated,)
+    model = None
+    field = None
+
+    def post(self, request, id):
+        followee = get_object_or_404(self.model.objects.only('id'), pk=id)
+        if followee == request.user:
+            raise ValidationError({'detail': ["You can't follow yourself."]})
+
+        _, created = Follow.objects.get_or_create(follower=request.user, **{self.field: followee})
+        pin_to_primary(request)
+        return Response({'following': True}, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    def delete(self, request, id):
+        # Deleted one by one so the Follow signals update counters and feeds.
+        Follow.objects.filter(follower=request.user, **{f'{self.field}_id': id}).delete()
+        pin_to_primary(request)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class FollowUserAPIView(FollowAPIView):
+    model = CustomUser
+    field = 'user'
+
+
+class FollowAuthorAPIView(FollowAPIView):
+    model = Author
+    field = 'author'
+
+
+class TokenAPIView(APIView):
+    """Token endpoints take credentials in the body and answer failures with a Bearer challenge."""
+    authentication_classes = ()
+    permission_classes = ()
+
+    def get_authenticate_header(self, request):
+        return SignedTokenAuthentication().authenticate_header(request)
+
+
+class ObtainTokenAPIView(TokenAPIView):
+    """Trade a username and password for an access and refresh token pair; the only call that hashes the password."""
+
+    def post(self, request):
+        user = authenticate(
+            request, username=request.data.get('username'), password=request.data.get('password'),
+        )
+        if user is None:
+            raise AuthenticationFailed("Invalid username or password.")
+        return Response(tokens.issue_pair(user))
+
+
+class RefreshTokenAPIView(TokenAPIView):
+    """Rotate a refresh token: it is spent, and a new pair is returned."""
+
+    def post(self, request):
+        try:
+            return Response(tokens.rotate(str(request.data.get('refresh', ''))))
+        except tokens.InvalidToken as exc:
+            raise AuthenticationFailed(str(exc))
+
+
+class RevokeTokenAPIView(TokenAPIView):
+    """Revoke an access or refresh token; holding it is the credential."""
+
+    def post(self, request):
+        if not tokens.revoke(str(request.data.get('token', ''))):
+            raise ValidationError({'token': ["Invalid, expired or already revoked token."]})
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class CacheStatsAPIView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(data=cache.stats.snapshot())
+
+
+class DatabaseStatsAPIView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(data=connection_stats.snapshot())
+
+
+class AsyncAPIView(View):
+    """
+    Async, session- or token-authenticated read handlers for DRF endpoints.
+
+    GET is served natively through the async ORM; any other method is
+    handed to ``write_view`` (the regular DRF view) in a worker thread.
+    """
+    write_view = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD', 'OPTIONS'):
+            try:
+                credentials = await sync_to_async(SignedTokenAuthentication().authenticate)(request)
+            except AuthenticationFailed as exc:
+                return self.challenge(exc)
+            if credentials is not None:
+                request.user = credentials[0]
+            elif not (await resolve_user(request)).is_authenticated:
+                return self.challenge(NotAuthenticated())
+            try:
+                return await super().dispatch(Request(request), *args, **kwargs)
+            except APIException as exc:
+                return self.error_response(exc)
+
+        return await sync_to_async(self.write_view)(request, *args, **kwargs)
+
+    def challenge(self, exc):
+        # Same as DRF's answer with SignedTokenAuthentication listed first.
+        response = self.error_response(exc)
+        response['WWW-Authenticate'] = SignedTokenAuthentication().authenticate_header(request=None)
+        return response
+
+    def error_response(self, exc, status=None):
+        return self.json_response({'detail': exc.detail}, status=status or exc.status_code)
+
+    def json_response(self, data, status=status.HTTP_200_OK):
+        return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+@method_decorator(replica_reads, name='get')
+class AsyncBookReviewsAPIView(AsyncAPIView):
+    write_view = staticmethod(BookReviewsAPIView.as_view())
+
+    async def get(self, request):
+        serializer = BookReviewRowSerializer.from_request(request)
+        book_reviews = serializer.values(BookReview.objects.order_by("-created_at"))
+
+        if 'cursor' in request.query_params:
+            paginator = ReviewCursorPagination()
+        else:
+            paginator = AsyncPageNumberPagination()
+        page_obj = await paginator.apaginate_queryset(book_reviews, request)
+
+        return self.json_response(paginator.get_paginated_response(serializer.serialize(page_obj)).data)
+
+
+@method_decorator(replica_reads, name='get')
+class AsyncBookReviewDetailAPIView(AsyncAPIView):
+    write_view = staticmethod(BookReviewDetailAPIView.as_view())
+
+    async def get(self, request, id):
+        validators = await sync_to_async(review_validators)(id)
+        if validators is None:
+            raise NotFound()
+
+        etag, last_modified = validators
+        not_modified = get_conditional_response(
+            request._request, etag=etag, last_modified=int(last_modified.timestamp()),
+        )
+        if not_modified is not None:
+            return not_modified
+
+        try:
+            book_review = await BookReview.objects.for_api().aget(id=id)
+        except BookReview.DoesNotExist:
+            raise NotFound()
+
+        serializer = BookReviewSerializer(book_review)
+        response = self.json_response(serializer.data)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
@@ -1,10 +1,19 @@
 from django.contrib import admin
-from books.models import Book, Author, BookAuthor, BookReview
+from django.utils import timezone
+
+from books.models import Book, Author, BookAuthor, BookReview, ReviewEvent, normalize_isbn
 
 
 class BookAdmin(admin.ModelAdmin):
     list_display = ('title', 'isbn', 'id')
-    search_fields = ('title', 'isbn')
+    search_fields = ('title',)
+
+    def get_search_results(self, request, queryset, search_term):
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        isbn = normalize_isbn(search_term)
+        if isbn:
+            queryset |= self.model.objects.filter(isbn_normalized=isbn)
+        return queryset, may_have_duplicates
 
 
 class AuthorAdmin(admin.ModelAdmin):
@@ -22,8 +31,19 @@ class BookReviewAdmin(admin.ModelAdmin):
     search_fields = ('user', 'book', 'comment')
 
 
+class ReviewEventAdmin(admin.ModelAdmin):
+    list_display = ('review_id', 'old_book_id', 'new_book_id', 'attempts', 'dead', 'created_at', 'id')
+    list_filter = ('dead',)
+    readonly_fields = ('last_error',)
+    actions = ('requeue',)
+
+    @admin.action(description="Requeue selected events")
+    def requeue(self, request, queryset):
+        queryset.update(dead=False, attempts=0, available_at=timezone.now())
+
+
 admin.site.register(Book, BookAdmin)
 admin.site.register(Author, AuthorAdmin)
 admin.site.register(BookAuthor, BookAuthorAdmin)
 admin.site.register(BookReview, BookReviewAdmin)
-
+admin.site.register(ReviewEvent, ReviewEventAdmin)
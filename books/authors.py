@@ -0,0 +1,49 @@
+"""
+Author names for books.
+
+``Book.author_display`` holds a book's credits as one string, so listings
+show authors without touching BookAuthor; the signals on Author and
+BookAuthor keep it in sync. ``load_authors`` resolves the Author rows behind
+a whole page of books in one query, for responses that need more than names.
+"""
+from books.models import Book, BookAuthor
+
+
+def authors_by_book(book_ids):
+    """``{book_id: [Author, ...]}`` in credit order, in one query however many books."""
+    authors = {book_id: [] for book_id in book_ids}
+    credits = BookAuthor.objects.filter(book_id__in=authors).select_related('author').only(
+        'book_id', 'author__id', 'author__first_name', 'author__last_name',
+    ).order_by('book_id', 'id')
+    for credit in credits:
+        authors[credit.book_id].append(credit.author)
+    return authors
+
+
+def load_authors(books):
+    """Set ``author_list`` on every book of a page."""
+    authors = authors_by_book([book.pk for book in books])
+    for book in books:
+        book.author_list = authors[book.pk]
+    return books
+
+
+def display(authors):
+    return ', '.join(author.full_name() for author in authors)
+
+
+def update_author_display(book_ids, batch_size=500):
+    """Recompute ``author_display`` for the given books; return how many changed."""
+    book_ids = list(book_ids)
+    changed = 0
+    for start in range(0, len(book_ids), batch_size):
+        batch = book_ids[start:start + batch_size]
+        names = {book_id: display(authors) for book_id, authors in authors_by_book(batch).items()}
+        stale = [
+            Book(pk=book_id, author_display=names[book_id])
+            for book_id, current in Book.objects.filter(pk__in=batch).values_list('pk', 'author_display')
+            if current != names[book_id]
+        ]
+        Book.objects.bulk_update(stale, ['author_display'])
+        changed += len(stale)
+    return changed
@@ -0,0 +1,125 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+class FragmentCacheStats:
+    """Per-process hit/miss counters for rendered fragments."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = {}
+        self.misses = {}
+
+    def record(self, name, hit):
+        counters = self.hits if hit else self.misses
+        with self._lock:
+            counters[name] = counters.get(name, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            names = sorted(set(self.hits) | set(self.misses))
+            return {
+                name: {'hits': self.hits.get(name, 0), 'misses': self.misses.get(name, 0)}
+                for name in names
+            }
+
+    def reset(self):
+        with self._lock:
+            self.hits.clear()
+            self.misses.clear()
+
+
+stats = FragmentCacheStats()
+
+# Pseudo-label whose single version counter covers every book list page.
+CATALOGUE = 'books.catalogue'
+
+
+def object_label(obj):
+    return obj._meta.label_lower
+
+
+def version_key(label, pk):
+    return f'fragment-version:{label}:{pk}'
+
+
+def fragment_key(name, label, pk, version, vary_on=()):
+    key = f'fragment:{name}:{label}:{pk}:{version}'
+    if vary_on:
+        key += ':' + hashlib.md5(':'.join(str(value) for value in vary_on).encode()).hexdigest()
+    return key
+
+
+def initial_version():
+    # A fresh version key starts from the clock, never from 1, so keys that
+    # were evicted (or belong to a recycled pk) can't collide with old fragments.
+    return time.time_ns() // 1000
+
+
+def get_versions(label, pks):
+    keys = {version_key(label, pk): pk for pk in pks}
+    found = cache.get_many(keys)
+
+    missing = {key: initial_version() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        found.update(missing)
+
+    return {keys[key]: version for key, version in found.items()}
+
+
+def bump_version(label, pk):
+    key = version_key(label, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, initial_version(), timeout=None)
+
+
+def invalidate(label, pk):
+    """
+    Bump an object's fragment version now and again once the surrounding
+    transaction commits, so a reader that re-rendered from pre-commit data
+    in between can't leave a stale fragment under the new version (and, with
+    replicas, once more when they have caught up).
+    """
+    bump_version(label, pk)
+    transaction.on_commit(lambda: bump_version(label, pk))
+
+    if settings.REPLICA_DATABASES:
+        # Pages rendered from a lagging replica right after the commit could
+        # still cache old data; bump once more after the lag allowance.
+        from books.tasks import bump_fragment_version
+
+        transaction.on_commit(
+            lambda: bump_fragment_version.apply_async((label, pk), countdown=settings.REPLICA_PIN_SECONDS)
+        )
+
+
+def invalidate_book(book_id):
+    """A book changed: drop its fragments and the catalogue-wide version."""
+    invalidate('books.book', book_id)
+    invalidate(CATALOGUE, 0)
+
+
+def get_or_render(name, obj, render, vary_on=(), versions=None):
+    label = object_label(obj)
+    if versions is None:
+        versions = {}
+    if obj.pk not in versions:
+        versions.update(get_versions(label, [obj.pk]))
+
+    key = fragment_key(name, label, obj.pk, versions[obj.pk], vary_on)
+    content = cache.get(key)
+    stats.record(name, hit=content is not None)
+
+    if content is None:
+        content = render()
+        cache.set(key, content, settings.FRAGMENT_CACHE_TIMEOUT)
+
+    return content
@@ -0,0 +1,63 @@
+import hashlib
+
+from books import cache
+from books.models import Book, BookReview, BookSimilarity
+
+
+def _digest(*parts):
+    return hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def _neighbours(request, id):
+    """
+    ``(id, updated_at)`` of the book's "Readers also liked" neighbours, which
+    the page renders uncached; one query per request, shared by both validators.
+    """
+    if not hasattr(request, '_book_neighbours'):
+        request._book_neighbours = list(BookSimilarity.objects.filter(book_id=id).order_by('rank').values_list(
+            'similar_book_id', 'similar_book__updated_at',
+        ))
+    return request._book_neighbours
+
+
+def book_etag(request, id):
+    """
+    Per-book fragment version, the neighbours' ``updated_at``, the viewer and
+    their CSRF secret (the page's review form carries a token for it).
+    """
+    version = cache.get_versions('books.book', [id])[id]
+    neighbours = [f'{pk}@{updated_at.isoformat()}' for pk, updated_at in _neighbours(request, id)]
+    digest = _digest(version, request.user.pk or 0, request.META.get("CSRF_COOKIE", ""), *neighbours)
+    return f'book-{id}-{digest}'
+
+
+def book_last_modified(request, id):
+    updated_at = Book.objects.filter(pk=id).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None
+    return max([updated_at, *(neighbour_updated_at for _, neighbour_updated_at in _neighbours(request, id))])
+
+
+def catalogue_etag(request):
+    """Catalogue version, the full query string (search, sort, page) and the viewer."""
+    version = cache.get_versions(cache.CATALOGUE, [0])[0]
+    query = sorted(request.GET.lists())
+    return f'catalogue-{_digest(version, query, request.user.pk or 0)}'
+
+
+def review_validators(review_id):
+    """
+    Return ``(etag, last_modified)`` for the API representation of a review,
+    or None if it does not exist. One narrow indexed row read, no serializer.
+    """
+    row = BookReview.objects.filter(pk=review_id).values_list(
+        'updated_at', 'book__updated_at',
+        'user__username', 'user__first_name', 'user__last_name', 'user__email',
+        'user__profile_picture', 'user__profile_picture_variants__hash',
+    ).first()
+    if row is None:
+        return None
+
+    updated_at, book_updated_at, *user = row
+    etag = f'"review-{review_id}-{_digest(updated_at.isoformat(), book_updated_at.isoformat(), *user)}"'
+    return etag, max(updated_at, book_updated_at)
@@ -0,0 +1,116 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache as django_cache
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from books import cache
+from books.models import ReviewEvent
+from books.ratings import apply_rating_deltas, rating_deltas
+from users.activity import activity_deltas, apply_activity, last_active
+
+logger = logging.getLogger(__name__)
+
+NUDGE_KEY = 'review-events:nudge'
+
+
+def publish_review_events(changes):
+    """
+    Record ``(review_id, old, new)`` review writes in the outbox, in the
+    caller's transaction, and wake a consumer once it commits. Edits that
+    leave the rating alone still count as reader activity.
+    """
+    events = [ReviewEvent.for_change(review_id, old, new) for review_id, old, new in changes]
+    if events:
+        ReviewEvent.objects.bulk_create(events)
+        transaction.on_commit(schedule_consumer)
+    return events
+
+
+def schedule_consumer():
+    """
+    Queue one consumer run per batch window: a burst of review writes in the
+    window shares a single delayed run instead of each queueing its own.
+    """
+    from books.tasks import process_review_events
+
+    window = settings.REVIEW_EVENT_BATCH_WINDOW
+    if django_cache.add(NUDGE_KEY, 1, timeout=window):
+        process_review_events.apply_async(countdown=window)
+
+
+def process_batch(batch_size=None):
+    """
+    Apply up to ``batch_size`` pending events and return how many were taken.
+
+    Rows are locked with SKIP LOCKED so concurrent consumers split the
+    backlog, folded into one counter UPDATE per book, and deleted in the same
+    transaction, so a redelivered task can never apply an event twice.
+    """
+    batch_size = batch_size or settings.REVIEW_EVENT_BATCH_SIZE
+
+    with transaction.atomic():
+        events = list(
+            ReviewEvent.objects.pending().select_for_update(skip_locked=True).order_by('id')[:batch_size]
+        )
+        if not events:
+            return 0
+
+        try:
+            with transaction.atomic():
+                apply_events(events)
+        except DatabaseError:
+            logger.warning("Review event batch failed, retrying events one by one", exc_info=True)
+            for event in events:
+                try:
+                    with transaction.atomic():
+                        apply_events([event])
+                except DatabaseError as exc:
+                    record_failure(event, exc)
+
+    return len(events)
+
+
+def apply_events(events):
+    changes = [(event.old_state(), event.new_state()) for event in events]
+    deltas = rating_deltas(changes)
+    apply_rating_deltas(deltas)
+    apply_activity(activity_deltas(changes), last_active(events))
+    ReviewEvent.objects.filter(pk__in=[event.pk for event in events]).delete()
+
+    for book_id in deltas:
+        cache.invalidate_book(book_id)
+
+
+def record_failure(event, exc):
+    event.attempts += 1
+    event.last_error = repr(exc)
+    event.available_at = timezone.now() + timedelta(seconds=2 ** event.attempts)
+    event.dead = event.attempts >= settings.REVIEW_EVENT_MAX_ATTEMPTS
+    event.save(update_fields=['attempts', 'last_error', 'available_at', 'dead'])
+
+    if event.dead:
+        from books.tasks import dead_letter_review_event
+
+        payload = {
+            'key': str(event.key),
+            'review_id': event.review_id,
+            'old': event.old_state(),
+            'new': event.new_state(),
+            'error': event.last_error,
+        }
+        transaction.on_commit(lambda: dead_letter_review_event.delay(payload))
+
+
+def drain(max_batches=None, batch_size=None):
+    """Process batches until the backlog is empty (or ``max_batches`` ran); return the event count."""
+    total = batches = 0
+    while max_batches is None or batches < max_batches:
+        processed = process_batch(batch_size)
+        if not processed:
+            break
+        total += processed
+        batches += 1
+    return total
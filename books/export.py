@@ -0,0 +1,56 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from books.models import Author, Book, BookAuthor, BookReview
+
+EXPORTS = {
+    'books': (Book, ('id', 'title', 'description', 'isbn', 'cover_picture', 'created_at')),
+    'authors': (Author, ('id', 'first_name', 'last_name', 'email', 'bio', 'created_at')),
+    'book-authors': (BookAuthor, ('id', 'book_id', 'author_id', 'created_at')),
+    'reviews': (BookReview, ('id', 'book_id', 'user_id', 'stars_given', 'comment', 'created_at')),
+}
+
+FORMATS = ('ndjson', 'csv')
+
+
+class Echo:
+    """File-like object whose ``write`` hands the line back to the csv writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def export_rows(name, since=None, chunk_size=2000):
+    """
+    Yield ``values_list`` tuples for an export through a server-side cursor.
+
+    With ``since`` only rows created at or after that watermark are exported,
+    oldest first; consumers dedupe on ``id`` at the boundary.
+    """
+    model, fields = EXPORTS[name]
+    queryset = model.objects.order_by('pk')
+    if since is not None:
+        queryset = model.objects.filter(created_at__gte=since).order_by('created_at', 'pk')
+
+    return queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+
+
+def render_ndjson(fields, rows):
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(fields, row))) + '\n'
+
+
+def render_csv(fields, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def stream_export(name, fmt, since=None, chunk_size=2000):
+    _, fields = EXPORTS[name]
+    rows = export_rows(name, since=since, chunk_size=chunk_size)
+    render = render_ndjson if fmt == 'ndjson' else render_csv
+    return render(fields, rows)
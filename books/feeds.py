@@ -0,0 +1,191 @@
+"""
+Materialized home feeds.
+
+Readers follow other readers and authors (Follow). When a review is written,
+``fan_out`` copies a pointer to it into the FeedEntry list of every follower
+of its writer and of its book's authors, so a home page is one range read of
+the reader's own rows. Accounts with ``FEED_FANOUT_LIMIT`` followers or more
+are skipped on write, which would cost a row per follower; their reviews are
+read live and merged in by ``feed_paginator``.
+"""
+import random
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Window
+from django.db.models.functions import Coalesce, RowNumber
+
+from books.models import Author, BookAuthor, BookReview, FeedEntry, Follow
+from goodreads.pagination import MergedCursorPaginator
+from users.models import CustomUser
+
+
+def followee(follow):
+    """The followed account's model and primary key."""
+    if follow.user_id is not None:
+        return CustomUser, follow.user_id
+    return Author, follow.author_id
+
+
+def count_follow(follow, delta):
+    """Move the followed account's follower_count by ``delta`` and return the new count."""
+    model, pk = followee(follow)
+    accounts = model.objects.filter(pk=pk)
+    accounts.update(follower_count=F('follower_count') + delta)
+    return accounts.values_list('follower_count', flat=True).first() or 0
+
+
+def recount_followers():
+    """Recompute every reader's and author's follower_count from Follow."""
+    for model, field in ((CustomUser, 'user'), (Author, 'author')):
+        followers = Follow.objects.filter(**{field: OuterRef('pk')}).order_by().values(field).annotate(
+            count=Count('pk'),
+        ).values('count')
+        model.objects.update(follower_count=Coalesce(Subquery(followers), 0))
+
+
+def reviews_by(users=(), authors=()):
+    """Reviews written by any of ``users`` or of a book by any of ``authors``."""
+    sources = Q()
+    if users:
+        sources |= Q(user_id__in=users)
+    if authors:
+        sources |= Q(book_id__in=BookAuthor.objects.filter(author_id__in=authors).values('book_id'))
+    return BookReview.objects.filter(sources)
+
+
+def followed_reviews(follow):
+    model, pk = followee(follow)
+    return reviews_by(users=[pk]) if model is CustomUser else reviews_by(authors=[pk])
+
+
+def push(reviews, user_ids, batch_size=1000):
+    """
+    Add ``(review id, created_at)`` pairs to the given users' feeds; return
+    the rows written, counting ones already there. Trimming a feed back to
+    ``FEED_MAX_ENTRIES`` costs a walk over it, so each push trims a recipient
+    with probability 1/``FEED_TRIM_EVERY``: feeds overshoot by about that
+    many entries, and a push costs ``FEED_MAX_ENTRIES / FEED_TRIM_EVERY``
+    rows read on average.
+    """
+    user_ids = list(user_ids)
+    written = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        with transaction.atomic():
+            written += len(FeedEntry.objects.bulk_create([
+                FeedEntry(user_id=user_id, review_id=review_id, created_at=created_at)
+                for user_id in batch
+                for review_id, created_at in reviews
+            ], ignore_conflicts=True))
+            trim([user_id for user_id in batch if random.randrange(settings.FEED_TRIM_EVERY) == 0])
+    return written
+
+
+def trim(user_ids):
+    """Cut the given feeds back to their newest ``FEED_MAX_ENTRIES`` entries."""
+    if not user_ids:
+        return 0
+    overflow = FeedEntry.objects.filter(user_id__in=user_ids).annotate(
+        position=Window(
+            RowNumber(), partition_by=[F('user_id')], order_by=[F('created_at').desc(), F('review_id').desc()],
+        ),
+    ).filter(position__gt=settings.FEED_MAX_ENTRIES).values_list('pk', flat=True)
+    return FeedEntry.objects.filter(pk__in=list(overflow)).delete()[0]
+
+
+def fan_out(review_ids):
+    """Push each review to its writer and the followers of its writer and book authors; return rows written."""
+    limit = settings.FEED_FANOUT_LIMIT
+    reviews = BookReview.objects.filter(pk__in=review_ids).select_related('user').only(
+        'id', 'book_id', 'created_at', 'user__id', 'user__follower_count',
+    )
+    written = 0
+    for review in reviews:
+        sources = Q()
+        if review.user.follower_count < limit:
+            sources |= Q(user_id=review.user_id)
+        authors = Author.objects.filter(bookauthor__book_id=review.book_id, follower_count__lt=limit)
+        if author_ids := list(authors.values_list('pk', flat=True)):
+            sources |= Q(author_id__in=author_ids)
+
+        # Reviewers see their own reviews in their feed too.
+        recipients = {review.user_id}
+        if sources:
+            recipients.update(Follow.objects.filter(sources).values_list('follower_id', flat=True))
+        written += push([(review.pk, review.created_at)], recipients)
+    return written
+
+
+def backfill(follow_id):
+    """Start a new follower's feed off with the followed account's newest ``FEED_BACKFILL`` reviews."""
+    follow = Follow.objects.filter(pk=follow_id).first()
+    if follow is None:
+        return 0
+    model, pk = followee(follow)
+    if model.objects.filter(pk=pk, follower_count__gte=settings.FEED_FANOUT_LIMIT).exists():
+        return 0
+
+    newest = followed_reviews(follow).order_by('-created_at', '-id').values_list('pk', 'created_at')
+    return push(list(newest[:settings.FEED_BACKFILL]), [follow.follower_id])
+
+
+def unfollowed(follow):
+    """
+    Drop the unfollowed account's reviews from the follower's feed, except
+    those the follower wrote or still follows through another account.
+    """
+    users, authors = [follow.follower_id], []
+    remaining = Follow.objects.filter(follower_id=follow.follower_id).exclude(pk=follow.pk)
+    for followed_user, followed_author in remaining.values_list('user_id', 'author_id'):
+        if followed_user is not None:
+            users.append(followed_user)
+        else:
+            authors.append(followed_author)
+
+    reviews = followed_reviews(follow).exclude(pk__in=reviews_by(users, authors).values('pk')).values('pk')
+    FeedEntry.objects.filter(user_id=follow.follower_id, review_id__in=reviews).delete()
+
+
+def rebuild(user_id):
+    """Refill a reader's feed from scratch with the newest reviews of everything they follow; return its size."""
+    users, authors = [user_id], []
+    follows = Follow.objects.filter(follower_id=user_id).filter(
+        Q(user__follower_count__lt=settings.FEED_FANOUT_LIMIT)
+        | Q(author__follower_count__lt=settings.FEED_FANOUT_LIMIT)
+    )
+    for followed_user, followed_author in follows.values_list('user_id', 'author_id'):
+        if followed_user is not None:
+            users.append(followed_user)
+        else:
+            authors.append(followed_author)
+
+    newest = reviews_by(users, authors).order_by('-created_at', '-id').values_list('pk', 'created_at')
+    entries = [
+        FeedEntry(user_id=user_id, review_id=review_id, created_at=created_at)
+        for review_id, created_at in newest[:settings.FEED_MAX_ENTRIES]
+    ]
+    with transaction.atomic():
+        FeedEntry.objects.filter(user_id=user_id).delete()
+        FeedEntry.objects.bulk_create(entries)
+    return len(entries)
+
+
+def feed_paginator(user, page_size):
+    """
+    A reader's home feed: their materialized entries, plus the reviews of
+    followed accounts too popular to fan out, read live and merged in.
+    """
+    limit = settings.FEED_FANOUT_LIMIT
+    popular = list(Follow.objects.filter(follower=user).filter(
+        Q(user__follower_count__gte=limit) | Q(author__follower_count__gte=limit)
+    ).values_list('user_id', 'author_id'))
+    users = [followed_user for followed_user, _ in popular if followed_user is not None]
+    authors = [followed_author for _, followed_author in popular if followed_author is not None]
+
+    sources = [(
+        FeedEntry.objects.for_feed().filter(user=user), 'review_id', lambda entries: [entry.review for entry in entries],
+    )]
+    if users or authors:
+        sources.append((reviews_by(users, authors).for_feed(), 'pk', None))
+    return MergedCursorPaginator(sources, page_size)
@@ -8,3 +8,11 @@ class BookReviewForm(forms.ModelForm):
     class Meta:
         model = BookReview
         fields = ("stars_given", "comment")
+
+
+class BookReviewImportForm(forms.Form):
+    book_id = forms.IntegerField(min_value=1)
+    user_id = forms.IntegerField(min_value=1)
+    stars_given = forms.IntegerField(min_value=1, max_value=5)
+    comment = forms.CharField()
+    created_at = forms.DateTimeField(required=False)
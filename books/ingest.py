@@ -0,0 +1,198 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import IntegrityError, transaction
+
+from books import cache
+from books.events import publish_review_events
+from books.forms import BookReviewImportForm
+from books.models import Book, BookReview
+from books.tasks import fan_out_reviews
+from users.models import CustomUser
+
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportResult:
+    def __init__(self):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, row_number, errors):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row_number, 'errors': errors})
+
+    def as_dict(self):
+        return {'created': self.created, 'failed': self.failed, 'errors': self.errors}
+
+
+def parse_ndjson(lines):
+    """
+    Yield ``(row_number, data, ok)`` triples; when ``ok`` is False, ``data`` is
+    an error dict because the line isn't UTF-8 or a JSON object.
+    """
+    for row_number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            try:
+                line = line.decode('utf-8')
+            except UnicodeDecodeError as exc:
+                yield row_number, {'__all__': [f"Invalid UTF-8: {exc}"]}, False
+                continue
+        if not line.strip():
+            continue
+        try:
+            data = json.loads(line)
+        except ValueError as exc:
+            yield row_number, {'__all__': [f"Invalid JSON: {exc}"]}, False
+            continue
+        if not isinstance(data, dict):
+            yield row_number, {'__all__': ["Expected a JSON object."]}, False
+            continue
+        yield row_number, data, True
+
+
+def parse_csv(lines):
+    """
+    Yield ``(row_number, data, ok)`` triples like ``parse_ndjson``; a record
+    the csv module rejects, or spanning a line that isn't UTF-8, is an error.
+    """
+    undecodable = {}
+
+    def decoded():
+        for line_number, line in enumerate(lines, start=1):
+            if isinstance(line, bytes):
+                try:
+                    line = line.decode('utf-8')
+                except UnicodeDecodeError as exc:
+                    undecodable[line_number] = exc
+                    line = line.decode('utf-8', errors='replace')
+            yield line
+
+    reader = csv.DictReader(decoded())
+    row_number = line_number = 0
+    while True:
+        try:
+            data, ok = next(reader), True
+        except StopIteration:
+            return
+        except csv.Error as exc:
+            data, ok = {'__all__': [f"Invalid CSV: {exc}"]}, False
+        row_number += 1
+        # A quoted field may span lines: check every line the record used.
+        errors = [undecodable.pop(n) for n in range(line_number + 1, reader.line_num + 1) if n in undecodable]
+        line_number = reader.line_num
+        if errors:
+            data, ok = {'__all__': [f"Invalid UTF-8: {errors[0]}"]}, False
+        yield row_number, data, ok
+
+
+def parse_rows(rows):
+    for row_number, data in enumerate(rows, start=1):
+        if isinstance(data, dict):
+            yield row_number, data, True
+        else:
+            yield row_number, {'__all__': ["Expected an object."]}, False
+
+
+class ReviewImporter:
+    """
+    Validate and insert reviews in chunks.
+
+    Each chunk costs one lookup for its referenced books, one for its users
+    and one ``bulk_create`` inside a transaction; invalid rows are reported
+    and skipped instead of aborting the import.
+    """
+
+    def __init__(self, chunk_size=1000):
+        self.chunk_size = chunk_size
+
+    def run(self, parsed_rows):
+        result = ImportResult()
+        parsed_rows = iter(parsed_rows)
+
+        while True:
+            chunk = list(islice(parsed_rows, self.chunk_size))
+            if not chunk:
+                break
+            self.import_chunk(chunk, result)
+
+        return result
+
+    def import_chunk(self, chunk, result):
+        valid = []
+        for row_number, data, parsed in chunk:
+            if not parsed:
+                result.add_error(row_number, data)
+                continue
+            form = BookReviewImportForm(data=data)
+            if form.is_valid():
+                valid.append((row_number, form.cleaned_data))
+            else:
+                result.add_error(row_number, form.errors.get_json_data())
+
+        book_ids = set(Book.objects.filter(
+            id__in={data['book_id'] for _, data in valid}
+        ).values_list('id', flat=True))
+        user_ids = set(CustomUser.objects.filter(
+            id__in={data['user_id'] for _, data in valid}
+        ).values_list('id', flat=True))
+
+        reviews = []
+        for row_number, data in valid:
+            errors = {}
+            if data['book_id'] not in book_ids:
+                errors['book_id'] = [{'message': "Book does not exist.", 'code': 'invalid'}]
+            if data['user_id'] not in user_ids:
+                errors['user_id'] = [{'message': "User does not exist.", 'code': 'invalid'}]
+            if errors:
+                result.add_error(row_number, errors)
+                continue
+
+            review = BookReview(
+                book_id=data['book_id'],
+                user_id=data['user_id'],
+                stars_given=data['stars_given'],
+                comment=data['comment'],
+            )
+            if data.get('created_at'):
+                review.created_at = data['created_at']
+            reviews.append((row_number, review))
+
+        result.created += len(self.insert(reviews, result))
+
+    def insert(self, reviews, result):
+        if not reviews:
+            return []
+
+        try:
+            with transaction.atomic():
+                created = BookReview.objects.bulk_create(
+                    [review for _, review in reviews], batch_size=self.chunk_size
+                )
+                self.after_insert(created)
+                return created
+        except IntegrityError:
+            pass
+
+        # A book or user vanished mid-import; isolate the offending rows.
+        created = []
+        for row_number, review in reviews:
+            try:
+                with transaction.atomic():
+                    BookReview.objects.bulk_create([review])
+                    self.after_insert([review])
+                created.append(review)
+            except IntegrityError as exc:
+                result.add_error(row_number, {'__all__': [{'message': str(exc), 'code': 'integrity'}]})
+        return created
+
+    def after_insert(self, reviews):
+        # bulk_create skips the BookReview signals, so publish their events once per chunk.
+        publish_review_events([(review.pk, None, review.rating_state()) for review in reviews])
+        for book_id in {review.book_id for review in reviews}:
+            cache.invalidate_book(book_id)
+        review_ids = [review.pk for review in reviews]
+        transaction.on_commit(lambda: fan_out_reviews.delay(review_ids))
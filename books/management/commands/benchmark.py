@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from goodreads.benchmark import compare, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = "Measure p50/p99 latency and query counts of the hot endpoints against seeded data."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--cold-cache', action='store_true', help="Clear the cache before every request.")
+        parser.add_argument('--only', action='append', help="Run just this scenario (repeatable).")
+        parser.add_argument('--password', help="The seed_catalogue --password; enables the Basic auth scenario.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+        parser.add_argument('--compare', help="Earlier JSON results to compare against.")
+        parser.add_argument(
+            '--max-regression', type=float,
+            help="With --compare, fail if any p50 grew by more than this percentage or any query count grew.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            report = run_benchmarks(
+                iterations=options['iterations'], warmup=options['warmup'],
+                cold_cache=options['cold_cache'], only=options['only'], password=options['password'],
+            )
+        except LookupError as exc:
+            raise CommandError(str(exc))
+
+        for name, result in report['results'].items():
+            self.stdout.write(
+                f"{name:<24} {result['status']} {result['queries']:>3} queries  "
+                f"p50 {result['p50_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+
+        if options['compare']:
+            with open(options['compare']) as previous:
+                changes = list(compare(json.load(previous), report))
+
+            regressions = []
+            for name, metric, before, after, change in changes:
+                self.stdout.write(f"{name:<24} {metric:<8} {before:>10} -> {after:<10} {change:+.1f}%")
+                limit = options['max_regression']
+                if limit is not None and (
+                    (metric == 'p50_ms' and change > limit) or (metric == 'queries' and after > before)
+                ):
+                    regressions.append(f"{name} {metric}")
+
+            if regressions:
+                raise CommandError(f"Regressed: {', '.join(regressions)}")
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from books.recommendations import MIN_SUPPORT, TOP_K, build_recommendations
+
+
+class Command(BaseCommand):
+    help = "Recompute the \"readers also liked\" neighbour lists from review ratings."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=TOP_K)
+        parser.add_argument('--min-support', type=int, default=MIN_SUPPORT,
+                            help="Minimum number of common readers for a pair of books.")
+        parser.add_argument('--chunk-size', type=int, default=50000, help="Ratings streamed per fetch.")
+        parser.add_argument('--block-size', type=int, default=1000, help="Books compared per matrix block.")
+
+    def handle(self, *args, **options):
+        stats = build_recommendations(
+            top_k=options['top_k'],
+            min_support=options['min_support'],
+            chunk_size=options['chunk_size'],
+            block_size=options['block_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {stats['ratings']} ratings over {stats['books']} books: "
+            f"{stats['updated']} neighbour lists updated, {stats['removed']} removed."
+        ))
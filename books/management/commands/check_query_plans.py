@@ -0,0 +1,162 @@
+import re
+from contextlib import ExitStack
+from datetime import timedelta
+from urllib.parse import urlencode, urlsplit
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.exceptions import ObjectDoesNotExist
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.http import Http404
+from django.shortcuts import reverse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from django.utils import timezone
+
+from books.models import Book, BookReview, Follow
+from users.models import CustomUser
+
+SEQUENTIAL_SCAN_PATTERNS = {
+    'postgresql': re.compile(r'Seq Scan on (\w+)'),
+    'sqlite': re.compile(r'\bSCAN (\w+)\b(?! USING)'),
+}
+
+
+def view_requests(book_id, review_id, user_id):
+    """``(name, path, signed in)`` for each view checked; the plans come from the SQL the view itself runs."""
+    since = urlencode({'since': (timezone.now() - timedelta(days=1)).isoformat()})
+    return [
+        ('landing_page', reverse('landing_page'), False),
+        ('home_page', reverse('home_page'), False),
+        ('home_page feed', reverse('home_page'), True),
+        ('books:list', reverse('books:list'), False),
+        ('books:list?sort=rating', reverse('books:list') + '?sort=rating', False),
+        ('books:list?q=', reverse('books:list') + '?q=novel', False),
+        ('books:detail', reverse('books:detail', kwargs={'id': book_id}), False),
+        ('api:book-search', reverse('api:book-search') + '?q=novel', True),
+        ('api:book-similar', reverse('api:book-similar', kwargs={'id': book_id}), True),
+        ('api:book-trending', reverse('api:book-trending'), True),
+        ('api:book-trending top-rated', reverse('api:book-trending') + '?ranking=top-rated', True),
+        # Page 2, so the page-number path runs its OFFSET as well as its COUNT.
+        ('api:review-list', reverse('api:review-list') + '?page=2', True),
+        ('api:review-list?cursor=', reverse('api:review-list') + '?cursor=', True),
+        ('api:review-detail', reverse('api:review-detail', kwargs={'id': review_id}), True),
+        ('api:user-reviews', reverse('api:user-reviews', kwargs={'id': user_id}), True),
+        ('api:user-activity', reverse('api:user-activity', kwargs={'id': user_id}), True),
+        ('api:export reviews since',
+         reverse('api:export', kwargs={'name': 'reviews', 'fmt': 'ndjson'}) + f'?{since}', True),
+    ]
+
+
+def task_querysets(user_id):
+    """Queries run outside any view."""
+    return [
+        ('fan-out followers', Follow.objects.filter(user_id=user_id).values_list('follower_id')),
+    ]
+
+
+def captured_selects(path, user):
+    """Run the view at ``path`` as ``user``; return ``(alias, sql)`` for each SELECT it ran."""
+    # A host get_host() accepts, for the absolute pagination links.
+    host = next((host.lstrip('.') for host in settings.ALLOWED_HOSTS if host != '*'), 'localhost')
+    request = RequestFactory().get(path, headers={'accept': 'application/json', 'host': host})
+    request.user = user
+
+    async def auser():
+        return user
+    request.auser = auser
+
+    match = resolve(urlsplit(path).path)
+    aliases = [DEFAULT_DB_ALIAS, *settings.REPLICA_DATABASES]
+    with ExitStack() as stack:
+        captures = {alias: stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in aliases}
+        try:
+            if iscoroutinefunction(match.func):
+                response = async_to_sync(match.func)(request, *match.args, **match.kwargs)
+            else:
+                response = match.func(request, *match.args, **match.kwargs)
+            if hasattr(response, 'render'):
+                response.render()
+            elif response.streaming:
+                for _ in response:
+                    pass
+        except (ObjectDoesNotExist, Http404):
+            # An empty catalogue: the lookups that ran are still worth checking.
+            pass
+
+    return [
+        (alias, query['sql'])
+        for alias, capture in captures.items()
+        for query in capture.captured_queries
+        if query['sql'].lstrip().upper().startswith('SELECT')
+    ]
+
+
+def explain(alias, sql):
+    db = connections[alias]
+    with db.cursor() as cursor:
+        cursor.execute(f'{db.ops.explain_query_prefix()} {sql}')
+        return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+
+def table_sizes(tables):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT relname, reltuples FROM pg_class WHERE relname = ANY(%s)', [list(tables)])
+            return {name: int(rows) for name, rows in cursor.fetchall()}
+
+        sizes = {}
+        # Scans of subqueries and join aliases name no table.
+        for table in set(tables) & set(connection.introspection.table_names(cursor)):
+            cursor.execute(f'SELECT COUNT(*) FROM {connection.ops.quote_name(table)}')
+            sizes[table] = cursor.fetchone()[0]
+        return sizes
+
+
+class Command(BaseCommand):
+    help = "EXPLAIN every query the views run and fail if any of them sequentially scans a large table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-rows', type=int, default=10000,
+                            help="Only flag scans of tables with at least this many rows.")
+
+    def handle(self, *args, **options):
+        pattern = SEQUENTIAL_SCAN_PATTERNS.get(connection.vendor)
+        if pattern is None:
+            raise CommandError(f"Query plan checks are not supported on {connection.vendor}.")
+
+        book_id = Book.objects.values_list('pk', flat=True).first() or 1
+        review_id, user_id = BookReview.objects.values_list('pk', 'user_id').first() or (1, 1)
+        # Never saved: staff, so the export is allowed too.
+        user = CustomUser(pk=user_id, is_staff=True)
+
+        plans = []
+        for name, path, signed_in in view_requests(book_id, review_id, user_id):
+            selects = captured_selects(path, user if signed_in else AnonymousUser())
+            plans.extend(
+                (f"{name} [{number}]", sql, explain(alias, sql))
+                for number, (alias, sql) in enumerate(selects, start=1)
+            )
+        plans.extend((name, str(queryset.query), queryset.explain()) for name, queryset in task_querysets(user_id))
+        scanned = {table for _, _, plan in plans for table in pattern.findall(plan)}
+        sizes = table_sizes(scanned)
+
+        problems = 0
+        for name, sql, plan in plans:
+            large = [table for table in pattern.findall(plan) if table in sizes and sizes[table] >= options['min_rows']]
+            if large:
+                problems += 1
+                tables = ', '.join(f"{table} (~{sizes[table]} rows)" for table in large)
+                self.stdout.write(self.style.ERROR(f"{name}: sequential scan on {tables}"))
+            else:
+                self.stdout.write(f"{name}: ok")
+
+            if options['verbosity'] > 1:
+                self.stdout.write(sql)
+                self.stdout.write(plan)
+
+        if problems:
+            raise CommandError(f"{problems} queries scan large tables sequentially.")
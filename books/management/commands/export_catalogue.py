@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from books.export import EXPORTS, FORMATS, stream_export
+
+
+class Command(BaseCommand):
+    help = "Stream a table to NDJSON or CSV with constant memory, optionally from a created_at watermark."
+
+    def add_arguments(self, parser):
+        parser.add_argument('name', choices=EXPORTS)
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--since', help="ISO timestamp; export rows created at or after it.")
+        parser.add_argument('--output', help="File to write to (default: stdout).")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = parse_datetime(options['since'])
+            except ValueError:
+                since = None
+            if since is None:
+                raise CommandError("--since must be an ISO 8601 timestamp.")
+
+        chunks = stream_export(options['name'], options['format'], since=since, chunk_size=options['chunk_size'])
+
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as output:
+                output.writelines(chunks)
+        else:
+            sys.stdout.writelines(chunks)
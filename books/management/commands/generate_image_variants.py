@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from books.models import Book
+from books.tasks import generate_cover_variants
+from goodreads.images import needs_variants
+from users.models import CustomUser
+from users.tasks import generate_profile_picture_variants
+
+
+class Command(BaseCommand):
+    help = "Queue variant generation for book covers and profile pictures that don't have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sync', action='store_true', help="Render in this process instead of queueing.")
+
+    def handle(self, *args, **options):
+        jobs = (
+            (Book, 'cover_picture', 'cover_variants', generate_cover_variants),
+            (CustomUser, 'profile_picture', 'profile_picture_variants', generate_profile_picture_variants),
+        )
+
+        for model, image_field, variants_field, task in jobs:
+            queued = 0
+            rows = model.objects.only('pk', image_field, variants_field).order_by('pk').iterator()
+            for obj in rows:
+                if needs_variants(getattr(obj, image_field), getattr(obj, variants_field)):
+                    if options['sync']:
+                        task(obj.pk)
+                    else:
+                        task.delay(obj.pk)
+                    queued += 1
+
+            verb = "Generated" if options['sync'] else "Queued"
+            self.stdout.write(self.style.SUCCESS(f"{verb} variants for {queued} {model._meta.verbose_name_plural}."))
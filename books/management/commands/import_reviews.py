@@ -0,0 +1,40 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from books.ingest import ReviewImporter, parse_csv, parse_ndjson
+
+PARSERS = {
+    'ndjson': parse_ndjson,
+    'csv': parse_csv,
+}
+
+
+class Command(BaseCommand):
+    help = "Stream reviews from an NDJSON or CSV file (or - for stdin) into BookReview."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=PARSERS, help="Defaults to the file extension.")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if fmt not in PARSERS:
+            raise CommandError("Pass --format ndjson or --format csv.")
+
+        importer = ReviewImporter(chunk_size=options['chunk_size'])
+
+        # Read as bytes, so a line that isn't UTF-8 is rejected on its own.
+        if path == '-':
+            result = importer.run(PARSERS[fmt](sys.stdin.buffer))
+        else:
+            with open(path, 'rb') as source:
+                result = importer.run(PARSERS[fmt](source))
+
+        for error in result.errors:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+
+        self.stdout.write(self.style.SUCCESS(f"Imported {result.created} reviews, {result.failed} rows rejected."))
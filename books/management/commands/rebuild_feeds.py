@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from books import feeds
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Refill home feeds from the follow graph, e.g. after bulk imports or changing the FEED_* settings."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='users', help="Only this user id (repeatable).")
+
+    def handle(self, *args, **options):
+        # Follows inserted in bulk skip the signals that keep these in sync.
+        feeds.recount_followers()
+
+        user_ids = options['users'] or list(CustomUser.objects.order_by('pk').values_list('pk', flat=True))
+        users = entries = 0
+        for user_id in user_ids:
+            entries += feeds.rebuild(user_id)
+            users += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {users} feeds, {entries} entries."))
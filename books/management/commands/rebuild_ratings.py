@@ -0,0 +1,41 @@
+from django.utils import timezone
+
+from books import cache
+from books.models import Book
+from books.ratings import RATING_FIELDS, compute_ratings
+from goodreads.counters import RebuildCountersCommand
+
+
+class Command(RebuildCountersCommand):
+    help = "Recompute the denormalized rating counters on Book from BookReview, or verify them."
+    label = 'Book'
+    plural = 'books'
+    event_fields = ('old_book_id', 'new_book_id')
+
+    def queryset(self):
+        return Book.objects.only('id', *RATING_FIELDS)
+
+    def compute(self, pks):
+        return compute_ratings(pks)
+
+    def stored(self, book):
+        return {field: getattr(book, field) for field in RATING_FIELDS}
+
+    def drifted(self, book, expected):
+        return any(not self.matches(getattr(book, field), value) for field, value in expected.items())
+
+    def refresh(self, book, expected):
+        for field, value in expected.items():
+            setattr(book, field, value)
+        book.updated_at = timezone.now()
+
+    def save(self, stale):
+        Book.objects.bulk_update(stale, [*RATING_FIELDS, 'updated_at'])
+        for book in stale:
+            cache.invalidate_book(book.pk)
+
+    @staticmethod
+    def matches(stored, expected):
+        if isinstance(expected, float):
+            return abs(stored - expected) < 1e-9
+        return stored == expected
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from goodreads.benchmark import seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Add a synthetic catalogue for benchmarking (defaults are small; e.g. --books 1000000 "
+        "--authors 200000 --reviews 10000000 for a production-sized one). Use a dedicated database, "
+        "and name it with --database-name to confirm."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=1000)
+        parser.add_argument('--authors', type=int, default=200)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--reviews', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20, help="Accounts each new user follows.")
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=0, help="Random seed; the same seed gives the same data.")
+        parser.add_argument(
+            '--database-name', required=True,
+            help="Name of the database to fill; must match the configured one, so nothing is seeded by accident.",
+        )
+        parser.add_argument(
+            '--password', help="Password for the seeded users (benchmark --password); by default they have none.",
+        )
+
+    def handle(self, *args, **options):
+        if options['database_name'] != connection.settings_dict['NAME']:
+            raise CommandError(
+                f"Refusing to seed {connection.settings_dict['NAME']!r}: --database-name doesn't match it."
+            )
+
+        log = self.stdout.write if options['verbosity'] > 1 else (lambda message: None)
+        created = seed(
+            books=options['books'], authors=options['authors'], users=options['users'],
+            reviews=options['reviews'], follows=options['follows'], batch_size=options['batch_size'],
+            seed=options['seed'], password=options['password'], log=log,
+        )
+        summary = ', '.join(f"{count} {kind}" for kind, count in created.items())
+        self.stdout.write(self.style.SUCCESS(f"Seeded {summary}."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from books.rankings import update_rankings
+
+
+class Command(BaseCommand):
+    help = "Fold new reviews into the trending and top-rated rankings, or rebuild them with --full."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Rebuild from every review.")
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        stats = update_rankings(full=options['full'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rankings updated through review {stats['reviews']}: {stats['books']} books re-scored."
+        ))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from books.models import Book
+from books.search import is_postgres, update_search_vectors
+
+
+class Command(BaseCommand):
+    help = "Rebuild Book.search_vector in batches (run once after migrating, or after bulk imports)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--missing-only', action='store_true', help="Only index books without a vector.")
+
+    def handle(self, *args, **options):
+        if not is_postgres():
+            raise CommandError("Full-text search requires PostgreSQL.")
+
+        books = Book.objects.order_by('pk')
+        if options['missing_only']:
+            books = books.filter(search_vector__isnull=True)
+
+        batch_size = options['batch_size']
+        last_pk = 0
+        total = 0
+
+        while True:
+            ids = list(books.filter(pk__gt=last_pk).values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            total += update_search_vectors(ids)
+            last_pk = ids[-1]
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} books."))
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def normalize_isbn(isbn):
+    # Frozen copy of books.models.normalize_isbn as of this migration.
+    value = ''.join(char for char in (isbn or '').upper() if char.isdigit() or char == 'X')
+
+    if len(value) == 10 and value[:9].isdigit():
+        body = '978' + value[:9]
+        check = (10 - sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(body)) % 10) % 10
+        return body + str(check)
+
+    return value
+
+
+def populate_isbn_normalized(apps, schema_editor):
+    # Existing duplicates keep the ISBN on their oldest row only; the rest are
+    # left blank (outside the partial unique constraint) for manual cleanup.
+    Book = apps.get_model('books', 'Book')
+    seen = set()
+    last_pk = 0
+
+    while True:
+        batch = list(Book.objects.filter(pk__gt=last_pk).order_by('pk').only('pk', 'isbn')[:2000])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+
+        for book in batch:
+            value = normalize_isbn(book.isbn)
+            book.isbn_normalized = '' if value in seen else value
+            seen.add(value)
+        Book.objects.bulk_update(batch, ['isbn_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0008_catalogue_created_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='isbn_normalized',
+            field=models.CharField(blank=True, editable=False, max_length=17),
+        ),
+        migrations.AddIndex(
+            model_name='bookreview',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='bookreview_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bookreview',
+            index=models.Index(fields=['book', '-created_at', '-id'], name='bookreview_book_created_idx'),
+        ),
+        migrations.RunPython(populate_isbn_normalized, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='bookreview',
+            name='book',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='books.book'),
+        ),
+        migrations.AlterField(
+            model_name='bookreview',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='book',
+            constraint=models.UniqueConstraint(condition=models.Q(('isbn_normalized', ''), _negated=True), fields=('isbn_normalized',), name='book_isbn_normalized_unique'),
+        ),
+    ]
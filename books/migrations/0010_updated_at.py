@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0009_access_pattern_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='bookreview',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
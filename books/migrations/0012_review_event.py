@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:51
+
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0011_book_cover_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReviewEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('review_id', models.BigIntegerField()),
+                ('old_book_id', models.BigIntegerField(blank=True, null=True)),
+                ('old_stars', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('new_book_id', models.BigIntegerField(blank=True, null=True)),
+                ('new_stars', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+                ('dead', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('dead', False)), fields=['id'], name='reviewevent_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0012_review_event'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reviewevent',
+            name='new_user_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reviewevent',
+            name='old_user_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.1 on 2026-10-18 21:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0014_book_similarity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingWatermark',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('review_id', models.BigIntegerField(default=0)),
+                ('computed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BookPopularity',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='books.book')),
+                ('weekly_score', models.FloatField()),
+                ('monthly_score', models.FloatField()),
+                ('rating_score', models.FloatField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-weekly_score', 'book'], name='bookpopularity_weekly_idx'), models.Index(fields=['-monthly_score', 'book'], name='bookpopularity_monthly_idx'), models.Index(fields=['-rating_score', 'book'], name='bookpopularity_rating_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.1 on 2026-10-18 21:23
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0015_book_popularity'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField()),
+                ('review', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='books.bookreview')),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', '-created_at', '-review'], name='feedentry_user_created_idx')],
+                'constraints': [models.UniqueConstraint(fields=('review', 'user'), name='feedentry_review_user_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Follow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('author', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='followers', to='books.author')),
+                ('follower', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='following', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='followers', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'follower'], name='follow_user_idx'), models.Index(fields=['author', 'follower'], name='follow_author_idx')],
+                'constraints': [models.CheckConstraint(condition=models.Q(models.Q(('author__isnull', True), ('user__isnull', False)), models.Q(('author__isnull', False), ('user__isnull', True)), _connector='OR'), name='follow_user_or_author'), models.CheckConstraint(condition=models.Q(('follower', models.F('user')), _negated=True), name='follow_not_self'), models.UniqueConstraint(fields=('follower', 'user'), name='follow_follower_user_unique'), models.UniqueConstraint(fields=('follower', 'author'), name='follow_follower_author_unique')],
+            },
+        ),
+    ]
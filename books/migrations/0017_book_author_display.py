@@ -0,0 +1,65 @@
+# Generated by Django 5.2.1 on 2026-10-18 21:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_book_authors(apps, schema_editor):
+    BookAuthor = apps.get_model('books', 'BookAuthor')
+    duplicates = BookAuthor.objects.values('book_id', 'author_id').annotate(
+        first=Min('id'), count=Count('id'),
+    ).filter(count__gt=1).order_by()
+    for row in duplicates.iterator():
+        BookAuthor.objects.filter(book_id=row['book_id'], author_id=row['author_id']).exclude(pk=row['first']).delete()
+
+
+def fill_author_display(apps, schema_editor):
+    Book = apps.get_model('books', 'Book')
+    BookAuthor = apps.get_model('books', 'BookAuthor')
+    credits = BookAuthor.objects.order_by('book_id', 'id').values_list(
+        'book_id', 'author__first_name', 'author__last_name',
+    )
+
+    names = {}
+    for book_id, first_name, last_name in credits.iterator():
+        names.setdefault(book_id, []).append(f"{first_name} {last_name}")
+        if len(names) > 1000:
+            # The last book may still have credits to come.
+            last = max(names)
+            store(Book, {book_id: authors for book_id, authors in names.items() if book_id != last})
+            names = {last: names[last]}
+    store(Book, names)
+
+
+def store(Book, names):
+    Book.objects.bulk_update(
+        [Book(pk=book_id, author_display=', '.join(authors)) for book_id, authors in names.items()],
+        ['author_display'], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0016_follow_feedentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='author_display',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(remove_duplicate_book_authors, migrations.RunPython.noop),
+        migrations.RunPython(fill_author_display, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='bookauthor',
+            name='book',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='books.book'),
+        ),
+        migrations.AddConstraint(
+            model_name='bookauthor',
+            constraint=models.UniqueConstraint(fields=('book', 'author'), name='bookauthor_book_author_unique'),
+        ),
+    ]
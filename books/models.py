@@ -1,25 +1,127 @@
+import uuid
+
+from django.contrib.postgres.search import SearchVectorField
+from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, MaxValueValidator
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
 from users.models import CustomUser
 
 
+def normalize_isbn(isbn):
+    """
+    Canonical form used for uniqueness: digits (and a trailing X) only, with
+    ISBN-10s converted to their ISBN-13 so both spellings of a book collide.
+    """
+    value = ''.join(char for char in (isbn or '').upper() if char.isdigit() or char == 'X')
+
+    if len(value) == 10 and value[:9].isdigit():
+        body = '978' + value[:9]
+        check = (10 - sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(body)) % 10) % 10
+        return body + str(check)
+
+    return value
+
+
+class BookQuerySet(models.QuerySet):
+    def for_list(self):
+        return self.only(
+            'id', 'title', 'description', 'cover_picture', 'cover_variants', 'review_count', 'average_rating',
+            'author_display',
+        )
+
+    def by_rating(self):
+        return self.order_by('-average_rating', '-review_count', 'id')
+
+
+class BookReviewQuerySet(models.QuerySet):
+    def for_feed(self):
+        return self.select_related('user', 'book').only(
+            'id', 'comment', 'stars_given', 'created_at',
+            'user', 'user__username', 'user__profile_picture', 'user__profile_picture_variants',
+            'book', 'book__cover_picture', 'book__cover_variants',
+        )
+
+    def for_book_page(self):
+        return self.select_related('user').only(
+            'id', 'book', 'comment', 'stars_given', 'created_at',
+            'user', 'user__username', 'user__profile_picture', 'user__profile_picture_variants',
+        ).order_by('-created_at', '-id')
+
+    def for_api(self):
+        return self.select_related('user', 'book').only(
+            'id', 'comment', 'stars_given', 'created_at',
+            'book', 'book__title', 'book__description', 'book__isbn', 'book__cover_picture', 'book__cover_variants',
+            'user', 'user__username', 'user__first_name', 'user__last_name', 'user__email',
+            'user__profile_picture', 'user__profile_picture_variants',
+        )
+
+
 class Book(models.Model):
     title = models.CharField(max_length=200)
     description = models.TextField()
     isbn = models.CharField('ISBN', max_length=17)
+    isbn_normalized = models.CharField(max_length=17, blank=True, editable=False)
     cover_picture = models.ImageField(default="default_cover.jpg")
+    cover_variants = models.JSONField(default=dict, blank=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # "First Last, First Last" in credit order, kept in sync by books.authors.
+    author_display = models.TextField(blank=True, default='', editable=False)
+
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    stars_total = models.PositiveIntegerField(default=0, editable=False)
+    stars_1 = models.PositiveIntegerField(default=0, editable=False)
+    stars_2 = models.PositiveIntegerField(default=0, editable=False)
+    stars_3 = models.PositiveIntegerField(default=0, editable=False)
+    stars_4 = models.PositiveIntegerField(default=0, editable=False)
+    stars_5 = models.PositiveIntegerField(default=0, editable=False)
+    average_rating = models.FloatField(default=0.0, editable=False)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BookQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-average_rating', '-review_count', 'id'], name='book_rating_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['isbn_normalized'],
+                condition=~models.Q(isbn_normalized=''),
+                name='book_isbn_normalized_unique',
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def clean(self):
+        # Forms skip the constraint on the non-editable column, so check it here.
+        self.isbn_normalized = normalize_isbn(self.isbn)
+        twins = Book.objects.filter(isbn_normalized=self.isbn_normalized).exclude(pk=self.pk)
+        if self.isbn_normalized and twins.exists():
+            raise ValidationError({'isbn': "A book with this ISBN already exists."})
+
+    def save(self, *args, **kwargs):
+        self.isbn_normalized = normalize_isbn(self.isbn)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'isbn' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'isbn_normalized'}
+        super().save(*args, **kwargs)
+
+    def rating_histogram(self):
+        return {stars: getattr(self, f'stars_{stars}') for stars in range(1, 6)}
+
 
 class Author(models.Model):
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
     email = models.EmailField()
     bio = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    follower_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return self.first_name
@@ -29,16 +131,245 @@ class Author(models.Model):
 
 
 class BookAuthor(models.Model):
-    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    # Covered by the leading column of the unique constraint below.
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, db_index=False)
     author = models.ForeignKey(Author, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['book', 'author'], name='bookauthor_book_author_unique'),
+        ]
 
 
 class BookReview(models.Model):
-    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE)
-    book = models.ForeignKey(Book, on_delete=models.CASCADE)
+    # Both foreign keys are covered by the leading column of a composite index below.
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, db_index=False)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, db_index=False)
     comment = models.TextField()
     stars_given = models.IntegerField(
         validators=[MinValueValidator(1), MaxValueValidator(5)]
     )
     created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BookReviewQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='bookreview_created_id_idx'),
+            models.Index(fields=['user', '-created_at', '-id'], name='bookreview_user_created_idx'),
+            models.Index(fields=['book', '-created_at', '-id'], name='bookreview_book_created_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._rating_state = instance.rating_state()
+        return instance
+
+    def rating_state(self):
+        return self.book_id, self.__dict__.get('stars_given'), self.user_id
+
+    def save(self, *args, **kwargs):
+        # Signals record the review's rating events in the outbox; keep them
+        # in the same transaction as the review row.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
+
+
+class Follow(models.Model):
+    """A reader following another reader or an author; exactly one of the two is set."""
+    follower = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='following', db_index=False)
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, null=True, blank=True, related_name='followers', db_index=False,
+    )
+    author = models.ForeignKey(
+        Author, on_delete=models.CASCADE, null=True, blank=True, related_name='followers', db_index=False,
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=(
+                    models.Q(user__isnull=False, author__isnull=True)
+                    | models.Q(user__isnull=True, author__isnull=False)
+                ),
+                name='follow_user_or_author',
+            ),
+            models.CheckConstraint(condition=~models.Q(follower=models.F('user')), name='follow_not_self'),
+            # Also the indexes behind "who do I follow".
+            models.UniqueConstraint(fields=['follower', 'user'], name='follow_follower_user_unique'),
+            models.UniqueConstraint(fields=['follower', 'author'], name='follow_follower_author_unique'),
+        ]
+        indexes = [
+            # Fan-out: everyone following a reader or an author.
+            models.Index(fields=['user', 'follower'], name='follow_user_idx'),
+            models.Index(fields=['author', 'follower'], name='follow_author_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.follower_id} -> {f'user {self.user_id}' if self.user_id else f'author {self.author_id}'}"
+
+
+class FeedEntryQuerySet(models.QuerySet):
+    def for_feed(self):
+        return self.select_related('review__user', 'review__book').only(
+            'created_at', 'review_id',
+            'review__id', 'review__comment', 'review__stars_given', 'review__created_at',
+            'review__user', 'review__user__username', 'review__user__profile_picture',
+            'review__user__profile_picture_variants',
+            'review__book', 'review__book__cover_picture', 'review__book__cover_variants',
+        )
+
+
+class FeedEntry(models.Model):
+    """
+    A review pushed into a reader's home feed by books.feeds. ``created_at``
+    is the review's, so a feed page is a range read of the reader's rows.
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='feed_entries', db_index=False)
+    review = models.ForeignKey(BookReview, on_delete=models.CASCADE, related_name='+', db_index=False)
+    created_at = models.DateTimeField()
+
+    objects = FeedEntryQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-review'], name='feedentry_user_created_idx'),
+        ]
+        constraints = [
+            # Makes redelivered fan-outs no-ops; also the index deleting a review's entries.
+            models.UniqueConstraint(fields=['review', 'user'], name='feedentry_review_user_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.review_id}"
+
+
+class BookSimilarityQuerySet(models.QuerySet):
+    def for_book(self, book_id):
+        return self.filter(book_id=book_id).select_related('similar_book').only(
+            'score', 'similar_book__id', 'similar_book__title', 'similar_book__cover_picture',
+            'similar_book__cover_variants', 'similar_book__average_rating', 'similar_book__review_count',
+        ).order_by('rank')
+
+
+class BookSimilarity(models.Model):
+    """A book's precomputed nearest neighbours, rebuilt offline by books.recommendations."""
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='neighbours', db_index=False)
+    similar_book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    rank = models.PositiveSmallIntegerField()
+
+    objects = BookSimilarityQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Also the index behind "neighbours of a book, best first".
+            models.UniqueConstraint(fields=['book', 'rank'], name='booksimilarity_book_rank_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} ~ {self.similar_book_id} ({self.score:.3f})"
+
+
+class BookPopularityQuerySet(models.QuerySet):
+    def ranked(self, field):
+        return self.select_related('book').only(
+            field, 'book__id', 'book__title', 'book__cover_picture', 'book__cover_variants',
+            'book__average_rating', 'book__review_count',
+        ).order_by(f'-{field}', 'book_id')
+
+
+class BookPopularity(models.Model):
+    """
+    Per-book ranking scores, updated incrementally by books.rankings.
+
+    The trending scores are logs of time-decayed review counts measured
+    against a fixed epoch, so a new review only changes its own book's row
+    and the descending indexes are the ranked lists.
+    """
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='popularity')
+    weekly_score = models.FloatField()
+    monthly_score = models.FloatField()
+    rating_score = models.FloatField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = BookPopularityQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-weekly_score', 'book'], name='bookpopularity_weekly_idx'),
+            models.Index(fields=['-monthly_score', 'book'], name='bookpopularity_monthly_idx'),
+            models.Index(fields=['-rating_score', 'book'], name='bookpopularity_rating_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id}: {self.weekly_score:.3f} / {self.monthly_score:.3f} / {self.rating_score:.3f}"
+
+
+class RankingWatermark(models.Model):
+    """The last BookReview id folded into the rankings."""
+    name = models.CharField(max_length=50, primary_key=True)
+    review_id = models.BigIntegerField(default=0)
+    computed_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.name} @ {self.review_id}"
+
+
+class ReviewEventQuerySet(models.QuerySet):
+    def pending(self):
+        return self.filter(dead=False, available_at__lte=timezone.now())
+
+
+class ReviewEvent(models.Model):
+    """
+    Outbox row for a review's rating change, written in the review's own
+    transaction and applied to the book counters by the event consumer.
+    """
+    key = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    review_id = models.BigIntegerField()
+    old_book_id = models.BigIntegerField(null=True, blank=True)
+    old_stars = models.PositiveSmallIntegerField(null=True, blank=True)
+    new_book_id = models.BigIntegerField(null=True, blank=True)
+    new_stars = models.PositiveSmallIntegerField(null=True, blank=True)
+    old_user_id = models.BigIntegerField(null=True, blank=True)
+    new_user_id = models.BigIntegerField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    dead = models.BooleanField(default=False)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    objects = ReviewEventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['id'], condition=models.Q(dead=False), name='reviewevent_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"Review {self.review_id}: {self.old_state()} -> {self.new_state()}"
+
+    @classmethod
+    def for_change(cls, review_id, old, new):
+        old_book_id, old_stars, old_user_id = old or (None, None, None)
+        new_book_id, new_stars, new_user_id = new or (None, None, None)
+        return cls(
+            review_id=review_id,
+            old_book_id=old_book_id, old_stars=old_stars, old_user_id=old_user_id,
+            new_book_id=new_book_id, new_stars=new_stars, new_user_id=new_user_id,
+        )
+
+    def old_state(self):
+        return None if self.old_book_id is None else (self.old_book_id, self.old_stars, self.old_user_id)
 
+    def new_state(self):
+        return None if self.new_book_id is None else (self.new_book_id, self.new_stars, self.new_user_id)
@@ -0,0 +1,155 @@
+"""
+Trending and top-rated book rankings, maintained incrementally.
+
+A review adds ``exp(rate * (created_at - EPOCH))`` to its book's score for
+each trending list. Every book's score decays by the same factor over time,
+so ordering by the undecayed sum equals ordering by the decayed one and old
+rows never need rewriting. Scores are kept as logs so they can't overflow.
+
+Top-rated is a Bayesian average: each book's ratings padded with
+``PRIOR_REVIEWS`` ratings at the catalogue-wide mean, so a single 5-star
+review doesn't outrank hundreds of 4.8s.
+"""
+import math
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from books.models import Book, BookPopularity, BookReview, RankingWatermark
+
+EPOCH = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+HALF_LIVES = {
+    'weekly_score': timedelta(days=3),
+    'monthly_score': timedelta(days=12),
+}
+RANKINGS = {
+    'weekly': 'weekly_score',
+    'monthly': 'monthly_score',
+    'top-rated': 'rating_score',
+}
+PRIOR_REVIEWS = 10
+# Reviews newer than this are left for the next run: ids are assigned before
+# commit, so a later id can become visible before an earlier one.
+SETTLE_TIME = timedelta(minutes=1)
+WATERMARK = 'books'
+
+
+def decay_rate(field):
+    return math.log(2) / HALF_LIVES[field].total_seconds()
+
+
+def logaddexp(a, b):
+    if a == -math.inf:
+        return b
+    if b == -math.inf:
+        return a
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def current_score(field, log_score, now=None):
+    """A trending score as the decayed review count it stands for."""
+    if field not in HALF_LIVES:
+        return log_score
+    elapsed = ((now or timezone.now()) - EPOCH).total_seconds()
+    return math.exp(log_score - decay_rate(field) * elapsed)
+
+
+def bayesian_average(stars_total, review_count, mean):
+    return (PRIOR_REVIEWS * mean + stars_total) / (PRIOR_REVIEWS + review_count)
+
+
+def collect(after_id, now, chunk_size):
+    """
+    Sum the trending contributions of reviews with ids above ``after_id``, up
+    to the first one created within ``SETTLE_TIME`` of ``now``; return them
+    and the last id. Reviews dated after ``now`` (imports may carry any date)
+    are skipped rather than holding the walk up until then.
+    """
+    cutoff = now - SETTLE_TIME
+    rates = {field: decay_rate(field) for field in HALF_LIVES}
+    scores = {}
+    last_id = after_id
+
+    while True:
+        rows = list(
+            BookReview.objects.filter(pk__gt=last_id).order_by('pk')
+            .values_list('pk', 'book_id', 'created_at')[:chunk_size]
+        )
+        for review_id, book_id, created_at in rows:
+            if created_at > now:
+                last_id = review_id
+                continue
+            if created_at > cutoff:
+                return scores, last_id
+            elapsed = (created_at - EPOCH).total_seconds()
+            book_scores = scores.setdefault(book_id, dict.fromkeys(HALF_LIVES, -math.inf))
+            for field, rate in rates.items():
+                book_scores[field] = logaddexp(book_scores[field], rate * elapsed)
+            last_id = review_id
+        if len(rows) < chunk_size:
+            return scores, last_id
+
+
+def update_rankings(full=False, chunk_size=5000):
+    """
+    Fold reviews added since the watermark into the rankings, or with
+    ``full`` rebuild them from every review (which also drops deleted
+    reviews and refreshes every book's top-rated score against the current
+    mean). Return ``{'reviews': last review id, 'books': rows written}``.
+    """
+    now = timezone.now()
+
+    with transaction.atomic():
+        watermark, _ = RankingWatermark.objects.select_for_update().get_or_create(name=WATERMARK)
+        scores, last_id = collect(0 if full else watermark.review_id, now, chunk_size)
+
+        totals = Book.objects.aggregate(stars=Sum('stars_total'), reviews=Sum('review_count'))
+        mean = (totals['stars'] or 0) / totals['reviews'] if totals['reviews'] else 0.0
+
+        if full:
+            # Readers keep seeing the old rows until this commits.
+            BookPopularity.objects.all().delete()
+        written = 0
+        book_ids = list(scores)
+        for start in range(0, len(book_ids), chunk_size):
+            written += store(book_ids[start:start + chunk_size], scores, mean, replace=full)
+
+        watermark.review_id = last_id
+        watermark.computed_at = now
+        watermark.save()
+
+    return {'reviews': last_id, 'books': written}
+
+
+def store(book_ids, scores, mean, replace):
+    existing = {} if replace else {
+        row.book_id: row for row in BookPopularity.objects.filter(book_id__in=book_ids)
+    }
+    counters = Book.objects.filter(pk__in=book_ids).values_list('pk', 'stars_total', 'review_count')
+
+    rows = []
+    for book_id, stars_total, review_count in counters:
+        row = existing.get(book_id)
+        rows.append(BookPopularity(
+            book_id=book_id,
+            rating_score=bayesian_average(stars_total, review_count, mean),
+            **{
+                field: logaddexp(getattr(row, field) if row else -math.inf, scores[book_id][field])
+                for field in HALF_LIVES
+            },
+        ))
+
+    BookPopularity.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['book'],
+        update_fields=[*HALF_LIVES, 'rating_score', 'updated_at'],
+    )
+    return len(rows)
+
+
+def ranked(ranking, limit):
+    """The top ``limit`` books of a ranking, best first: one indexed read."""
+    field = RANKINGS[ranking]
+    return BookPopularity.objects.ranked(field)[:limit]
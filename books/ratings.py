@@ -0,0 +1,82 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, FloatField, Q, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.utils import timezone
+
+STAR_FIELDS = {stars: f'stars_{stars}' for stars in range(1, 6)}
+RATING_FIELDS = ('review_count', 'stars_total', *STAR_FIELDS.values(), 'average_rating')
+
+
+def rating_deltas(changes):
+    """
+    Fold ``(old, new)`` review states into per-book counter deltas.
+
+    Each state is a review's ``(book_id, stars_given, user_id)`` or ``None``
+    (the review did not exist before / no longer exists).
+    """
+    deltas = defaultdict(lambda: defaultdict(int))
+
+    for old, new in changes:
+        if old == new:
+            continue
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None or state[1] is None:
+                continue
+            book_id, stars = state[:2]
+            delta = deltas[book_id]
+            delta['review_count'] += sign
+            delta['stars_total'] += sign * stars
+            delta[STAR_FIELDS[stars]] += sign
+
+    return {
+        book_id: {field: value for field, value in delta.items() if value}
+        for book_id, delta in deltas.items()
+        if any(delta.values())
+    }
+
+
+def apply_rating_deltas(deltas):
+    """Apply per-book deltas with one atomic ``UPDATE ... SET x = x + n`` per book."""
+    from books.models import Book
+
+    for book_id, delta in deltas.items():
+        updates = {field: F(field) + value for field, value in delta.items()}
+        count = F('review_count') + delta.get('review_count', 0)
+        total = F('stars_total') + delta.get('stars_total', 0)
+        updates['average_rating'] = running_average(total, count)
+        updates['updated_at'] = timezone.now()
+        Book.objects.filter(pk=book_id).update(**updates)
+
+
+def running_average(total, count):
+    """SQL ``total / count`` as a float, 0.0 when ``count`` is zero."""
+    return Coalesce(
+        Cast(total, FloatField()) / NullIf(Cast(count, FloatField()), Value(0.0)),
+        Value(0.0),
+    )
+
+
+def compute_ratings(book_ids):
+    """Aggregate the exact rating counters for ``book_ids`` from BookReview."""
+    from books.models import BookReview
+
+    rows = BookReview.objects.filter(book_id__in=book_ids).values('book_id').annotate(
+        review_count=Count('id'),
+        stars_total=Sum('stars_given'),
+        **{field: Count('id', filter=Q(stars_given=stars)) for stars, field in STAR_FIELDS.items()},
+    ).order_by()
+
+    ratings = {book_id: empty_ratings() for book_id in book_ids}
+    for row in rows:
+        book_id = row.pop('book_id')
+        row['average_rating'] = row['stars_total'] / row['review_count']
+        ratings[book_id] = row
+
+    return ratings
+
+
+def empty_ratings():
+    ratings = {field: 0 for field in RATING_FIELDS}
+    ratings['average_rating'] = 0.0
+    return ratings
@@ -0,0 +1,180 @@
+"""
+Offline item-item recommendations from BookReview ratings.
+
+Ratings are streamed into a sparse users x books matrix, centred on each
+reader's mean (adjusted cosine, so a harsh and a generous reader who agree
+on the order of two books count as agreeing) and compared column block by
+column block. Each book keeps its ``top_k`` neighbours in BookSimilarity.
+
+NumPy and SciPy are only imported here, by the job, never by web processes.
+"""
+from itertools import islice
+
+from django.db import transaction
+
+from books import cache
+from books.models import BookReview, BookSimilarity
+
+TOP_K = 20
+# Pairs need this many common readers; one shared reader says nothing.
+MIN_SUPPORT = 2
+# Damps scores backed by few readers: score * n / (n + SHRINKAGE).
+SHRINKAGE = 10
+MIN_SCORE = 0.01
+SCORE_DIGITS = 4
+
+
+def load_ratings(chunk_size=50000):
+    """
+    Return ``(ratings, book_ids)``: a users x books CSR matrix of stars and
+    the book id of each column, or ``(None, [])`` when there are no reviews.
+    A reader's repeated reviews of one book are averaged.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    rows = BookReview.objects.order_by().values_list('user_id', 'book_id', 'stars_given').iterator(
+        chunk_size=chunk_size
+    )
+    users, books, stars = [], [], []
+    while chunk := list(islice(rows, chunk_size)):
+        array = np.array(chunk, dtype=np.int64)
+        users.append(array[:, 0])
+        books.append(array[:, 1])
+        stars.append(array[:, 2].astype(np.float32))
+
+    if not users:
+        return None, []
+
+    user_ids, user_index = np.unique(np.concatenate(users), return_inverse=True)
+    book_ids, book_index = np.unique(np.concatenate(books), return_inverse=True)
+    stars = np.concatenate(stars)
+    shape = (len(user_ids), len(book_ids))
+
+    ratings = sparse.csr_matrix((stars, (user_index, book_index)), shape=shape)
+    counts = sparse.csr_matrix((np.ones_like(stars), (user_index, book_index)), shape=shape)
+    ratings.sum_duplicates()
+    counts.sum_duplicates()
+    ratings.data /= counts.data
+
+    return ratings, book_ids.tolist()
+
+
+def normalized_columns(ratings):
+    """Centre each reader's ratings on their mean and scale every book column to unit length."""
+    import numpy as np
+    from scipy import sparse
+
+    centred = ratings.astype(np.float64, copy=True)
+    per_user = np.diff(centred.indptr)
+    means = np.divide(
+        np.asarray(centred.sum(axis=1)).ravel(), per_user,
+        out=np.zeros(len(per_user)), where=per_user > 0,
+    )
+    centred.data -= np.repeat(means, per_user)
+    centred.eliminate_zeros()
+
+    norms = np.sqrt(np.asarray(centred.multiply(centred).sum(axis=0)).ravel())
+    scale = np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)
+    return centred @ sparse.diags(scale)
+
+
+def neighbours(ratings, top_k=TOP_K, min_support=MIN_SUPPORT, shrinkage=SHRINKAGE, block_size=1000):
+    """
+    Yield ``(column, [(neighbour column, score), ...])`` for every book with
+    neighbours, best first. Similarities are computed ``block_size`` columns
+    at a time so memory stays bounded by ``books x block_size`` non-zeros.
+    """
+    import numpy as np
+
+    vectors = normalized_columns(ratings)
+    readers = (ratings != 0).astype(np.float64)
+    vectors_t, readers_t = vectors.T.tocsr(), readers.T.tocsr()
+    vectors, readers = vectors.tocsc(), readers.tocsc()
+
+    n_books = ratings.shape[1]
+    for start in range(0, n_books, block_size):
+        end = min(start + block_size, n_books)
+        similarity = (vectors_t @ vectors[:, start:end]).tocsc()
+        support = (readers_t @ readers[:, start:end]).tocsc()
+        similarity.sort_indices()
+        support.sort_indices()
+
+        for offset in range(end - start):
+            column = start + offset
+            sim_slice = slice(similarity.indptr[offset], similarity.indptr[offset + 1])
+            sup_slice = slice(support.indptr[offset], support.indptr[offset + 1])
+            candidates, scores = similarity.indices[sim_slice], similarity.data[sim_slice]
+            if not len(candidates):
+                continue
+
+            # Every non-zero similarity has at least one common reader, so the
+            # candidates are always present in the support column.
+            sup_indices, sup_counts = support.indices[sup_slice], support.data[sup_slice]
+            common = sup_counts[np.searchsorted(sup_indices, candidates)]
+
+            scores = scores * common / (common + shrinkage)
+            keep = (candidates != column) & (common >= min_support) & (scores >= MIN_SCORE)
+            candidates, scores = candidates[keep], scores[keep]
+            if not len(candidates):
+                continue
+
+            if len(candidates) > top_k:
+                best = np.argpartition(-scores, top_k - 1)[:top_k]
+                candidates, scores = candidates[best], scores[best]
+            order = np.lexsort((candidates, -scores))
+            yield column, [(int(candidates[i]), round(float(scores[i]), SCORE_DIGITS)) for i in order]
+
+
+def build_recommendations(top_k=TOP_K, min_support=MIN_SUPPORT, chunk_size=50000, block_size=1000):
+    """Recompute every book's neighbour list; only books whose list changed are rewritten."""
+    ratings, book_ids = load_ratings(chunk_size)
+    stats = {'ratings': 0, 'books': len(book_ids), 'updated': 0, 'removed': 0}
+    computed = set()
+    pending = {}
+
+    if ratings is not None:
+        stats['ratings'] = ratings.nnz
+        for column, similar in neighbours(ratings, top_k, min_support, block_size=block_size):
+            book_id = book_ids[column]
+            pending[book_id] = [(book_ids[other], score) for other, score in similar]
+            computed.add(book_id)
+            if len(pending) >= block_size:
+                stats['updated'] += store(pending)
+                pending = {}
+        stats['updated'] += store(pending)
+
+    # Books that lost all their neighbours (or all their readers) since the last run.
+    listed = BookSimilarity.objects.order_by().values_list('book_id', flat=True).distinct()
+    stale = [book_id for book_id in listed.iterator() if book_id not in computed]
+    for start in range(0, len(stale), block_size):
+        stats['removed'] += store({book_id: [] for book_id in stale[start:start + block_size]})
+
+    return stats
+
+
+def store(neighbour_lists):
+    """Replace the neighbour rows of the given books if they changed; return how many did."""
+    if not neighbour_lists:
+        return 0
+
+    existing = {}
+    rows = BookSimilarity.objects.filter(book_id__in=list(neighbour_lists)).order_by('book_id', 'rank')
+    for book_id, similar_id, score in rows.values_list('book_id', 'similar_book_id', 'score'):
+        existing.setdefault(book_id, []).append((similar_id, score))
+
+    changed = [book_id for book_id, similar in neighbour_lists.items() if existing.get(book_id, []) != similar]
+    if not changed:
+        return 0
+
+    with transaction.atomic():
+        BookSimilarity.objects.filter(book_id__in=changed).delete()
+        BookSimilarity.objects.bulk_create([
+            BookSimilarity(book_id=book_id, similar_book_id=similar_id, score=score, rank=rank)
+            for book_id in changed
+            for rank, (similar_id, score) in enumerate(neighbour_lists[book_id])
+        ])
+        for book_id in changed:
+            cache.invalidate('books.book', book_id)
+
+    return len(changed)
@@ -0,0 +1,73 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramSimilarity
+from django.db import connection
+from django.db.models import F, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Concat
+
+SEARCH_CONFIG = 'english'
+TRIGRAM_THRESHOLD = 0.3
+
+
+def is_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def author_names_subquery():
+    from books.models import BookAuthor
+
+    return Subquery(
+        BookAuthor.objects.filter(book=OuterRef('pk'))
+        .values('book')
+        .annotate(names=StringAgg(Concat('author__first_name', Value(' '), 'author__last_name'), delimiter=' '))
+        .values('names'),
+        output_field=TextField(),
+    )
+
+
+def book_search_vector():
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('isbn', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(author_names_subquery(), weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(book_ids):
+    """Recompute ``Book.search_vector`` for the given books in one UPDATE."""
+    from books.models import Book
+
+    if not is_postgres():
+        return 0
+
+    return Book.objects.filter(pk__in=list(book_ids)).update(search_vector=book_search_vector())
+
+
+def search_books(queryset, query):
+    """
+    Ranked full-text search over title, ISBN, author names and description.
+
+    Falls back to trigram similarity on the title when the full-text query
+    matches nothing (typos, partial words), and to a plain ``icontains``
+    scan on databases without PostgreSQL search support.
+    """
+    if not is_postgres():
+        return queryset.filter(
+            Q(title__icontains=query)
+            | Q(description__icontains=query)
+            | Q(isbn__icontains=query)
+            | Q(bookauthor__author__first_name__icontains=query)
+            | Q(bookauthor__author__last_name__icontains=query)
+        ).distinct().order_by('id')
+
+    search_query = SearchQuery(query, search_type='websearch', config=SEARCH_CONFIG)
+    results = queryset.filter(search_vector=search_query).annotate(
+        rank=SearchRank(F('search_vector'), search_query)
+    ).order_by('-rank', 'id')
+
+    if results.exists():
+        return results
+
+    return queryset.filter(title__trigram_similar=query).annotate(
+        rank=TrigramSimilarity('title', query)
+    ).filter(rank__gt=TRIGRAM_THRESHOLD).order_by('-rank', 'id')
@@ -0,0 +1,149 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from books import cache, feeds
+from books.authors import update_author_display
+from books.models import Author, Book, BookAuthor, BookReview, Follow
+from books.events import publish_review_events
+from books.search import update_search_vectors
+from books.tasks import backfill_feed, fan_out_reviews, generate_cover_variants
+from goodreads.images import needs_variants
+from users.models import CustomUser
+
+# Reviewer fields shown next to their reviews on book pages.
+REVIEWER_FIELDS = {'username', 'profile_picture', 'profile_picture_variants'}
+
+
+@receiver(post_save, sender=Book)
+def reindex_book(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'search_vector'}:
+        return
+    update_search_vectors([instance.pk])
+
+
+@receiver(post_save, sender=Book)
+def schedule_cover_variants(sender, instance, update_fields=None, **kwargs):
+    if update_fields and 'cover_picture' not in update_fields:
+        return
+    if {'cover_picture', 'cover_variants'} & instance.get_deferred_fields():
+        return
+    if needs_variants(instance.cover_picture, instance.cover_variants):
+        transaction.on_commit(lambda: generate_cover_variants.delay(instance.pk))
+
+
+@receiver(post_save, sender=BookAuthor)
+@receiver(post_delete, sender=BookAuthor)
+def reindex_book_authors(sender, instance, **kwargs):
+    update_search_vectors([instance.book_id])
+
+
+@receiver(post_save, sender=Author)
+def reindex_author_books(sender, instance, created, **kwargs):
+    if not created:
+        update_search_vectors(BookAuthor.objects.filter(author=instance).values_list('book_id', flat=True))
+
+
+@receiver(post_save, sender=BookAuthor)
+@receiver(post_delete, sender=BookAuthor)
+def update_book_author_display(sender, instance, **kwargs):
+    update_author_display([instance.book_id])
+
+
+@receiver(post_save, sender=Author)
+def update_author_books_display(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not {'first_name', 'last_name'} & set(update_fields)):
+        return
+    update_author_display(BookAuthor.objects.filter(author=instance).values_list('book_id', flat=True))
+
+
+@receiver(post_save, sender=BookReview)
+def update_book_ratings_on_save(sender, instance, created, **kwargs):
+    old = None if created else getattr(instance, '_rating_state', None)
+    new = instance.rating_state()
+    if new[1] is None and old is not None:
+        new = (new[0], old[1], new[2])
+
+    review_changed(instance, [(old, new)])
+    instance._rating_state = new
+
+    if created:
+        transaction.on_commit(lambda: fan_out_reviews.delay([instance.pk]))
+
+
+@receiver(post_delete, sender=BookReview)
+def update_book_ratings_on_delete(sender, instance, **kwargs):
+    old = getattr(instance, '_rating_state', None) or instance.rating_state()
+    review_changed(instance, [(old, None)])
+
+
+def review_changed(review, changes):
+    # Counter updates go through the outbox; only cheap cache bumps stay inline
+    # so the review and its book page stop serving stale fragments right away.
+    publish_review_events([(review.pk, old, new) for old, new in changes])
+
+    cache.invalidate('books.bookreview', review.pk)
+    for book_id in {state[0] for change in changes for state in change if state} | {review.book_id}:
+        cache.invalidate_book(book_id)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_book_fragments(sender, instance, **kwargs):
+    cache.invalidate_book(instance.pk)
+
+
+@receiver(post_save, sender=BookAuthor)
+@receiver(post_delete, sender=BookAuthor)
+def invalidate_book_author_fragments(sender, instance, **kwargs):
+    touch_books([instance.book_id])
+    cache.invalidate_book(instance.book_id)
+
+
+@receiver(post_save, sender=Author)
+def invalidate_author_fragments(sender, instance, **kwargs):
+    book_ids = list(BookAuthor.objects.filter(author=instance).values_list('book_id', flat=True))
+    touch_books(book_ids)
+    for book_id in book_ids:
+        cache.invalidate_book(book_id)
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_reviewer_fragments(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields and not REVIEWER_FIELDS & set(update_fields)):
+        return
+    reviewed_books_changed(instance.pk)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        feeds.count_follow(instance, 1)
+        transaction.on_commit(lambda: backfill_feed.delay(instance.pk))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    feeds.unfollowed(instance)
+    if feeds.count_follow(instance, -1) == settings.FEED_FANOUT_LIMIT - 1:
+        # Back under the limit: its reviews stop being read live, so push the
+        # recent ones written while they weren't fanned out.
+        newest = feeds.followed_reviews(instance).order_by('-created_at', '-id').values_list('pk', flat=True)
+        review_ids = list(newest[:settings.FEED_BACKFILL])
+        transaction.on_commit(lambda: fan_out_reviews.delay(review_ids))
+
+
+def reviewed_books_changed(user_id):
+    """A reviewer's name or picture changed: the pages of the books they reviewed are stale."""
+    book_ids = list(BookReview.objects.filter(user_id=user_id).values_list('book_id', flat=True).distinct())
+    touch_books(book_ids)
+    for book_id in book_ids:
+        cache.invalidate('books.book', book_id)
+
+
+def touch_books(book_ids):
+    """Bump ``updated_at`` on books whose pages changed through a related row."""
+    if book_ids:
+        Book.objects.filter(pk__in=book_ids).update(updated_at=timezone.now())
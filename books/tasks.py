@@ -0,0 +1,77 @@
+import logging
+
+from django.conf import settings
+from django.db import InterfaceError, OperationalError
+from django.utils import timezone
+
+from books import cache, events, feeds, rankings, recommendations
+from books.models import Book, ReviewEvent
+from goodreads.celery import app
+from goodreads.images import build_variants, needs_variants
+
+logger = logging.getLogger(__name__)
+
+
+@app.task(ignore_result=True)
+def bump_fragment_version(label, pk):
+    cache.bump_version(label, pk)
+
+
+@app.task()
+def generate_cover_variants(book_id):
+    book = Book.objects.only('id', 'cover_picture', 'cover_variants').filter(pk=book_id).first()
+    if book is None or not needs_variants(book.cover_picture, book.cover_variants):
+        return
+
+    variants = build_variants(book.cover_picture, 'cover')
+    if variants is None:
+        return
+
+    # Only store the map if the cover wasn't replaced while we were rendering.
+    Book.objects.filter(pk=book_id, cover_picture=book.cover_picture.name).update(
+        cover_variants=variants, updated_at=timezone.now(),
+    )
+    cache.invalidate_book(book_id)
+
+
+@app.task(
+    acks_late=True,
+    autoretry_for=(OperationalError, InterfaceError),
+    retry_backoff=True,
+    retry_jitter=True,
+    max_retries=8,
+)
+def process_review_events():
+    processed = events.drain(max_batches=settings.REVIEW_EVENT_MAX_BATCHES)
+    # Hand the worker back between long backlogs instead of draining forever.
+    if processed and ReviewEvent.objects.pending().exists():
+        process_review_events.delay()
+    return processed
+
+
+@app.task()
+def dead_letter_review_event(payload):
+    # Routed to the dead-letter queue, where the message stays for inspection;
+    # the outbox row is kept too (dead=True) and can be requeued from the admin.
+    logger.error("Review event %s dead-lettered: %s", payload['key'], payload['error'])
+
+
+@app.task(acks_late=True)
+def build_recommendations():
+    return recommendations.build_recommendations()
+
+
+@app.task(acks_late=True)
+def update_rankings(full=False):
+    return rankings.update_rankings(full=full)
+
+
+@app.task(acks_late=True, autoretry_for=(OperationalError, InterfaceError), retry_backoff=True, max_retries=5)
+def fan_out_reviews(review_ids):
+    # Entries are unique per (review, user), so a redelivered fan-out is a no-op.
+    return feeds.fan_out(review_ids)
+
+
+@app.task()
+def backfill_feed(follow_id):
+    return feeds.backfill(follow_id)
@@ -0,0 +1,66 @@
+from django import template
+
+from books import cache
+
+register = template.Library()
+
+VERSIONS_KEY = 'fragment_versions'
+
+
+def prefetched_versions(context):
+    return context.render_context.setdefault(VERSIONS_KEY, {})
+
+
+@register.simple_tag(takes_context=True)
+def prefetch_fragment_versions(context, objects):
+    """
+    Load the fragment versions for a whole page of objects in one cache
+    round-trip so the ``cachefragment`` blocks inside a loop don't each do it.
+    """
+    objects = list(objects)
+    if objects:
+        label = cache.object_label(objects[0])
+        versions = prefetched_versions(context).setdefault(label, {})
+        versions.update(cache.get_versions(label, [obj.pk for obj in objects]))
+    return ''
+
+
+class CacheFragmentNode(template.Node):
+    def __init__(self, nodelist, name, obj, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.obj = obj
+        self.vary_on = vary_on
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        obj = self.obj.resolve(context)
+        vary_on = [value.resolve(context) for value in self.vary_on]
+        versions = prefetched_versions(context).setdefault(cache.object_label(obj), {})
+
+        return cache.get_or_render(name, obj, lambda: self.nodelist.render(context), vary_on, versions)
+
+
+@register.tag
+def cachefragment(parser, token):
+    """
+    Cache the enclosed template fragment for one model instance::
+
+        {% cachefragment "book-header" book %} ... {% endcachefragment %}
+
+    The key includes the instance's version, which model signals bump
+    whenever the instance (or something rendered with it) changes.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires a fragment name and an object.")
+
+    nodelist = parser.parse(('endcachefragment',))
+    parser.delete_first_token()
+
+    return CacheFragmentNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
@@ -0,0 +1,36 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html
+
+from goodreads.images import pick_variant, variant_images
+
+register = template.Library()
+
+
+@register.simple_tag
+def picture(field, variants, width, height, loading='lazy', **attrs):
+    """
+    Render an image field into a ``width`` x ``height`` slot.
+
+    Once variants exist this is a ``<picture>`` with a WebP source and a JPEG
+    fallback, both with ``w`` srcsets so the browser downloads the smallest
+    file that fills the slot at its pixel density. Until then it falls back
+    to the original upload.
+    """
+    attrs = {'width': width, 'height': height, 'loading': loading, 'decoding': 'async', **attrs}
+    images = variant_images(field, variants)
+    if not images:
+        return format_html('<img src="{}"{}>', field.url, flatatt(attrs))
+
+    sizes = f'{width}px'
+    fallback = pick_variant(images, int(width))
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+        srcset(images, 'webp'), sizes,
+        fallback['jpeg'], srcset(images, 'jpeg'), sizes, flatatt(attrs),
+    )
+
+
+def srcset(images, fmt):
+    return ', '.join(f"{image[fmt]} {image['width']}w" for image in images)
@@ -1,9 +1,33 @@
+import csv
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.management import call_command, CommandError
+from django.core.cache import cache as django_cache
+from django.db import DatabaseError, IntegrityError, connection, transaction
 from django.http import response
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.shortcuts import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from PIL import Image
 
+from goodreads import benchmark
+from goodreads.testing import QueryCountMixin
 from users.models import CustomUser
-from .models import Book, BookReview
+from . import authors, cache, events, rankings, recommendations
+from .models import (
+    Author, Book, BookAuthor, BookPopularity, BookReview, BookSimilarity, FeedEntry, Follow, ReviewEvent,
+)
+from .tasks import generate_cover_variants
 
 
 class BooksTestCase(TestCase):
@@ -60,6 +84,27 @@ class BooksTestCase(TestCase):
         self.assertNotContains(response, book2.title)
         self.assertContains(response, book3.title)
 
+    def test_search_books_by_author_and_description(self):
+        book1 = Book.objects.create(title='sport', description='all about football', isbn='1234234')
+        book2 = Book.objects.create(title='Shoe', description='description2', isbn='2222222')
+        author = Author.objects.create(first_name='Abdulla', last_name='Qodiriy', email='a@a.com', bio='bio')
+        BookAuthor.objects.create(book=book2, author=author)
+
+        response = self.client.get(reverse("books:list") + "?q=football")
+        self.assertContains(response, book1.title)
+        self.assertNotContains(response, book2.title)
+
+        response = self.client.get(reverse("books:list") + "?q=Qodiriy")
+        self.assertContains(response, book2.title)
+        self.assertNotContains(response, book1.title)
+
+    @skipUnless(connection.vendor == 'postgresql', "Trigram search requires PostgreSQL")
+    def test_search_books_with_typo(self):
+        book = Book.objects.create(title='Harry Potter', description='description1', isbn='1234234')
+
+        response = self.client.get(reverse("books:list") + "?q=Hary Poter")
+        self.assertContains(response, book.title)
+
 
 class BookReviewTestCase(TestCase):
     def test_add_review(self):
@@ -83,7 +128,936 @@ class BookReviewTestCase(TestCase):
         self.assertEqual(book_review[0].user, user)
 
 
+class BookRatingTestCase(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title='sport', description='description1', isbn='1234234')
+        self.user = CustomUser.objects.create(username='sayitkamol', first_name='sayitkamol')
+        self.user.set_password('qiyinparol')
+        self.user.save()
+        self.client.login(username='sayitkamol', password='qiyinparol')
+
+    def assertRatings(self, review_count, stars_total, histogram):
+        events.drain()
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.review_count, review_count)
+        self.assertEqual(self.book.stars_total, stars_total)
+        self.assertEqual(self.book.rating_histogram(), histogram)
+        self.assertAlmostEqual(self.book.average_rating, stars_total / review_count if review_count else 0.0)
+
+    def test_review_views_update_ratings(self):
+        self.client.post(reverse("books:reviews", kwargs={"id": self.book.id}), data={
+            "stars_given": 3,
+            "comment": "Nice book"
+        })
+        self.client.post(reverse("books:reviews", kwargs={"id": self.book.id}), data={
+            "stars_given": 5,
+            "comment": "Great book"
+        })
+        self.assertRatings(2, 8, {1: 0, 2: 0, 3: 1, 4: 0, 5: 1})
+
+        review = BookReview.objects.get(stars_given=3)
+        self.client.post(
+            reverse("books:edit-review", kwargs={"book_id": self.book.id, "review_id": review.id}),
+            data={"stars_given": 1, "comment": "Changed my mind"}
+        )
+        self.assertRatings(2, 6, {1: 1, 2: 0, 3: 0, 4: 0, 5: 1})
+
+        self.client.get(reverse("books:delete-review", kwargs={"book_id": self.book.id, "review_id": review.id}))
+        self.assertRatings(1, 5, {1: 0, 2: 0, 3: 0, 4: 0, 5: 1})
+
+    def test_rebuild_ratings_command(self):
+        BookReview.objects.create(book=self.book, user=self.user, stars_given=4, comment="good")
+        events.drain()
+        Book.objects.filter(pk=self.book.pk).update(review_count=7, stars_4=0)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_ratings', '--verify', stdout=StringIO())
+
+        call_command('rebuild_ratings', stdout=StringIO())
+
+        self.assertRatings(1, 4, {1: 0, 2: 0, 3: 0, 4: 1, 5: 0})
+        call_command('rebuild_ratings', '--verify', stdout=StringIO())
+
+    def test_rebuild_skips_reviews_written_during_the_run(self):
+        drain = events.drain
+
+        def drain_then_review():
+            drain()
+            # Written while the rebuild runs: its event is still pending.
+            BookReview.objects.create(book=self.book, user=self.user, stars_given=4, comment="good")
+
+        out = StringIO()
+        with mock.patch('books.events.drain', side_effect=drain_then_review):
+            call_command('rebuild_ratings', stdout=out)
+
+        self.assertIn("rebuilt 0 (1 with pending review events skipped)", out.getvalue())
+        self.assertRatings(1, 4, {1: 0, 2: 0, 3: 0, 4: 1, 5: 0})
+
+    def test_verify_leaves_pending_events_alone(self):
+        BookReview.objects.create(book=self.book, user=self.user, stars_given=4, comment="good")
+
+        out = StringIO()
+        call_command('rebuild_ratings', '--verify', stdout=out)
+
+        self.assertIn("1 with pending review events skipped", out.getvalue())
+        self.assertEqual(ReviewEvent.objects.count(), 1)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.review_count, 0)
+
+    def test_sort_by_rating(self):
+        other = Book.objects.create(title='Shoe', description='description2', isbn='2222222')
+        BookReview.objects.create(book=self.book, user=self.user, stars_given=2, comment="meh")
+        BookReview.objects.create(book=other, user=self.user, stars_given=5, comment="great")
+        events.drain()
+
+        response = self.client.get(reverse("books:list") + "?sort=rating&page_size=10")
+
+        self.assertEqual(list(response.context['page_obj'].object_list), [other, self.book])
+
+
+class ImportReviewsCommandTestCase(TestCase):
+    def test_import_reviews_from_csv(self):
+        book = Book.objects.create(title='sport', description='description1', isbn='1234234')
+        user = CustomUser.objects.create(username='sayitkamol', first_name='sayitkamol')
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as source:
+            source.write("book_id,user_id,stars_given,comment,created_at\n")
+            source.write(f"{book.id},{user.id},5,great,2024-01-01 10:00\n")
+            source.write(f"{book.id},{user.id},0,bad stars,\n")
+        self.addCleanup(os.remove, source.name)
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_reviews', source.name, '--chunk-size', '1', stdout=stdout, stderr=stderr)
+
+        self.assertIn("Imported 1 reviews, 1 rows rejected.", stdout.getvalue())
+        self.assertIn("Row 2:", stderr.getvalue())
+        review = BookReview.objects.get()
+        self.assertEqual(review.created_at.year, 2024)
+        events.drain()
+        book.refresh_from_db()
+        self.assertEqual(book.review_count, 1)
+
+    def test_import_reviews_rejects_lines_that_are_not_utf8(self):
+        book = Book.objects.create(title='sport', description='description1', isbn='1234234')
+        user = CustomUser.objects.create(username='sayitkamol', first_name='sayitkamol')
+
+        with tempfile.NamedTemporaryFile('wb', suffix='.ndjson', delete=False) as source:
+            source.write(b'{"comment": "\xff"}\n')
+            row = {"book_id": book.id, "user_id": user.id, "stars_given": 4, "comment": "ok"}
+            source.write(json.dumps(row).encode())
+        self.addCleanup(os.remove, source.name)
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_reviews', source.name, stdout=stdout, stderr=stderr)
+
+        self.assertIn("Imported 1 reviews, 1 rows rejected.", stdout.getvalue())
+        self.assertIn("Row 1:", stderr.getvalue())
+
+    def test_import_reviews_rejects_bad_csv_rows(self):
+        book = Book.objects.create(title='sport', description='description1', isbn='1234234')
+        user = CustomUser.objects.create(username='sayitkamol', first_name='sayitkamol')
+
+        with tempfile.NamedTemporaryFile('wb', suffix='.csv', delete=False) as source:
+            source.write(b"book_id,user_id,stars_given,comment\n")
+            source.write(f'{book.id},{user.id},4,"spans\r\nlines"\r\n'.encode())
+            source.write(f"{book.id},{user.id},4,\xff\n".encode('latin-1'))
+            source.write(f'{book.id},{user.id},4,"{"x" * csv.field_size_limit()}x"\n'.encode())
+            source.write(f"{book.id},{user.id},3,ok\n".encode())
+        self.addCleanup(os.remove, source.name)
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_reviews', source.name, stdout=stdout, stderr=stderr)
+
+        self.assertIn("Imported 2 reviews, 2 rows rejected.", stdout.getvalue())
+        self.assertIn("Row 2: {\"__all__\": [\"Invalid UTF-8", stderr.getvalue())
+        self.assertIn("Row 3: {\"__all__\": [\"Invalid CSV", stderr.getvalue())
+        self.assertEqual(sorted(BookReview.objects.values_list('comment', flat=True)), ['ok', 'spans\r\nlines'])
+
+
+class ExportCatalogueCommandTestCase(TestCase):
+    def test_export_authors_to_file(self):
+        author = Author.objects.create(first_name='Abdulla', last_name='Qodiriy', email='a@a.com', bio='bio')
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'authors.ndjson')
+            call_command('export_catalogue', 'authors', '--output', path, '--chunk-size', '1')
+            with open(path) as output:
+                rows = [json.loads(line) for line in output]
+
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['id'], author.id)
+        self.assertEqual(rows[0]['last_name'], 'Qodiriy')
+
+    def test_invalid_since(self):
+        with self.assertRaisesMessage(CommandError, "--since must be an ISO 8601 timestamp."):
+            call_command('export_catalogue', 'authors', '--since', '2024-13-45T00:00', stdout=StringIO())
+
+
+class IsbnTestCase(TestCase):
+    def test_isbn_is_normalized_and_unique(self):
+        book = Book.objects.create(title='sport', description='description1', isbn='0-306-40615-2')
+
+        self.assertEqual(book.isbn_normalized, '9780306406157')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Book.objects.create(title='copy', description='description1', isbn='978-0-306-40615-7')
+
+    def test_admin_rejects_isbn_twins(self):
+        Book.objects.create(title='sport', description='description1', isbn='0-306-40615-2')
+        admin = CustomUser.objects.create_superuser(username='admin', password='parol', email='a@a.com')
+        self.client.force_login(admin)
+
+        response = self.client.post(reverse('admin:books_book_add'), data={
+            'title': 'copy', 'description': 'description1', 'isbn': '978-0-306-40615-7',
+            'created_at_0': '2025-01-01', 'created_at_1': '00:00:00',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['adminform'].form.errors['isbn'], ["A book with this ISBN already exists."])
+        self.assertEqual(Book.objects.count(), 1)
+
+    def test_blank_isbns_do_not_collide(self):
+        Book.objects.create(title='book1', description='description1', isbn='')
+        Book.objects.create(title='book2', description='description2', isbn='')
+
+        self.assertEqual(Book.objects.filter(isbn_normalized='').count(), 2)
+
+
+class CheckQueryPlansCommandTestCase(TestCase):
+    def test_reports_each_view_query(self):
+        book = Book.objects.create(title='book1', description='description1', isbn='1234234')
+        user = CustomUser.objects.create(username='sayitkamol')
+        BookReview.objects.create(book=book, user=user, stars_given=4, comment='comment')
+        stdout = StringIO()
+        call_command('check_query_plans', verbosity=2, stdout=stdout)
+
+        self.assertIn("home_page [1]: ok", stdout.getvalue())
+        self.assertIn("books:detail [5]: ok", stdout.getvalue())
+        # The SQL the views run themselves, such as the page-number API path's COUNT.
+        self.assertIn('SELECT COUNT(*) AS "__count" FROM "books_bookreview"', stdout.getvalue())
+
+    def test_flags_sequential_scans(self):
+        Book.objects.create(title='book1', description='description1', isbn='1234234')
+
+        with self.assertRaises(CommandError):
+            call_command('check_query_plans', '--min-rows', '0', stdout=StringIO())
+
+
+class FragmentCacheTestCase(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title='sport', description='description1', isbn='1234234')
+        self.author = Author.objects.create(first_name='Abdulla', last_name='Qodiriy', email='a@a.com', bio='bio')
+        BookAuthor.objects.create(book=self.book, author=self.author)
+        self.user = CustomUser.objects.create(username='sayitkamol', first_name='sayitkamol')
+        self.review = BookReview.objects.create(book=self.book, user=self.user, stars_given=4, comment="Nice book")
+        self.url = reverse("books:detail", kwargs={"id": self.book.id})
+        cache.stats.reset()
+
+    def test_repeat_render_is_served_from_cache(self):
+        # Authors come from the book row itself.
+        self.assertEndpointQueries(5, self.url)
+        # The two validators, book, similar books and reviews; the rendered fragments are reused.
+        response = self.assertEndpointQueries(5, self.url)
+
+        self.assertContains(response, "Abdulla Qodiriy")
+        self.assertContains(response, "Nice book")
+        self.assertEqual(cache.stats.snapshot(), {
+            'book-header': {'hits': 1, 'misses': 1},
+            'review': {'hits': 1, 'misses': 1},
+        })
+
+    def test_author_change_invalidates_book(self):
+        self.client.get(self.url)
+
+        self.author.last_name = 'Cholpon'
+        self.author.save()
+
+        self.assertContains(self.client.get(self.url), "Abdulla Cholpon")
+
+    def test_review_change_invalidates_review_and_book(self):
+        self.client.get(self.url)
+
+        self.review.comment = "Changed my mind"
+        self.review.stars_given = 1
+        self.review.save()
+        events.drain()
+
+        response = self.client.get(self.url)
+        self.assertContains(response, "Changed my mind")
+        self.assertContains(response, "1.0 ⭐ · 1 reviews")
+
+    def test_book_card_invalidated_on_save(self):
+        self.client.get(reverse("books:list"))
+
+        self.book.title = 'football'
+        self.book.save()
+
+        self.assertContains(self.client.get(reverse("books:list")), 'football')
+
+
+class BookQueryCountTestCase(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title='sport', description='description1', isbn='1234234')
+        for i in range(3):
+            Book.objects.create(title=f'book{i}', description='description', isbn=f'99{i}')
+            author = Author.objects.create(first_name=f'author{i}', last_name='last', email='a@a.com', bio='bio')
+            BookAuthor.objects.create(book=self.book, author=author)
+            user = CustomUser.objects.create(username=f'user{i}')
+            BookReview.objects.create(book=self.book, user=user, stars_given=3, comment=f'comment{i}')
+
+    def test_books_list_queries(self):
+        # No COUNT(*): the page fetches one extra row to know if another follows.
+        response = self.assertEndpointQueries(1, reverse("books:list") + "?page_size=10")
+
+        self.assertContains(response, "by author0 last, author1 last, author2 last")
+
+    def test_detail_page_queries(self):
+        response = self.assertEndpointQueries(5, reverse("books:detail", kwargs={"id": self.book.id}))
+
+        self.assertContains(response, "author0 last, author1 last, author2 last")
+        self.assertContains(response, "comment2")
+        self.assertContains(response, "user2")
+
+
+class AuthorDisplayTestCase(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title='Good Omens', description='description', isbn='111')
+        self.pratchett = Author.objects.create(first_name='Terry', last_name='Pratchett', email='t@a.com', bio='')
+        self.gaiman = Author.objects.create(first_name='Neil', last_name='Gaiman', email='n@a.com', bio='')
+
+    def author_display(self):
+        self.book.refresh_from_db()
+        return self.book.author_display
+
+    def test_kept_in_sync(self):
+        BookAuthor.objects.create(book=self.book, author=self.pratchett)
+        credit = BookAuthor.objects.create(book=self.book, author=self.gaiman)
+        self.assertEqual(self.author_display(), 'Terry Pratchett, Neil Gaiman')
+
+        self.gaiman.last_name = 'Richard Gaiman'
+        self.gaiman.save()
+        self.assertEqual(self.author_display(), 'Terry Pratchett, Neil Richard Gaiman')
+
+        credit.delete()
+        self.assertEqual(self.author_display(), 'Terry Pratchett')
+        self.pratchett.delete()
+        self.assertEqual(self.author_display(), '')
+
+    def test_book_author_pairs_are_unique(self):
+        BookAuthor.objects.create(book=self.book, author=self.gaiman)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            BookAuthor.objects.create(book=self.book, author=self.gaiman)
+
+    def test_load_authors_is_one_query(self):
+        other = Book.objects.create(title='Coraline', description='description', isbn='222')
+        BookAuthor.objects.create(book=self.book, author=self.pratchett)
+        BookAuthor.objects.create(book=self.book, author=self.gaiman)
+        BookAuthor.objects.create(book=other, author=self.gaiman)
+        lonely = Book.objects.create(title='Anonymous', description='description', isbn='333')
+
+        books = list(Book.objects.order_by('id'))
+        with self.assertNumQueries(1):
+            authors.load_authors(books)
+
+        self.assertEqual(
+            [[author.full_name() for author in book.author_list] for book in books],
+            [['Terry Pratchett', 'Neil Gaiman'], ['Neil Gaiman'], []],
+        )
+        self.assertEqual(books[2], lonely)
+
+
+class ConditionalRequestTestCase(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title='sport', description='description1', isbn='1234234')
+        self.author = Author.objects.create(first_name='Abdulla', last_name='Qodiriy', email='a@a.com', bio='bio')
+        BookAuthor.objects.create(book=self.book, author=self.author)
+        self.user = CustomUser.objects.create(username='sayitkamol', first_name='sayitkamol')
+        self.url = reverse("books:detail", kwargs={"id": self.book.id})
+
+    def test_detail_not_modified(self):
+        # The first visit sets the CSRF cookie, which the validators depend on.
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+
+        not_modified = self.assertEndpointQueries(2, self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified.content, b'')
+
+        not_modified = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_detail_etag_changes_with_review(self):
+        etag = self.client.get(self.url)['ETag']
+        BookReview.objects.create(book=self.book, user=self.user, stars_given=4, comment="Nice book")
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Nice book")
+
+    def test_detail_etag_changes_with_author(self):
+        etag = self.client.get(self.url)['ETag']
+        self.author.last_name = 'Cholpon'
+        self.author.save()
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail_etag_changes_with_neighbours(self):
+        neighbour = Book.objects.create(title='Dune', description='description2', isbn='555')
+        BookSimilarity.objects.create(book=self.book, similar_book=neighbour, score=0.9, rank=1)
+        self.client.get(self.url)
+        etag = self.client.get(self.url)['ETag']
+
+        neighbour.title = 'Dune Messiah'
+        neighbour.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Dune Messiah')
+
+        BookReview.objects.create(book=neighbour, user=self.user, stars_given=2, comment="Meh")
+        events.drain()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Last-Modified'], http_date(Book.objects.get(pk=neighbour.pk).updated_at.timestamp()))
+
+    def test_detail_etag_varies_by_user(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.force_login(self.user)
+
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_detail_etag_changes_with_reviewer(self):
+        BookReview.objects.create(book=self.book, user=self.user, stars_given=4, comment="Nice book")
+        response = self.client.get(self.url)
+
+        self.user.username = 'jasur'
+        self.user.save()
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "jasur")
+
+    def test_detail_etag_changes_with_csrf_secret(self):
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.client.cookies[settings.CSRF_COOKIE_NAME] = 'x' * 32
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+    def test_list_not_modified_until_catalogue_changes(self):
+        url = reverse("books:list") + "?q=sport"
+        etag = self.client.get(url)['ETag']
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url + "&page=2", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        Book.objects.create(title='sport 2', description='description2', isbn='555')
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ImageVariantsTestCase(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+
+        self.book = Book.objects.create(title='sport', description='description1', isbn='1234234')
+        self.book.cover_picture.save('cover.png', ContentFile(self.png(900, 1200)))
+
+    @staticmethod
+    def png(width, height):
+        buffer = BytesIO()
+        Image.new('RGBA', (width, height), (200, 30, 30, 128)).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    @mock.patch('books.signals.generate_cover_variants.delay')
+    def test_upload_schedules_variants(self, delay):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.cover_picture.save('other.png', ContentFile(self.png(300, 300)))
+        delay.assert_called_once_with(self.book.id)
+
+        delay.reset_mock()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book.save(update_fields=['title'])
+        delay.assert_not_called()
+
+    def test_generate_variants(self):
+        generate_cover_variants(self.book.id)
+        self.book.refresh_from_db()
+
+        variants = self.book.cover_variants
+        self.assertEqual(variants['source'], self.book.cover_picture.name)
+        self.assertEqual([(image['width'], image['height']) for image in variants['images']],
+                         [(200, 300), (400, 600), (600, 900)])
+
+        storage = self.book.cover_picture.storage
+        for image in variants['images']:
+            self.assertIn(variants['hash'], image['webp'])
+            with storage.open(image['webp']) as webp, storage.open(image['jpeg']) as jpeg:
+                self.assertEqual(Image.open(webp).format, 'WEBP')
+                self.assertEqual(Image.open(jpeg).size, (image['width'], image['height']))
+
+        # Same bytes under a new name reuse the content-hashed files.
+        self.book.cover_picture.save('copy.png', ContentFile(self.png(900, 1200)))
+        generate_cover_variants(self.book.id)
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.cover_variants['images'], variants['images'])
+
+    def test_small_source_is_not_upscaled(self):
+        self.book.cover_picture.save('small.png', ContentFile(self.png(450, 650)))
+        generate_cover_variants(self.book.id)
+        self.book.refresh_from_db()
+
+        self.assertEqual([image['width'] for image in self.book.cover_variants['images']], [200, 400])
+
+    def test_missing_source_is_skipped(self):
+        Book.objects.filter(pk=self.book.pk).update(cover_picture='missing.jpg')
+        with self.assertLogs('goodreads.images', 'WARNING'):
+            generate_cover_variants(self.book.id)
+        self.book.refresh_from_db()
+
+        self.assertEqual(self.book.cover_variants, {})
+
+    def test_backfill_command(self):
+        out = StringIO()
+        call_command('generate_image_variants', '--sync', stdout=out)
+        self.book.refresh_from_db()
+
+        self.assertIn("Generated variants for 1 books.", out.getvalue())
+        self.assertEqual(len(self.book.cover_variants['images']), 3)
+
+    def test_templates_use_variants(self):
+        url = reverse("books:detail", kwargs={"id": self.book.id})
+        self.assertContains(self.client.get(url), f'src="{self.book.cover_picture.url}"')
+
+        generate_cover_variants(self.book.id)
+        self.book.refresh_from_db()
+        webp, jpeg = self.book.cover_variants['images'][0]['webp'], self.book.cover_variants['images'][0]['jpeg']
+
+        response = self.client.get(url)
+        self.assertContains(response, '<source type="image/webp"')
+        self.assertContains(response, f'/media/{webp} 200w')
+        self.assertContains(response, f'src="/media/{jpeg}"')
+        self.assertContains(self.client.get(reverse("books:list")), f'/media/{webp} 200w')
+
+
+class ReviewEventTestCase(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title='sport', description='description1', isbn='1234234')
+        self.users = [CustomUser.objects.create(username=f'user{i}') for i in range(3)]
+        django_cache.delete(events.NUDGE_KEY)
+
+    def test_events_are_coalesced_per_book(self):
+        for stars, user in zip((5, 4, 1), self.users):
+            BookReview.objects.create(book=self.book, user=user, stars_given=stars, comment='comment')
+        self.book.refresh_from_db()
+        self.assertEqual(self.book.review_count, 0)
+        self.assertEqual(ReviewEvent.objects.count(), 3)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(events.process_batch(), 3)
+        updates = [query for query in queries if query['sql'].startswith('UPDATE "books_book"')]
+        self.assertEqual(len(updates), 1)
+
+        self.book.refresh_from_db()
+        self.assertEqual((self.book.review_count, self.book.stars_total), (3, 10))
+        self.assertFalse(ReviewEvent.objects.exists())
+        self.assertEqual(events.process_batch(), 0)
+
+    def test_comment_edit_only_touches_activity(self):
+        review = BookReview.objects.create(book=self.book, user=self.users[0], stars_given=5, comment='comment')
+        events.drain()
+
+        review.comment = 'edited'
+        review.save()
+        edited_at = ReviewEvent.objects.get().created_at
+        with CaptureQueriesContext(connection) as queries:
+            events.drain()
+
+        self.assertFalse(any(query['sql'].startswith('UPDATE "books_book"') for query in queries))
+        self.users[0].refresh_from_db()
+        self.assertEqual(self.users[0].review_count, 1)
+        self.assertEqual(self.users[0].last_active_at, edited_at)
+
+    def test_user_activity_counters(self):
+        user, other = self.users[:2]
+        review = BookReview.objects.create(book=self.book, user=user, stars_given=5, comment='comment')
+        BookReview.objects.create(book=self.book, user=user, stars_given=2, comment='comment')
+        events.drain()
+        user.refresh_from_db()
+        self.assertEqual((user.review_count, user.stars_given_total, user.average_stars_given), (2, 7, 3.5))
+        first_active = user.last_active_at
+        self.assertIsNotNone(first_active)
+
+        review.user = other
+        review.save()
+        review.delete()
+        events.drain()
+        user.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((user.review_count, user.stars_given_total, user.average_stars_given), (1, 2, 2.0))
+        self.assertEqual((other.review_count, other.stars_given_total, other.average_stars_given), (0, 0, 0.0))
+        self.assertGreaterEqual(other.last_active_at, first_active)
+
+    def test_rebuild_user_activity_command(self):
+        user = self.users[0]
+        BookReview.objects.create(book=self.book, user=user, stars_given=4, comment='comment')
+        events.drain()
+        CustomUser.objects.filter(pk=user.pk).update(review_count=9)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_user_activity', '--verify', stdout=StringIO())
+        call_command('rebuild_user_activity', stdout=StringIO())
+        call_command('rebuild_user_activity', '--verify', stdout=StringIO())
+
+        user.refresh_from_db()
+        self.assertEqual((user.review_count, user.stars_given_total), (1, 4))
+
+    @mock.patch('books.tasks.process_review_events.apply_async')
+    def test_consumer_wakeups_are_debounced(self, apply_async):
+        with self.captureOnCommitCallbacks(execute=True):
+            BookReview.objects.create(book=self.book, user=self.users[0], stars_given=5, comment='comment')
+        with self.captureOnCommitCallbacks(execute=True):
+            BookReview.objects.create(book=self.book, user=self.users[1], stars_given=4, comment='comment')
+
+        apply_async.assert_called_once_with(countdown=1)
+
+    @override_settings(REVIEW_EVENT_MAX_ATTEMPTS=2)
+    @mock.patch('books.tasks.dead_letter_review_event.delay')
+    def test_failing_events_back_off_then_dead_letter(self, dead_letter):
+        BookReview.objects.create(book=self.book, user=self.users[0], stars_given=5, comment='comment')
+
+        with mock.patch('books.events.apply_rating_deltas', side_effect=DatabaseError('boom')):
+            with self.assertLogs('books.events', 'WARNING'):
+                self.assertEqual(events.process_batch(), 1)
+            event = ReviewEvent.objects.get()
+            self.assertEqual((event.attempts, event.dead), (1, False))
+            self.assertEqual(events.process_batch(), 0)
+
+            ReviewEvent.objects.update(available_at=event.created_at)
+            with self.captureOnCommitCallbacks(execute=True), self.assertLogs('books.events', 'WARNING'):
+                events.process_batch()
+
+        event.refresh_from_db()
+        self.assertEqual((event.attempts, event.dead), (2, True))
+        self.assertIn('boom', event.last_error)
+        dead_letter.assert_called_once()
+        self.assertEqual(dead_letter.call_args.args[0]['key'], str(event.key))
+        self.assertEqual(events.drain(), 0)
+
+
+class RecommendationsTestCase(TestCase):
+    def setUp(self):
+        self.dune, self.foundation, self.emma, self.persuasion = [
+            Book.objects.create(title=title, description='description', isbn=f'99{i}')
+            for i, title in enumerate(('Dune', 'Foundation', 'Emma', 'Persuasion'))
+        ]
+        # Science-fiction readers and Austen readers, each group rating its own pair high.
+        ratings = [
+            {self.dune: 5, self.foundation: 5, self.emma: 1},
+            {self.dune: 4, self.foundation: 5, self.persuasion: 2},
+            {self.dune: 5, self.foundation: 4, self.emma: 2, self.persuasion: 1},
+            {self.emma: 5, self.persuasion: 5, self.dune: 1},
+            {self.emma: 4, self.persuasion: 5, self.foundation: 2},
+            {self.emma: 5, self.persuasion: 4, self.dune: 2, self.foundation: 1},
+        ]
+        for i, user_ratings in enumerate(ratings):
+            user = CustomUser.objects.create(username=f'reader{i}')
+            for book, stars in user_ratings.items():
+                BookReview.objects.create(book=book, user=user, stars_given=stars, comment='comment')
+
+    def neighbours(self, book):
+        return list(BookSimilarity.objects.for_book(book.id).values_list('similar_book_id', flat=True))
+
+    def test_build_recommendations(self):
+        stats = recommendations.build_recommendations(top_k=1)
+
+        self.assertEqual(stats['ratings'], 20)
+        self.assertEqual(stats['updated'], 4)
+        self.assertEqual(self.neighbours(self.dune), [self.foundation.id])
+        self.assertEqual(self.neighbours(self.emma), [self.persuasion.id])
+
+        # Unchanged lists are not rewritten on the next run.
+        self.assertEqual(recommendations.build_recommendations(top_k=1)['updated'], 0)
+
+    def test_stale_lists_are_removed(self):
+        recommendations.build_recommendations()
+        BookReview.objects.filter(book=self.persuasion).delete()
+
+        stats = recommendations.build_recommendations()
+        self.assertEqual(self.neighbours(self.persuasion), [])
+        self.assertNotIn(self.persuasion.id, self.neighbours(self.emma))
+        self.assertGreaterEqual(stats['removed'], 1)
+
+    def test_min_support_prunes_pairs(self):
+        recommendations.build_recommendations(min_support=7)
+        self.assertFalse(BookSimilarity.objects.exists())
+
+    def test_detail_page_shows_similar_books(self):
+        out = StringIO()
+        call_command('build_recommendations', '--top-k', '1', stdout=out)
+        self.assertIn("4 neighbour lists updated", out.getvalue())
+
+        response = self.client.get(reverse("books:detail", kwargs={"id": self.dune.id}))
+        self.assertContains(response, "Readers also liked")
+        self.assertContains(response, reverse("books:detail", kwargs={"id": self.foundation.id}))
+
+        self.foundation.title = "Second Foundation"
+        self.foundation.save()
+        response = self.client.get(reverse("books:detail", kwargs={"id": self.dune.id}))
+        self.assertContains(response, "Second Foundation")
+
+
+class BenchmarkTestCase(TestCase):
+    def test_seed_needs_the_database_name(self):
+        with self.assertRaisesMessage(CommandError, "Refusing to seed"):
+            call_command('seed_catalogue', database_name='goodreads', stdout=StringIO())
+        self.assertFalse(Book.objects.exists())
+
+    def test_seed_and_benchmark(self):
+        out = StringIO()
+        call_command(
+            'seed_catalogue', books=30, authors=5, users=10, reviews=200, batch_size=50,
+            database_name=connection.settings_dict['NAME'], password='benchmark', stdout=out,
+        )
+        self.assertIn("Seeded 10 users, 5 authors, 30 books, 200 reviews, ", out.getvalue())
+        self.assertEqual(sum(Book.objects.values_list('review_count', flat=True)), 200)
+        self.assertEqual(sum(CustomUser.objects.values_list('review_count', flat=True)), 200)
+        follows = Follow.objects.count()
+        self.assertGreater(follows, 0)
+        self.assertEqual(
+            sum(CustomUser.objects.values_list('follower_count', flat=True))
+            + sum(Author.objects.values_list('follower_count', flat=True)),
+            follows,
+        )
+        self.assertTrue(FeedEntry.objects.exists())
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        results = os.path.join(directory, 'results.json')
+        call_command('benchmark', iterations=2, warmup=0, password='benchmark', output=results, stdout=StringIO())
+
+        with open(results) as report:
+            report = json.load(report)
+        self.assertEqual(report['dataset']['reviews'], 200)
+        self.assertEqual(report['results']['book detail']['status'], 200)
+        self.assertEqual(report['results']['api review create']['status'], 201)
+        self.assertEqual(report['results']['api review delete']['status'], 204)
+        self.assertEqual(report['results']['api reviews basic auth']['status'], 200)
+        self.assertFalse(any(result['status'] >= 400 for result in report['results'].values()))
+        self.assertEqual(BookReview.objects.count(), 200)
+
+        out = StringIO()
+        call_command('benchmark', iterations=2, warmup=0, only=['book detail'], compare=results, stdout=out)
+        self.assertIn("book detail              queries", out.getvalue())
+
+    def test_seeded_users_have_no_password_by_default(self):
+        call_command(
+            'seed_catalogue', books=2, authors=1, users=2, reviews=2, follows=0,
+            database_name=connection.settings_dict['NAME'], stdout=StringIO(),
+        )
+        self.assertFalse(any(user.has_usable_password() for user in CustomUser.objects.all()))
+
+        report = benchmark.run_benchmarks(
+            iterations=1, warmup=0, only=['api reviews basic auth', 'api reviews token auth'],
+        )
+        self.assertEqual(list(report['results']), ['api reviews token auth'])
+
+
+class RankingsTestCase(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        self.older, self.recent, self.newest = [
+            Book.objects.create(title=title, description='description', isbn=f'99{i}')
+            for i, title in enumerate(('Older', 'Recent', 'Newest'))
+        ]
+        reviews = [(self.older, 5, 10)] * 3 + [(self.recent, 4, 1)] * 2 + [(self.newest, 5, 0)]
+        for i, (book, stars, days) in enumerate(reviews):
+            user = CustomUser.objects.create(username=f'reader{i}')
+            BookReview.objects.create(
+                book=book, user=user, stars_given=stars, comment='comment',
+                created_at=now - timedelta(days=days, minutes=2),
+            )
+        events.drain()
+
+    def ranking(self, name):
+        return [popularity.book_id for popularity in rankings.ranked(name, 10)]
+
+    def test_rankings(self):
+        stats = rankings.update_rankings()
+
+        self.assertEqual(stats['books'], 3)
+        # A three-day half-life forgets the ten-day-old reviews; a twelve-day one doesn't.
+        self.assertEqual(self.ranking('weekly'), [self.recent.id, self.newest.id, self.older.id])
+        self.assertEqual(self.ranking('monthly'), [self.recent.id, self.older.id, self.newest.id])
+        # Three 5s beat one 5 once both are padded with mean ratings.
+        self.assertEqual(self.ranking('top-rated'), [self.older.id, self.newest.id, self.recent.id])
+
+        popularity = BookPopularity.objects.get(book=self.recent)
+        self.assertAlmostEqual(rankings.current_score('weekly_score', popularity.weekly_score), 2 * 0.5 ** (1 / 3), 2)
+
+    def test_incremental_matches_full(self):
+        rankings.update_rankings()
+        BookReview.objects.create(
+            book=self.older, user=CustomUser.objects.get(username='reader0'), stars_given=3, comment='again',
+            created_at=timezone.now() - timedelta(minutes=5),
+        )
+        events.drain()
+
+        rankings.update_rankings()
+        incremental = {row.book_id: row for row in BookPopularity.objects.all()}
+        rankings.update_rankings(full=True)
+
+        for row in BookPopularity.objects.all():
+            self.assertAlmostEqual(row.weekly_score, incremental[row.book_id].weekly_score)
+            self.assertAlmostEqual(row.monthly_score, incremental[row.book_id].monthly_score)
+
+    def test_unsettled_reviews_wait(self):
+        rankings.update_rankings()
+        watermark = rankings.RankingWatermark.objects.get().review_id
+        BookReview.objects.create(book=self.older, user=CustomUser.objects.get(username='reader0'),
+                                  stars_given=3, comment='just now')
+
+        self.assertEqual(rankings.update_rankings()['books'], 0)
+        self.assertEqual(rankings.RankingWatermark.objects.get().review_id, watermark)
+
+    def test_future_dated_reviews_are_skipped(self):
+        rankings.update_rankings()
+        reader = CustomUser.objects.get(username='reader0')
+        BookReview.objects.create(book=self.newest, user=reader, stars_given=5, comment='from the future',
+                                  created_at=timezone.now() + timedelta(days=30))
+        settled = BookReview.objects.create(book=self.older, user=reader, stars_given=3, comment='settled',
+                                            created_at=timezone.now() - timedelta(minutes=5))
+        events.drain()
+
+        self.assertEqual(rankings.update_rankings()['books'], 1)
+        self.assertEqual(rankings.RankingWatermark.objects.get().review_id, settled.id)
+
+    def test_command_and_landing_page(self):
+        out = StringIO()
+        call_command('update_rankings', stdout=out)
+        self.assertIn("3 books re-scored", out.getvalue())
+
+        response = self.client.get(reverse('landing_page'))
+        self.assertContains(response, "Trending this week")
+        self.assertContains(response, reverse('books:detail', kwargs={'id': self.recent.id}))
+
+
+class FeedTestCase(QueryCountMixin, TestCase):
+    def setUp(self):
+        self.reader = CustomUser.objects.create(username='reader')
+        self.critic = CustomUser.objects.create(username='critic')
+        self.stranger = CustomUser.objects.create(username='stranger')
+        self.author = Author.objects.create(first_name='Frank', last_name='Herbert', email='frank@example.com', bio='')
+        self.dune = Book.objects.create(title='Dune', description='description', isbn='111')
+        self.emma = Book.objects.create(title='Emma', description='description', isbn='222')
+        BookAuthor.objects.create(book=self.dune, author=self.author)
+
+    def review(self, user, book, comment, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return BookReview.objects.create(book=book, user=user, stars_given=4, comment=comment, **kwargs)
+
+    def follow(self, **followee):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Follow.objects.create(follower=self.reader, **followee)
+
+    def feed(self, user):
+        return list(FeedEntry.objects.filter(user=user).order_by('-created_at').values_list('review__comment', flat=True))
+
+    def test_reviews_fan_out_to_followers(self):
+        self.follow(user=self.critic)
+        self.follow(author=self.author)
+
+        self.review(self.critic, self.emma, 'by the critic')
+        self.review(self.stranger, self.dune, 'of a followed author')
+        self.review(self.stranger, self.emma, 'unrelated')
+
+        self.assertEqual(self.feed(self.reader), ['of a followed author', 'by the critic'])
+        self.assertEqual(self.feed(self.stranger), ['unrelated', 'of a followed author'])
+        self.critic.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual((self.critic.follower_count, self.author.follower_count), (1, 1))
+
+    def test_follow_backfills_and_unfollow_removes(self):
+        self.review(self.critic, self.emma, 'before following')
+        follow = self.follow(user=self.critic)
+        self.assertEqual(self.feed(self.reader), ['before following'])
+
+        follow.delete()
+        self.assertEqual(self.feed(self.reader), [])
+        self.critic.refresh_from_db()
+        self.assertEqual(self.critic.follower_count, 0)
+
+    def test_unfollow_keeps_reviews_still_followed(self):
+        self.follow(user=self.critic)
+        author_follow = self.follow(author=self.author)
+        self.review(self.critic, self.dune, 'critic on the author')
+        self.review(self.reader, self.dune, 'my own')
+        self.review(self.stranger, self.dune, 'stranger on the author')
+        self.assertEqual(self.feed(self.reader), ['stranger on the author', 'my own', 'critic on the author'])
+
+        author_follow.delete()
+
+        self.assertEqual(self.feed(self.reader), ['my own', 'critic on the author'])
+
+    @override_settings(FEED_MAX_ENTRIES=2, FEED_TRIM_EVERY=1)
+    def test_feeds_are_trimmed(self):
+        now = timezone.now()
+        for days in (3, 2, 1):
+            self.review(self.reader, self.emma, f'{days} days ago', created_at=now - timedelta(days=days))
+
+        self.assertEqual(self.feed(self.reader), ['1 days ago', '2 days ago'])
+
+    @override_settings(FEED_FANOUT_LIMIT=2)
+    def test_popular_accounts_are_read_live(self):
+        self.follow(user=self.critic)
+        Follow.objects.create(follower=self.stranger, user=self.critic)
+        self.review(self.critic, self.emma, 'too popular to fan out')
+        self.review(self.reader, self.dune, 'my own review')
+
+        self.assertEqual(self.feed(self.reader), ['my own review'])
+        self.client.force_login(self.reader)
+        # User, popular followees, feed entries, live reviews.
+        response = self.assertEndpointQueries(4, reverse('home_page'))
+        self.assertEqual(
+            [review.comment for review in response.context['page_obj']], ['my own review', 'too popular to fan out'],
+        )
+
+        response = self.client.get(reverse('home_page') + '?page_size=1')
+        page_obj = response.context['page_obj']
+        self.assertEqual([review.comment for review in page_obj], ['my own review'])
+        response = self.client.get(reverse('home_page') + f'?page_size=1&cursor={page_obj.next_cursor}')
+        self.assertEqual([review.comment for review in response.context['page_obj']], ['too popular to fan out'])
+        self.assertFalse(response.context['page_obj'].has_next())
+
+        # Dropping back under the limit pushes its recent reviews.
+        with self.captureOnCommitCallbacks(execute=True):
+            Follow.objects.filter(follower=self.stranger).delete()
+        self.assertEqual(self.feed(self.reader), ['my own review', 'too popular to fan out'])
+
+    def test_feed_page_is_one_range_read(self):
+        self.follow(user=self.critic)
+        for i in range(5):
+            self.review(self.critic, self.emma, f'review {i}')
+        self.client.force_login(self.reader)
+
+        # User, popular followees, feed entries.
+        response = self.assertEndpointQueries(3, reverse('home_page'))
+        self.assertContains(response, 'review 4')
+        self.assertContains(response, 'Your feed')
 
+    def test_rebuild_feeds_command(self):
+        self.review(self.critic, self.emma, 'by the critic')
+        self.review(self.stranger, self.emma, 'unrelated')
+        Follow.objects.bulk_create([Follow(follower=self.reader, user=self.critic)])
+        FeedEntry.objects.all().delete()
 
+        out = StringIO()
+        call_command('rebuild_feeds', stdout=out)
 
+        self.assertIn("Rebuilt 3 feeds, 3 entries.", out.getvalue())
+        self.assertEqual(self.feed(self.reader), ['by the critic'])
+        self.critic.refresh_from_db()
+        self.assertEqual(self.critic.follower_count, 1)
 
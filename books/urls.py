@@ -1,10 +1,16 @@
 from django.urls import path
-from books.views import BooksView, BookDetailView, AddReviewView, EditReviewView, ConfirmDeleteReviewView, DeleteReviewView
+from books.views import (
+    BooksView, BookDetailView, AddReviewView, EditReviewView, ConfirmDeleteReviewView, DeleteReviewView,
+    AsyncBooksView, AsyncBookDetailView,
+)
+from goodreads.routing import select_view
 
 app_name = 'books'
 urlpatterns = [
-    path("", BooksView.as_view(), name="list"),
-    path("<int:id>/", BookDetailView.as_view(), name="detail"),
+    path("", select_view("books:list", BooksView.as_view(), AsyncBooksView.as_view()), name="list"),
+    path("<int:id>/",
+         select_view("books:detail", BookDetailView.as_view(), AsyncBookDetailView.as_view()),
+         name="detail"),
     path("<int:id>/reviews/", AddReviewView.as_view(), name="reviews"),
     path("<int:book_id>/reviews/<int:review_id>/edit/", EditReviewView.as_view(), name="edit-review"),
     path("<int:book_id>/reviews/<int:review_id>/delete/confirm/",
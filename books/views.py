@@ -1,35 +1,90 @@
-from django.core.paginator import Paginator
+from asgiref.sync import sync_to_async
 from django.shortcuts import render
+from django.utils.decorators import method_decorator
 from django.views import View
+from django.views.decorators.http import condition
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.shortcuts import render, redirect, reverse
 
-from books.models import Book, BookReview
+from books.conditional import book_etag, book_last_modified, catalogue_etag
+from books.models import Book, BookReview, BookSimilarity
 from books.forms import BookReviewForm
+from books.search import search_books
+from goodreads.db import pin_to_primary, replica_reads
+from goodreads.pagination import apaginate, paginate
+from goodreads.routing import async_condition, resolve_user
 
 
+@method_decorator(replica_reads, name='get')
+@method_decorator(condition(etag_func=catalogue_etag), name='get')
 class BooksView(View):
     def get(self, request):
-        books = Book.objects.all().order_by('id')
+        books = Book.objects.for_list().order_by('id')
         search_query = request.GET.get('q', '')
         if search_query:
-            books = books.filter(title__icontains=search_query)
+            books = search_books(books, search_query)
+        if request.GET.get('sort') == 'rating':
+            books = books.by_rating()
 
-        page_size = request.GET.get('page_size', 2)
-        paginator = Paginator(books, page_size)
-        page_num = request.GET.get('page', 1)
-        page_obj = paginator.get_page(page_num)
+        page_obj = paginate(books, request)
         return render(request, "books/list.html",
                       {"page_obj": page_obj, 'search_query': search_query})
 
 
+SIMILAR_BOOKS_SHOWN = 6
+
+
+def book_page_context(book, review_form):
+    return {
+        "book": book,
+        "reviews": book.bookreview_set.for_book_page(),
+        "similar_books": BookSimilarity.objects.for_book(book.id)[:SIMILAR_BOOKS_SHOWN],
+        "review_form": review_form,
+    }
+
+
+@method_decorator(replica_reads, name='get')
+@method_decorator(condition(etag_func=book_etag, last_modified_func=book_last_modified), name='get')
 class BookDetailView(View):
     def get(self, request, id):
         book = Book.objects.get(id=id)
         review_form = BookReviewForm()
 
-        return render(request, "books/detail.html", {"book": book, "review_form": review_form})
+        return render(request, "books/detail.html", book_page_context(book, review_form))
+
+
+@method_decorator(replica_reads, name='get')
+@method_decorator(async_condition(etag_func=catalogue_etag), name='get')
+class AsyncBooksView(View):
+    async def get(self, request):
+        await resolve_user(request)
+
+        books = Book.objects.for_list().order_by('id')
+        search_query = request.GET.get('q', '')
+        if search_query:
+            books = await sync_to_async(search_books)(books, search_query)
+        if request.GET.get('sort') == 'rating':
+            books = books.by_rating()
+
+        page_obj = await apaginate(books, request)
+
+        return render(request, "books/list.html",
+                      {"page_obj": page_obj, 'search_query': search_query})
+
+
+@method_decorator(replica_reads, name='get')
+@method_decorator(async_condition(etag_func=book_etag, last_modified_func=book_last_modified), name='get')
+class AsyncBookDetailView(View):
+    async def get(self, request, id):
+        await resolve_user(request)
+
+        book = await Book.objects.aget(id=id)
+        context = book_page_context(book, BookReviewForm())
+        context['reviews'] = [review async for review in context['reviews']]
+        context['similar_books'] = [similarity async for similarity in context['similar_books']]
+
+        return render(request, "books/detail.html", context)
 
 
 class AddReviewView(LoginRequiredMixin, View):
@@ -44,10 +99,11 @@ class AddReviewView(LoginRequiredMixin, View):
                 stars_given=review_form.cleaned_data['stars_given'],
                 comment=review_form.cleaned_data['comment'],
             )
+            pin_to_primary(request)
 
             return redirect(reverse("books:detail", kwargs={"id": id}))
 
-        return render(request, "books/detail.html", {"book": book, "review_form": review_form})
+        return render(request, "books/detail.html", book_page_context(book, review_form))
 
 
 class EditReviewView(LoginRequiredMixin, View):
@@ -70,6 +126,7 @@ class EditReviewView(LoginRequiredMixin, View):
 
         if review_form.is_valid():
             review_form.save()
+            pin_to_primary(request)
             return redirect(reverse("books:detail", kwargs={"id": book.id}))
 
         return render(request, "books/edit_review.html", {"book": book, "review": review, "review_form": review_form})
@@ -89,6 +146,7 @@ class DeleteReviewView(LoginRequiredMixin, View):
         review = book.bookreview_set.get(id=review_id)
 
         review.delete()
+        pin_to_primary(request)
         messages.success(request, "You have successfully deleted this review.")
 
         return redirect(reverse("books:detail", kwargs={"id": book_id}))
\ No newline at end of file
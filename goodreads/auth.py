@@ -0,0 +1,69 @@
+"""
+An authentication backend that caches users between requests.
+
+AuthenticationMiddleware, and DRF's SessionAuthentication through it, loads
+the session's user on every authenticated request. ``CachedModelBackend``
+keeps that row in the cache for ``AUTH_USER_CACHE_SECONDS``. Saving or
+deleting a user drops the entry (users.signals); bulk ``update()``s of
+fields pages show call ``forget_users``.
+
+Dropping an entry only reaches other workers through a shared cache, so
+``check_shared_caches`` refuses per-process caches for anything that has
+to be forgotten everywhere at once.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core import checks
+from django.core.cache import caches
+
+PER_PROCESS_CACHES = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def forget_users(user_ids):
+    caches[settings.AUTH_USER_CACHE].delete_many([user_cache_key(user_id) for user_id in user_ids])
+
+
+class CachedModelBackend(ModelBackend):
+    def get_user(self, user_id):
+        if not settings.AUTH_USER_CACHE_SECONDS:
+            return super().get_user(user_id)
+
+        cache = caches[settings.AUTH_USER_CACHE]
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_USER_CACHE_SECONDS)
+        return user
+
+
+def is_per_process(alias):
+    return settings.CACHES.get(alias, {}).get('BACKEND') in PER_PROCESS_CACHES
+
+
+def check_shared_caches(app_configs, **kwargs):
+    """Cached users, cached sessions and token revocations each need a cache every worker shares."""
+    uses = []
+    if settings.AUTH_USER_CACHE_SECONDS:
+        uses.append(('E001', 'AUTH_USER_CACHE', settings.AUTH_USER_CACHE, "Set AUTH_USER_CACHE_SECONDS=0."))
+    if settings.SESSION_ENGINE.rsplit('.', 1)[-1] in ('cache', 'cached_db'):
+        uses.append(('E002', 'SESSION_CACHE_ALIAS', settings.SESSION_CACHE_ALIAS, "Use the db session engine."))
+    uses.append(('E003', 'API_TOKEN_DENYLIST_CACHE', settings.API_TOKEN_DENYLIST_CACHE, "Use a database cache."))
+
+    return [
+        checks.Error(
+            f"{setting} is the per-process cache {alias!r}: other workers would never see its invalidations.",
+            hint=f"Point it at a shared cache (Redis, Memcached). {hint}",
+            id=f'goodreads.{code}',
+        )
+        for code, setting, alias, hint in uses
+        if is_per_process(alias)
+    ]
@@ -0,0 +1,323 @@
+"""
+Synthetic catalogue seeding and an in-process endpoint benchmark.
+
+``seed`` fills a database (use a dedicated one, e.g. DB_NAME=goodreads_bench;
+seed_catalogue makes you name it) with deterministic fake users, authors,
+books and reviews through ``bulk_create``, then rebuilds the denormalized counters the model signals
+would have maintained. ``run_benchmarks`` replays every hot endpoint through
+the Django test client and reports latency percentiles and query counts.
+"""
+import base64
+import random
+import statistics
+import subprocess
+import time
+from datetime import timedelta
+from io import StringIO
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache as django_cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from api import tokens
+from books.authors import update_author_display
+from books.models import Author, Book, BookAuthor, BookReview, Follow, normalize_isbn
+from books.search import is_postgres
+from users.models import CustomUser
+
+USERNAME_PREFIX = 'bench-'
+WORDS = (
+    'river', 'shadow', 'garden', 'winter', 'empire', 'silent', 'golden', 'night', 'letters', 'ocean',
+    'stone', 'city', 'memory', 'fire', 'glass', 'orchard', 'storm', 'island', 'kingdom', 'light',
+)
+FIRST_NAMES = ('Anna', 'Bekzod', 'Chen', 'Dilnoza', 'Emil', 'Farida', 'George', 'Hana', 'Ivan', 'Jamila')
+LAST_NAMES = ('Azimov', 'Brown', 'Karimova', 'Lee', 'Moreau', 'Novak', 'Olsen', 'Rashidov', 'Silva', 'Tanaka')
+# Most reviews go to few books: index = n * random() ** POPULARITY_SKEW.
+POPULARITY_SKEW = 3
+STARS_WEIGHTS = (5, 10, 20, 35, 30)
+
+
+def _batches(objects, size):
+    objects = iter(objects)
+    while batch := list(islice(objects, size)):
+        yield batch
+
+
+def _isbn13(number):
+    body = f'979{number:09d}'
+    check = (10 - sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(body)) % 10) % 10
+    return body + str(check)
+
+
+def _insert(model, objects, batch_size, log, label):
+    created = 0
+    for batch in _batches(objects, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch, batch_size=batch_size)
+        created += len(batch)
+        log(f"{label}: {created}")
+    return created
+
+
+def _new_ids(queryset, after_pk):
+    return list(queryset.filter(pk__gt=after_pk).order_by('pk').values_list('pk', flat=True))
+
+
+def seed(books=1000, authors=200, users=500, reviews=20000, follows=20, batch_size=5000, seed=0,
+         password=None, log=lambda message: None):
+    """
+    Add the given number of rows of each kind and return them as a dict.
+    Seeded users can't log in with a password unless ``password`` is given.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+    password = make_password(password)
+
+    def since(days):
+        return now - timedelta(seconds=rng.randrange(days * 86400))
+
+    last_user = CustomUser.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    _insert(CustomUser, (
+        CustomUser(
+            username=f'{USERNAME_PREFIX}{seed}-{last_user + n}', password=password,
+            first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+            email=f'reader{last_user + n}@example.com', date_joined=since(730),
+        )
+        for n in range(users)
+    ), batch_size, log, "users")
+    user_ids = _new_ids(CustomUser.objects, last_user)
+
+    last_author = Author.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    _insert(Author, (
+        Author(
+            first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+            email=f'author{last_author + n}@example.com', bio=' '.join(rng.choices(WORDS, k=30)),
+            created_at=since(730),
+        )
+        for n in range(authors)
+    ), batch_size, log, "authors")
+    author_ids = _new_ids(Author.objects, last_author)
+
+    last_book = Book.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+    def make_book(n):
+        isbn = _isbn13(last_book + n)
+        return Book(
+            title=' '.join(rng.choices(WORDS, k=rng.randint(1, 4))).capitalize(),
+            description=' '.join(rng.choices(WORDS, k=60)),
+            isbn=isbn, isbn_normalized=normalize_isbn(isbn), created_at=since(730),
+        )
+
+    _insert(Book, (make_book(n) for n in range(books)), batch_size, log, "books")
+    book_ids = _new_ids(Book.objects, last_book)
+
+    if author_ids:
+        _insert(BookAuthor, (
+            BookAuthor(book_id=book_id, author_id=author_id)
+            for book_id in book_ids
+            for author_id in rng.sample(author_ids, min(len(author_ids), rng.choice((1, 1, 1, 2, 3))))
+        ), batch_size, log, "book authors")
+        update_author_display(book_ids)
+
+    if user_ids and book_ids:
+        _insert(BookReview, (
+            BookReview(
+                user_id=rng.choice(user_ids),
+                book_id=book_ids[int(len(book_ids) * rng.random() ** POPULARITY_SKEW)],
+                stars_given=rng.choices(range(1, 6), STARS_WEIGHTS)[0],
+                comment=' '.join(rng.choices(WORDS, k=rng.randint(5, 40))),
+                created_at=since(365),
+            )
+            for _ in range(reviews)
+        ), batch_size, log, "reviews")
+
+    if follows and user_ids:
+        # Each new user follows ``follows`` accounts, mostly readers; early ids are the popular ones.
+        def followees(user_id):
+            readers = {user_ids[int(len(user_ids) * rng.random() ** POPULARITY_SKEW)] for _ in range(follows)}
+            readers.discard(user_id)
+            writers = set(rng.sample(author_ids, min(len(author_ids), follows // 4)))
+            return [{'user_id': reader} for reader in readers] + [{'author_id': writer} for writer in writers]
+
+        _insert(Follow, (
+            Follow(follower_id=user_id, **followee)
+            for user_id in user_ids
+            for followee in followees(user_id)
+        ), batch_size, log, "follows")
+
+    # bulk_create skips the signals that keep these in sync.
+    commands = ['rebuild_ratings', 'rebuild_user_activity', 'rebuild_feeds']
+    if is_postgres():
+        commands.append('update_search_index')
+    for command in commands:
+        output = StringIO()
+        call_command(command, stdout=output)
+        log(output.getvalue().strip())
+
+    return {
+        'users': len(user_ids), 'authors': len(author_ids), 'books': len(book_ids), 'reviews': reviews,
+        'follows': Follow.objects.filter(follower_id__in=user_ids).count() if follows else 0,
+    }
+
+
+def _percentile(samples, percent):
+    if len(samples) == 1:
+        return samples[0]
+    return statistics.quantiles(samples, n=100, method='inclusive')[percent - 1]
+
+
+def _fixtures():
+    user = CustomUser.objects.filter(username__startswith=USERNAME_PREFIX).order_by('pk').first()
+    if user is None:
+        raise LookupError("No benchmark data; run seed_catalogue first.")
+    popular = Book.objects.order_by('-review_count', 'pk').values_list('pk', flat=True).first()
+    review = BookReview.objects.filter(book_id=popular).order_by('-pk').values_list('pk', flat=True).first()
+    return user, popular, review
+
+
+def scenarios(user, book_id, review_id):
+    """``(name, method, path, data)`` for each benchmarked request, in run order."""
+    review_data = {'book_id': book_id, 'user_id': user.pk, 'stars_given': 4, 'comment': 'Benchmark review'}
+    return [
+        ('landing', 'get', reverse('landing_page'), None),
+        ('home feed', 'get', reverse('home_page'), None),
+        ('books list', 'get', reverse('books:list'), None),
+        ('books list deep page', 'get', reverse('books:list') + '?page=50', None),
+        ('books by rating', 'get', reverse('books:list') + '?sort=rating', None),
+        ('books search', 'get', reverse('books:list') + '?q=garden', None),
+        ('book detail', 'get', reverse('books:detail', kwargs={'id': book_id}), None),
+        ('api reviews list', 'get', reverse('api:review-list'), None),
+        ('api reviews cursor', 'get', reverse('api:review-list') + '?cursor=', None),
+        ('api reviews sparse', 'get', reverse('api:review-list') + '?fields=id,stars_given,book.title', None),
+        ('api review detail', 'get', reverse('api:review-detail', kwargs={'id': review_id}), None),
+        ('api review create', 'post', reverse('api:review-list'), review_data),
+        ('api review update', 'put', None, review_data),
+        ('api review patch', 'patch', None, {'stars_given': 2}),
+        ('api review delete', 'delete', None, None),
+        ('api book search', 'get', reverse('api:book-search') + '?q=garden', None),
+        ('api similar books', 'get', reverse('api:book-similar', kwargs={'id': book_id}), None),
+        ('api user activity', 'get', reverse('api:user-activity', kwargs={'id': user.pk}), None),
+        ('api user reviews', 'get', reverse('api:user-reviews', kwargs={'id': user.pk}), None),
+        ('api reviews basic auth', 'get', reverse('api:review-list'), None),
+        ('api reviews token auth', 'get', reverse('api:review-list'), None),
+    ]
+
+
+def credentials(user, password=None):
+    """
+    Authorization headers for the scenarios sent without a session, by name;
+    None for Basic auth unless the users were seeded with ``password``.
+    """
+    basic = base64.b64encode(f'{user.username}:{password}'.encode()).decode()
+    return {
+        'api reviews basic auth': f'Basic {basic}' if password else None,
+        'api reviews token auth': f'Bearer {tokens.issue(user, tokens.ACCESS)}',
+    }
+
+
+def run_benchmarks(iterations=50, warmup=5, cold_cache=False, only=None, password=None):
+    """
+    Time every scenario ``iterations`` times after ``warmup`` untimed runs and
+    count its queries once more separately, so the capture doesn't skew the
+    timings. Write scenarios act on the review created just before them; the
+    Basic auth one needs the ``password`` the users were seeded with.
+    """
+    user, book_id, review_id = _fixtures()
+    client = Client()
+    client.force_login(user)
+    anonymous = Client()
+    headers = credentials(user, password)
+    results = {}
+
+    def request(method, path, data, authorization=None):
+        if authorization is not None:
+            return anonymous.get(path, headers={'Authorization': authorization})
+        if method == 'get':
+            return client.get(path)
+        return getattr(client, method)(path, data=data, content_type='application/json')
+
+    detail_path = reverse('api:review-detail', kwargs={'id': 0}).replace('/0/', '/<id>/')
+    for name, method, path, data in scenarios(user, book_id, review_id):
+        if (only and name not in only) or (name in headers and headers[name] is None):
+            continue
+
+        samples = []
+        for run in range(warmup + iterations + 1):
+            target = path
+            if path is None:
+                # Update, patch and delete each act on a fresh review.
+                fresh = BookReview.objects.create(book_id=book_id, user=user, stars_given=3, comment='Benchmark')
+                target = reverse('api:review-detail', kwargs={'id': fresh.pk})
+            if cold_cache:
+                django_cache.clear()
+
+            if run == warmup + iterations:
+                with CaptureQueriesContext(connection) as queries:
+                    response = request(method, target, data, headers.get(name))
+            else:
+                start = time.perf_counter()
+                response = request(method, target, data, headers.get(name))
+                elapsed = time.perf_counter() - start
+                if run >= warmup:
+                    samples.append(elapsed * 1000)
+
+            if method == 'post' and response.status_code == 201:
+                BookReview.objects.filter(pk=response.json()['id']).delete()
+            elif path is None and method != 'delete':
+                fresh.delete()
+
+        results[name] = {
+            'method': method.upper(),
+            'path': path or detail_path,
+            'status': response.status_code,
+            'queries': len(queries.captured_queries),
+            'p50_ms': round(_percentile(samples, 50), 3),
+            'p99_ms': round(_percentile(samples, 99), 3),
+            'mean_ms': round(statistics.fmean(samples), 3),
+            'max_ms': round(max(samples), 3),
+        }
+
+    return {
+        'commit': current_commit(),
+        'created_at': timezone.now().isoformat(),
+        'database': connection.vendor,
+        'cache': settings.CACHES['default']['BACKEND'],
+        'dataset': {
+            'users': CustomUser.objects.count(),
+            'authors': Author.objects.count(),
+            'books': Book.objects.count(),
+            'reviews': BookReview.objects.count(),
+        },
+        'iterations': iterations,
+        'cold_cache': cold_cache,
+        'results': results,
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=settings.BASE_DIR,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(previous, current):
+    """Yield ``(name, metric, before, after, change %)`` for scenarios present in both runs."""
+    for name, result in current['results'].items():
+        before = previous['results'].get(name)
+        if before is None:
+            continue
+        for metric in ('p50_ms', 'p99_ms', 'queries'):
+            old, new = before[metric], result[metric]
+            change = (new - old) / old * 100 if old else 0.0
+            yield name, metric, old, new, change
@@ -0,0 +1,102 @@
+"""
+The shared loop of the denormalized counter rebuilds (rebuild_ratings,
+rebuild_user_activity).
+
+Rows are walked in primary key batches and compared with counters computed
+from BookReview; drifted ones are rewritten or, with ``--verify``, reported.
+Rows with pending review events are skipped: the outbox still has to apply them.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from books import events
+from books.models import ReviewEvent
+
+
+class RebuildCountersCommand(BaseCommand):
+    """Subclasses set ``label``, ``plural`` and ``event_fields`` and implement the hooks below."""
+    label = None
+    plural = None
+    # ReviewEvent columns holding the ids of the rows an event moves.
+    event_fields = ()
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--verify', action='store_true', help=f"Report drifted {self.plural} without writing.")
+
+    def queryset(self):
+        raise NotImplementedError
+
+    def compute(self, pks):
+        """``{pk: {field: expected value}}`` for a batch."""
+        raise NotImplementedError
+
+    def stored(self, obj):
+        raise NotImplementedError
+
+    def drifted(self, obj, expected):
+        raise NotImplementedError
+
+    def refresh(self, obj, expected):
+        """Set the expected counters on ``obj``."""
+        raise NotImplementedError
+
+    def save(self, stale):
+        """Write refreshed rows; runs in the transaction holding their locks."""
+        raise NotImplementedError
+
+    def in_flight(self):
+        rows = ReviewEvent.objects.filter(dead=False).values_list(*self.event_fields)
+        return {pk for row in rows for pk in row if pk is not None}
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        verify = options['verify']
+        if not verify:
+            # Apply what the outbox already holds, so fewer rows are skipped below.
+            events.drain()
+
+        rows = self.queryset().order_by('pk')
+        last_pk = 0
+        checked = drifted = skipped = 0
+
+        while True:
+            with transaction.atomic():
+                batch = rows.filter(pk__gt=last_pk)[:batch_size]
+                # Locked until rewritten: an event applied meanwhile lands after the
+                # write instead of being overwritten by it.
+                batch = list(batch if verify else batch.select_for_update())
+                if not batch:
+                    break
+                last_pk = batch[-1].pk
+
+                computed = self.compute([obj.pk for obj in batch])
+                # Read after computing: a review counted above whose event is still
+                # pending would be counted again when the event is applied.
+                in_flight = self.in_flight()
+                stale = []
+                for obj in batch:
+                    if obj.pk in in_flight:
+                        skipped += 1
+                        continue
+                    expected = computed[obj.pk]
+                    if self.drifted(obj, expected):
+                        if verify:
+                            self.stdout.write(f"{self.label} {obj.pk}: stored {self.stored(obj)}, expected {expected}")
+                        else:
+                            self.refresh(obj, expected)
+                        stale.append(obj)
+
+                if stale and not verify:
+                    self.save(stale)
+
+            checked += len(batch)
+            drifted += len(stale)
+
+        pending = f" ({skipped} with pending review events skipped)" if skipped else ""
+        if verify and drifted:
+            raise CommandError(f"Checked {checked} {self.plural}, {drifted} out of date{pending}.")
+        elif verify:
+            self.stdout.write(self.style.SUCCESS(f"Checked {checked} {self.plural}, all up to date{pending}."))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Checked {checked} {self.plural}, rebuilt {drifted}{pending}."))
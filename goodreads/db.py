@@ -0,0 +1,138 @@
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+logger = logging.getLogger(__name__)
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+PIN_SESSION_KEY = '_db_primary_until'
+
+
+class ReplicaRouter:
+    """
+    Send reads of ``settings.REPLICA_READ_APPS`` models to a random replica,
+    but only inside ``replica_reads`` views; everything else (writes, auth,
+    sessions, background jobs) stays on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get() and model._meta.app_label in settings.REPLICA_READ_APPS:
+            return random.choice(settings.REPLICA_DATABASES)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def use_replicas(enabled=True):
+    token = _replica_reads.set(enabled and bool(settings.REPLICA_DATABASES))
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def pin_to_primary(request):
+    """
+    Keep this session's reads on the primary until its writes have reached
+    the replicas. Clients without a session (e.g. HTTP Basic) aren't pinned.
+    """
+    session = getattr(request, 'session', None)
+    if settings.REPLICA_DATABASES and session is not None and session.session_key:
+        session[PIN_SESSION_KEY] = time.time() + settings.REPLICA_PIN_SECONDS
+
+
+def is_pinned(request):
+    session = getattr(request, 'session', None)
+    if session is None or not settings.REPLICA_DATABASES:
+        return False
+    return session.get(PIN_SESSION_KEY, 0) > time.time()
+
+
+def replica_reads(view):
+    """Run a read-only view against the replicas unless its session recently wrote."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            pinned = await _ais_pinned(request)
+            with use_replicas(not pinned):
+                return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with use_replicas(not is_pinned(request)):
+                return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+async def _ais_pinned(request):
+    session = getattr(request, 'session', None)
+    if session is None or not settings.REPLICA_DATABASES:
+        return False
+    return await session.aget(PIN_SESSION_KEY, 0) > time.time()
+
+
+class ConnectionStats:
+    """Per-process connection acquire counters, per database alias."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquired = {}
+
+    def record(self, alias, seconds):
+        with self._lock:
+            count, total, longest = self.acquired.get(alias, (0, 0.0, 0.0))
+            self.acquired[alias] = (count + 1, total + seconds, max(longest, seconds))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                alias: {
+                    'connections': count,
+                    'avg_ms': round(total / count * 1000, 2),
+                    'max_ms': round(longest * 1000, 2),
+                }
+                for alias, (count, total, longest) in sorted(self.acquired.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self.acquired.clear()
+
+
+connection_stats = ConnectionStats()
+
+
+class AcquireTimingMixin:
+    """
+    Time every physical connection a DatabaseWrapper obtains: the TCP and
+    auth handshake, or the wait for a free connection when pooled.
+    """
+
+    def get_new_connection(self, conn_params):
+        start = time.perf_counter()
+        try:
+            return super().get_new_connection(conn_params)
+        finally:
+            elapsed = time.perf_counter() - start
+            connection_stats.record(self.alias, elapsed)
+            if elapsed * 1000 >= settings.DB_ACQUIRE_WARN_MS:
+                logger.warning("Acquiring a %s connection took %.1f ms", self.alias, elapsed * 1000)
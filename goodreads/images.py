@@ -0,0 +1,108 @@
+import hashlib
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Variant sizes per image kind, covering the 1x/2x widths of every slot the
+# templates render them into (.cover-pic is 200x300, avatars go from 30 to 200).
+IMAGE_VARIANTS = {
+    'cover': ((200, 300), (400, 600), (600, 900)),
+    'avatar': ((40, 40), (80, 80), (160, 160), (400, 400)),
+}
+WEBP_QUALITY = 80
+JPEG_QUALITY = 82
+# Part of every variant's name: bump it when the encoding settings change.
+VARIANT_REVISION = 1
+
+
+def needs_variants(field, variants):
+    return bool(field.name) and (variants or {}).get('source') != field.name
+
+
+def build_variants(field, kind):
+    """
+    Render the ``kind`` variants of an image field to its storage and return
+    the map stored next to it, or None when the source can't be read.
+
+    Names are derived from the source bytes, so re-uploads of the same image
+    (and the shared default pictures) reuse the files already written.
+    """
+    storage = field.storage
+    try:
+        with storage.open(field.name, 'rb') as source:
+            data = source.read()
+        image = Image.open(BytesIO(data))
+        image.load()
+    except (OSError, ValueError):
+        logger.warning("Can't generate %s variants for %s", kind, field.name, exc_info=True)
+        return None
+
+    image = ImageOps.exif_transpose(image)
+    digest = hashlib.sha256(data + f'{kind}:{VARIANT_REVISION}'.encode()).hexdigest()[:20]
+
+    sizes = [size for size in IMAGE_VARIANTS[kind] if size[0] <= image.width and size[1] <= image.height]
+    images = []
+    for width, height in sizes or IMAGE_VARIANTS[kind][:1]:
+        resized = ImageOps.fit(image, (width, height), Image.Resampling.LANCZOS)
+        images.append({
+            'width': width,
+            'height': height,
+            'webp': _store(storage, f'variants/{kind}/{digest}/{width}x{height}.webp', _encode_webp(resized)),
+            'jpeg': _store(storage, f'variants/{kind}/{digest}/{width}x{height}.jpg', _encode_jpeg(resized)),
+        })
+
+    return {'source': field.name, 'hash': digest, 'images': images}
+
+
+def _store(storage, name, content):
+    if storage.exists(name):
+        return name
+    return storage.save(name, ContentFile(content))
+
+
+def _has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+
+
+def _encode_webp(image):
+    buffer = BytesIO()
+    image.convert('RGBA' if _has_alpha(image) else 'RGB').save(buffer, 'WEBP', quality=WEBP_QUALITY, method=6)
+    return buffer.getvalue()
+
+
+def _encode_jpeg(image):
+    if _has_alpha(image):
+        rgba = image.convert('RGBA')
+        flattened = Image.new('RGB', rgba.size, (255, 255, 255))
+        flattened.paste(rgba, mask=rgba.getchannel('A'))
+        image = flattened
+    buffer = BytesIO()
+    image.convert('RGB').save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def variant_images(field, variants):
+    """The stored variants with storage URLs, smallest first; empty until generated."""
+    if not variants or variants.get('source') != field.name:
+        return []
+    return [
+        {
+            'width': image['width'],
+            'height': image['height'],
+            'webp': field.storage.url(image['webp']),
+            'jpeg': field.storage.url(image['jpeg']),
+        }
+        for image in variants.get('images', ())
+    ]
+
+
+def pick_variant(images, width):
+    """Smallest variant at least ``width`` wide, else the largest there is."""
+    for image in images:
+        if image['width'] >= width:
+            return image
+    return images[-1] if images else None
@@ -0,0 +1,307 @@
+"""
+Per-process request metrics in the Prometheus text format.
+
+Every request counts towards the per-route request counter and latency
+histogram. A ``METRICS_SAMPLE_RATE`` share of requests also records its SQL
+query count and DB, template render and serializer time (and, with
+``SERVER_TIMING``, reports them in a ``Server-Timing`` header). Render and
+serializer time include any queries run lazily inside them.
+
+Counters live in the worker process, like the fragment cache stats, so each
+worker must be scraped on its own.
+"""
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends import django as django_backend
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+PAGE_SIZE_BUCKETS = (1, 5, 10, 20, 50, 100, 500, 1000)
+TIMED = ('db', 'template', 'serializer')
+
+_timings = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self):
+        self.queries = 0
+        self.seconds = dict.fromkeys(TIMED, 0.0)
+        self.running = set()
+
+    def server_timing(self, total):
+        parts = [f'{name};dur={self.seconds[name] * 1000:.1f}' for name in TIMED]
+        parts[0] += f';desc="{self.queries} queries"'
+        parts.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(parts)
+
+
+@contextmanager
+def timed(name):
+    """Add the block's duration to the sampled request's ``name`` time; nested blocks count once."""
+    timings = _timings.get()
+    if timings is None or name in timings.running:
+        yield
+        return
+
+    timings.running.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.seconds[name] += time.perf_counter() - start
+        timings.running.discard(name)
+
+
+def record_query(execute, sql, params, many, context):
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.seconds['db'] += time.perf_counter() - start
+
+
+def instrument(connection, **kwargs):
+    # First in the list so ``execute_wrapper()`` blocks can still pop their own.
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+# Connections opened later, including the async ORM's worker threads.
+connection_created.connect(instrument)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield sample(f'{name}_bucket', {**labels, 'le': str(bound)}, cumulative)
+        yield sample(f'{name}_bucket', {**labels, 'le': '+Inf'}, self.count)
+        yield sample(f'{name}_sum', labels, round(self.sum, 6))
+        yield sample(f'{name}_count', labels, self.count)
+
+
+def sample(name, labels, value):
+    if not labels:
+        return f'{name} {value}'
+    escaped = ','.join(
+        '{}="{}"'.format(key, str(label).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, label in labels.items()
+    )
+    return f'{name}{{{escaped}}} {value}'
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.latency = {}
+            self.queries = {}
+            self.seconds = {}
+            self.page_sizes = {}
+            self.page_size_outcomes = {}
+
+    def observe(self, route, method, status, duration, timings=None):
+        with self._lock:
+            key = (route, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault(route, Histogram(LATENCY_BUCKETS)).observe(duration)
+            if timings is not None:
+                self.queries.setdefault(route, Histogram(QUERY_BUCKETS)).observe(timings.queries)
+                totals = self.seconds.setdefault(route, dict.fromkeys(TIMED, 0.0))
+                for name in TIMED:
+                    totals[name] += timings.seconds[name]
+
+    def observe_page_size(self, route, requested, outcome):
+        """``outcome`` is default, invalid, accepted or clamped; ``requested`` is the asked-for size, if any."""
+        with self._lock:
+            key = (route, outcome)
+            self.page_size_outcomes[key] = self.page_size_outcomes.get(key, 0) + 1
+            if requested is not None:
+                self.page_sizes.setdefault(route, Histogram(PAGE_SIZE_BUCKETS)).observe(requested)
+
+    def render(self):
+        from books.cache import stats as fragment_stats
+        from goodreads.db import connection_stats
+
+        with self._lock:
+            lines = [
+                '# HELP goodreads_requests_total Requests handled, by route, method and status.',
+                '# TYPE goodreads_requests_total counter',
+            ]
+            for (route, method, status), count in sorted(self.requests.items()):
+                lines.append(sample(
+                    'goodreads_requests_total', {'route': route, 'method': method, 'status': status}, count
+                ))
+
+            lines += [
+                '# HELP goodreads_request_duration_seconds Request latency, by route.',
+                '# TYPE goodreads_request_duration_seconds histogram',
+            ]
+            for route, histogram in sorted(self.latency.items()):
+                lines += histogram.lines('goodreads_request_duration_seconds', {'route': route})
+
+            lines += [
+                '# HELP goodreads_request_queries SQL queries per sampled request, by route.',
+                '# TYPE goodreads_request_queries histogram',
+            ]
+            for route, histogram in sorted(self.queries.items()):
+                lines += histogram.lines('goodreads_request_queries', {'route': route})
+
+            for name in TIMED:
+                metric = f'goodreads_request_{name}_seconds_total'
+                lines += [
+                    f'# HELP {metric} Time spent in {name} by sampled requests, by route.',
+                    f'# TYPE {metric} counter',
+                ]
+                for route, totals in sorted(self.seconds.items()):
+                    lines.append(sample(metric, {'route': route}, round(totals[name], 6)))
+
+            lines += [
+                '# HELP goodreads_page_size_requested Page sizes asked for with ?page_size=, before clamping.',
+                '# TYPE goodreads_page_size_requested histogram',
+            ]
+            for route, histogram in sorted(self.page_sizes.items()):
+                lines += histogram.lines('goodreads_page_size_requested', {'route': route})
+
+            lines += [
+                '# HELP goodreads_page_size_total Paginated requests by route and page size outcome.',
+                '# TYPE goodreads_page_size_total counter',
+            ]
+            for (route, outcome), count in sorted(self.page_size_outcomes.items()):
+                lines.append(sample('goodreads_page_size_total', {'route': route, 'outcome': outcome}, count))
+
+        lines += [
+            '# HELP goodreads_fragment_cache_requests_total Fragment cache lookups, by fragment and result.',
+            '# TYPE goodreads_fragment_cache_requests_total counter',
+        ]
+        for fragment, counts in fragment_stats.snapshot().items():
+            lines.append(sample('goodreads_fragment_cache_requests_total',
+                                {'fragment': fragment, 'result': 'hit'}, counts['hits']))
+            lines.append(sample('goodreads_fragment_cache_requests_total',
+                                {'fragment': fragment, 'result': 'miss'}, counts['misses']))
+
+        lines += [
+            '# HELP goodreads_db_connections_total Physical database connections acquired, by alias.',
+            '# TYPE goodreads_db_connections_total counter',
+        ]
+        for alias, acquired in connection_stats.snapshot().items():
+            lines.append(sample('goodreads_db_connections_total', {'alias': alias}, acquired['connections']))
+
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unmatched>'
+    return match.view_name
+
+
+class MetricsMiddleware:
+    """Goes first in MIDDLEWARE, so its timings cover the whole stack."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timings = self.start()
+        if timings is not None:
+            for connection in connections.all(initialized_only=True):
+                instrument(connection)
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, started, timings)
+
+    async def __acall__(self, request):
+        timings = self.start()
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, started, timings)
+
+    def start(self):
+        if not settings.METRICS_ENABLED or random.random() >= settings.METRICS_SAMPLE_RATE:
+            return None
+        return RequestTimings()
+
+    def finish(self, request, response, started, timings):
+        if not settings.METRICS_ENABLED:
+            return response
+
+        duration = time.perf_counter() - started
+        registry.observe(route_name(request), request.method, response.status_code, duration, timings)
+        if timings is not None and settings.SERVER_TIMING:
+            response['Server-Timing'] = timings.server_timing(duration)
+        return response
+
+
+class TimedTemplate:
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return self.template.render(context, request)
+
+
+class DjangoTemplates(django_backend.DjangoTemplates):
+    """The stock Django template backend, with render time recorded for sampled requests."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
@@ -0,0 +1,308 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+from goodreads import metrics
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class CursorPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Keyset paginator over a descending (timestamp, id) ordering.
+
+    Every page is a single indexed range read of ``page_size + 1`` rows: no
+    COUNT(*) and no OFFSET, so page 10 000 costs the same as page 1. Cursors
+    are opaque url-safe tokens holding the boundary row's key.
+    """
+
+    def __init__(self, queryset, page_size, field='created_at', tiebreak='pk'):
+        self.queryset = queryset
+        self.page_size = int(page_size)
+        self.field = field
+        self.tiebreak = tiebreak
+
+        if self.page_size < 1:
+            raise ValueError("page_size must be a positive integer")
+
+    def encode_cursor(self, obj, direction):
+        if isinstance(obj, dict):
+            value, pk = obj[self.field], obj['id' if self.tiebreak == 'pk' else self.tiebreak]
+        else:
+            value, pk = getattr(obj, self.field), getattr(obj, self.tiebreak)
+        payload = json.dumps([direction, value.isoformat(), pk])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            value = parse_datetime(value)
+            pk = int(pk)
+        except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+            raise InvalidCursor("Invalid cursor")
+
+        if direction not in ('n', 'p') or value is None:
+            raise InvalidCursor("Invalid cursor")
+
+        return direction, value, pk
+
+    def get_page(self, cursor=None):
+        queryset, direction, has_previous = self.page_query(cursor)
+        page = self.build_page(list(queryset), direction, has_previous)
+        if page is None:
+            return self.get_page()
+        return page
+
+    async def aget_page(self, cursor=None):
+        queryset, direction, has_previous = self.page_query(cursor)
+        page = self.build_page([obj async for obj in queryset], direction, has_previous)
+        if page is None:
+            return await self.aget_page()
+        return page
+
+    def page_query(self, cursor):
+        if not cursor:
+            return self.queryset.order_by(f'-{self.field}', f'-{self.tiebreak}')[:self.page_size + 1], 'n', False
+
+        direction, value, pk = self.decode_cursor(cursor)
+
+        if direction == 'n':
+            older = Q(**{f'{self.field}__lt': value}) | Q(**{self.field: value, f'{self.tiebreak}__lt': pk})
+            queryset = self.queryset.filter(older).order_by(f'-{self.field}', f'-{self.tiebreak}')
+            return queryset[:self.page_size + 1], 'n', True
+
+        newer = Q(**{f'{self.field}__gt': value}) | Q(**{self.field: value, f'{self.tiebreak}__gt': pk})
+        queryset = self.queryset.filter(newer).order_by(self.field, self.tiebreak)
+        return queryset[:self.page_size + 1], 'p', True
+
+    def build_page(self, rows, direction, has_previous):
+        """Turn ``page_size + 1`` fetched rows into a page; None means restart from the top."""
+        if direction == 'n':
+            has_next = len(rows) > self.page_size
+            rows = rows[:self.page_size]
+
+            return CursorPage(
+                rows,
+                next_cursor=self.encode_cursor(rows[-1], 'n') if has_next else None,
+                previous_cursor=self.encode_cursor(rows[0], 'p') if has_previous and rows else None,
+            )
+
+        if not rows:
+            return None
+
+        has_previous = len(rows) > self.page_size
+        rows = rows[:self.page_size][::-1]
+
+        return CursorPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1], 'n'),
+            previous_cursor=self.encode_cursor(rows[0], 'p') if has_previous else None,
+        )
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """
+    Keyset paginator over several sources sharing one (timestamp, id) key.
+
+    Each source is a ``(queryset, tiebreak, convert)`` triple, where
+    ``convert`` turns its fetched rows into the page's objects (or is None).
+    Every source is read with the same cursor, one range read each, and the
+    rows merged; an object found in several sources is listed once.
+    """
+
+    def __init__(self, sources, page_size, field='created_at'):
+        super().__init__(None, page_size, field)
+        self.sources = [
+            (CursorPaginator(queryset, page_size, field, tiebreak), convert)
+            for queryset, tiebreak, convert in sources
+        ]
+
+    def get_page(self, cursor=None):
+        rows = []
+        for paginator, convert in self.sources:
+            queryset, direction, has_previous = paginator.page_query(cursor)
+            fetched = list(queryset)
+            rows += convert(fetched) if convert else fetched
+
+        page = self.build_page(self.merge(rows, direction), direction, has_previous)
+        if page is None:
+            return self.get_page()
+        return page
+
+    async def aget_page(self, cursor=None):
+        rows = []
+        for paginator, convert in self.sources:
+            queryset, direction, has_previous = paginator.page_query(cursor)
+            fetched = [obj async for obj in queryset]
+            rows += convert(fetched) if convert else fetched
+
+        page = self.build_page(self.merge(rows, direction), direction, has_previous)
+        if page is None:
+            return await self.aget_page()
+        return page
+
+    def merge(self, rows, direction):
+        unique = {obj.pk: obj for obj in rows}.values()
+        ordered = sorted(unique, key=lambda obj: (getattr(obj, self.field), obj.pk), reverse=direction == 'n')
+        return ordered[:self.page_size + 1]
+
+
+def endpoint_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else 'default'
+
+
+def pagination_policy(endpoint):
+    """``settings.PAGINATION['default']`` overlaid with the endpoint's own entry."""
+    return {**settings.PAGINATION['default'], **settings.PAGINATION.get(endpoint, {})}
+
+
+def get_page_size(request, params=None, param='page_size'):
+    """
+    The client's ``?page_size=`` clamped to the endpoint's ``[1, max]``, or
+    its default when absent or not a number. Every call is counted in the
+    request metrics, so the limits can follow what clients ask for.
+    """
+    endpoint = endpoint_name(request)
+    policy = pagination_policy(endpoint)
+    requested = (request.GET if params is None else params).get(param)
+
+    try:
+        size = int(requested)
+    except (TypeError, ValueError):
+        outcome = 'default' if requested is None else 'invalid'
+        metrics.registry.observe_page_size(endpoint, None, outcome)
+        return policy['default']
+
+    bounded = min(max(size, 1), policy['max'])
+    metrics.registry.observe_page_size(endpoint, size, 'accepted' if bounded == size else 'clamped')
+    return bounded
+
+
+def wants_count(request, params=None):
+    """Whether to COUNT(*) for totals; endpoints can turn it off and clients can opt out with ?count=false."""
+    params = request.GET if params is None else params
+    return pagination_policy(endpoint_name(request))['count'] and params.get('count') not in ('0', 'false')
+
+
+class LookaheadPage:
+    """A numbered page that knows only whether another page follows, not how many."""
+
+    def __init__(self, object_list, number, has_next):
+        self.object_list = object_list
+        self.number = number
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+class LookaheadPaginator:
+    """
+    Page-number pagination without COUNT(*): each page fetches one extra row
+    to learn whether a next page exists. Out-of-range pages are empty.
+    """
+    # Databases take OFFSET as a signed 64-bit integer; pages beyond it are empty without a query.
+    max_offset = 2 ** 63 - 1
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+
+    def validate_number(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return 1
+        return max(number, 1)
+
+    def page_query(self, number):
+        offset = (number - 1) * self.per_page
+        if offset + self.per_page + 1 > self.max_offset:
+            return self.queryset.none()
+        return self.queryset[offset:offset + self.per_page + 1]
+
+    def build_page(self, rows, number):
+        return LookaheadPage(rows[:self.per_page], number, len(rows) > self.per_page)
+
+    def get_page(self, number):
+        number = self.validate_number(number)
+        return self.build_page(list(self.page_query(number)), number)
+
+    async def aget_page(self, number):
+        number = self.validate_number(number)
+        return self.build_page([obj async for obj in self.page_query(number)], number)
+
+
+def paginate(queryset, request):
+    """Page ``?page=`` of ``queryset`` under the endpoint's pagination policy."""
+    page_size = get_page_size(request)
+    if wants_count(request):
+        return Paginator(queryset, page_size).get_page(request.GET.get('page'))
+    return LookaheadPaginator(queryset, page_size).get_page(request.GET.get('page'))
+
+
+async def apaginate(queryset, request):
+    page_size = get_page_size(request)
+    if not wants_count(request):
+        return await LookaheadPaginator(queryset, page_size).aget_page(request.GET.get('page'))
+
+    paginator = Paginator(queryset, page_size)
+    paginator.count = await queryset.acount()
+    page = paginator.get_page(request.GET.get('page'))
+    page.object_list = [obj async for obj in page.object_list]
+    return page
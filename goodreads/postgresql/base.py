@@ -0,0 +1,7 @@
+from django.db.backends.postgresql import base
+
+from goodreads.db import AcquireTimingMixin
+
+
+class DatabaseWrapper(AcquireTimingMixin, base.DatabaseWrapper):
+    pass
@@ -0,0 +1,45 @@
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.views.decorators.http import condition
+
+
+def select_view(name, sync_view, async_view):
+    """Route ``name`` to its async implementation when listed in ``settings.ASYNC_VIEWS``."""
+    return async_view if name in settings.ASYNC_VIEWS else sync_view
+
+
+async def resolve_user(request):
+    """
+    Load ``request.user`` without touching the database synchronously, so
+    templates and permission checks can use it from async views.
+    """
+    request.user = await request.auser()
+    return request.user
+
+
+def async_condition(etag_func=None, last_modified_func=None):
+    """
+    ``condition`` for async views. Django calls the validators synchronously
+    even there, so they run in a worker thread (after ``resolve_user``, for
+    validators that read ``request.user``) and ``condition`` gets their results.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            await resolve_user(request)
+
+            def validators():
+                return (
+                    etag_func(request, *args, **kwargs) if etag_func else None,
+                    last_modified_func(request, *args, **kwargs) if last_modified_func else None,
+                )
+
+            etag, last_modified = await sync_to_async(validators)()
+            conditional = condition(etag_func=lambda *_, **__: etag, last_modified_func=lambda *_, **__: last_modified)
+            return await conditional(view)(request, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,44 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+
+def shared_cache():
+    """
+    Settings for a deployment with a shared cache. A test run is one process,
+    where the locmem cache is as good as shared.
+    """
+    return override_settings(
+        AUTH_USER_CACHE_SECONDS=60,
+        SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+        API_TOKEN_DENYLIST_CACHE='default',
+    )
+
+
+class QueryCountMixin:
+    """
+    Pins the exact number of SQL queries an endpoint issues.
+
+    Seed enough rows that an N+1 would show up, then call
+    ``assertEndpointQueries``; any regression (or improvement) changes the
+    count and fails the test with the captured SQL. Counts are pinned for a
+    deployment with a shared cache.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.enterClassContext(shared_cache())
+        super().setUpClass()
+
+    def assertEndpointQueries(self, expected, url, method='get', using=DEFAULT_DB_ALIAS, **kwargs):
+        with CaptureQueriesContext(connections[using]) as context:
+            response = getattr(self.client, method)(url, **kwargs)
+
+        executed = len(context.captured_queries)
+        if executed != expected:
+            queries = "\n".join(
+                f"{i}. {query['sql']}" for i, query in enumerate(context.captured_queries, start=1)
+            )
+            self.fail(f"{method.upper()} {url} executed {executed} queries, expected {expected}:\n{queries}")
+
+        return response
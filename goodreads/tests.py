@@ -1,11 +1,20 @@
-from django.test import TestCase
+import importlib
+import sys
+from unittest import mock
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.shortcuts import reverse
+from django.urls import clear_url_caches
 
 from books.models import Book, BookReview
+from goodreads import db, metrics
+from goodreads.testing import QueryCountMixin
 from users.models import CustomUser
 
 
-class HomePageTestCase(TestCase):
+class HomePageTestCase(QueryCountMixin, TestCase):
     def test_paginated_list(self):
         book = Book.objects.create(title='Test Book', description='Test description', isbn='123123123')
         user = CustomUser.objects.create(
@@ -23,3 +32,361 @@ class HomePageTestCase(TestCase):
         self.assertContains(response, review3.comment)
         self.assertContains(response, review2.comment)
         self.assertNotContains(response, review1.comment)
+
+    def test_cursor_pagination(self):
+        book = Book.objects.create(title='Test Book', description='Test description', isbn='123123123')
+        user = CustomUser.objects.create(username='sayitkamol', first_name='sayitkamol')
+
+        review1 = BookReview.objects.create(book=book, user=user, stars_given=5, comment="Very good")
+        review2 = BookReview.objects.create(book=book, user=user, stars_given=4, comment="Useful book")
+        review3 = BookReview.objects.create(book=book, user=user, stars_given=3, comment="Nice book")
+
+        response = self.client.get(reverse('home_page') + '?page_size=2')
+        page_obj = response.context['page_obj']
+
+        self.assertFalse(page_obj.has_previous())
+        self.assertTrue(page_obj.has_next())
+        self.assertContains(response, f'href="?page_size=2&amp;cursor={page_obj.next_cursor}"')
+
+        response = self.client.get(reverse('home_page') + f'?page_size=2&cursor={page_obj.next_cursor}')
+        page_obj = response.context['page_obj']
+        self.assertContains(response, 'href="?page_size=2">&laquo; newest')
+        self.assertContains(response, f'href="?page_size=2&amp;cursor={page_obj.previous_cursor}"')
+
+        self.assertContains(response, review1.comment)
+        self.assertNotContains(response, review2.comment)
+        self.assertNotContains(response, review3.comment)
+        self.assertFalse(page_obj.has_next())
+        self.assertTrue(page_obj.has_previous())
+
+        response = self.client.get(reverse('home_page') + f'?page_size=2&cursor={page_obj.previous_cursor}')
+
+        self.assertEqual(list(response.context['page_obj']), [review3, review2])
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        book = Book.objects.create(title='Test Book', description='Test description', isbn='123123123')
+        user = CustomUser.objects.create(username='sayitkamol', first_name='sayitkamol')
+        review = BookReview.objects.create(book=book, user=user, stars_given=5, comment="Very good")
+
+        response = self.client.get(reverse('home_page') + '?cursor=not-a-cursor')
+
+        self.assertContains(response, review.comment)
+
+    def test_feed_queries(self):
+        for i in range(5):
+            book = Book.objects.create(title=f'book{i}', description='description', isbn=f'99{i}')
+            user = CustomUser.objects.create(username=f'user{i}')
+            BookReview.objects.create(book=book, user=user, stars_given=3, comment=f'comment{i}')
+
+        response = self.assertEndpointQueries(1, reverse('home_page'))
+
+        self.assertContains(response, 'user4')
+
+
+def reload_urlconf():
+    clear_url_caches()
+    for module in ('books.urls', 'api.urls', 'goodreads.urls'):
+        importlib.reload(sys.modules[module])
+
+
+@override_settings(ASYNC_VIEWS=['home_page', 'books:list', 'books:detail', 'api:review-list', 'api:review-detail'])
+class AsyncViewsTestCase(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Registered first so it runs last, once ASYNC_VIEWS is restored.
+        cls.addClassCleanup(reload_urlconf)
+        super().setUpClass()
+        reload_urlconf()
+
+    def setUp(self):
+        self.book = Book.objects.create(title='Test Book', description='Test description', isbn='123123123')
+        self.user = CustomUser.objects.create(username='sayitkamol', first_name='sayitkamol')
+        with self.captureOnCommitCallbacks(execute=True):
+            # Runs the fan-out into the reviewer's own home feed.
+            self.review = BookReview.objects.create(book=self.book, user=self.user, stars_given=5, comment="Very good")
+
+    async def test_async_html_views(self):
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(reverse('home_page'))
+        self.assertContains(response, self.review.comment)
+        self.assertContains(response, self.user.username)
+
+        response = await self.async_client.get(reverse('books:list') + '?q=Test')
+        self.assertContains(response, self.book.title)
+
+        response = await self.async_client.get(reverse('books:detail', kwargs={'id': self.book.id}))
+        self.assertContains(response, self.book.description)
+        self.assertContains(response, self.review.comment)
+
+    async def test_async_api_reads(self):
+        response = await self.async_client.get(reverse('api:review-list'))
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.get(reverse('api:review-list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 1)
+        self.assertEqual(response.json()['results'][0]['id'], self.review.id)
+
+        response = await self.async_client.get(reverse('api:review-list') + '?cursor=')
+        self.assertEqual(response.json()['results'][0]['user']['username'], 'sayitkamol')
+        self.assertIsNone(response.json()['next'])
+
+        response = await self.async_client.get(reverse('api:review-detail', kwargs={'id': self.review.id}))
+        self.assertEqual(response.json()['book']['title'], 'Test Book')
+
+        response = await self.async_client.get(reverse('api:review-detail', kwargs={'id': 0}))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_async_conditional_gets(self):
+        urls = [
+            reverse('books:list') + '?q=Test',
+            reverse('books:detail', kwargs={'id': self.book.id}),
+            reverse('api:review-detail', kwargs={'id': self.review.id}),
+        ]
+        await self.async_client.aforce_login(self.user)
+        # The first visit sets the CSRF cookie, which the book page validators depend on.
+        await self.async_client.get(urls[1])
+
+        for url in urls:
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response.has_header('ETag'))
+
+                response = await self.async_client.get(url, headers={'if-none-match': response['ETag']})
+                self.assertEqual(response.status_code, 304)
+
+        response = await self.async_client.get(urls[2])
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.review.comment = 'Changed my mind'
+        await self.review.asave()
+        response = await self.async_client.get(urls[2], headers={'if-none-match': response['ETag']})
+        self.assertEqual(response.json()['comment'], 'Changed my mind')
+
+    async def test_async_api_delegates_writes(self):
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.patch(
+            reverse('api:review-detail', kwargs={'id': self.review.id}),
+            data={'stars_given': 2}, content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, 200)
+        await self.review.arefresh_from_db()
+        self.assertEqual(self.review.stars_given, 2)
+
+
+# A replica alias mirroring the test database, so routed reads run on a
+# connection of their own. It has to exist before the runner sets up the
+# test databases, which happens after test modules are imported.
+connections.settings.setdefault('replica', {
+    **connections.settings[DEFAULT_DB_ALIAS],
+    'TEST': {**connections.settings[DEFAULT_DB_ALIAS]['TEST'], 'MIRROR': DEFAULT_DB_ALIAS},
+})
+
+
+# A mirror is a second connection, which can't see the rows of an open test
+# transaction; TransactionTestCase commits them.
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRoutingTestCase(TransactionTestCase):
+    databases = {DEFAULT_DB_ALIAS, 'replica'}
+
+    def setUp(self):
+        # Commits run the image variant tasks, which have no default images here.
+        for task in ('books.signals.generate_cover_variants', 'users.signals.generate_profile_picture_variants'):
+            patcher = mock.patch(task)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.book = Book.objects.create(title='sport', description='description1', isbn='1234234')
+        self.user = CustomUser.objects.create(username='sayitkamol')
+        self.user.set_password('qiyinparol')
+        self.user.save()
+        self.router = db.ReplicaRouter()
+
+    def get(self, url):
+        """The response and the SQL run on the primary and on the replica."""
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(url)
+        return response, primary.captured_queries, replica.captured_queries
+
+    def test_router(self):
+        self.assertIsNone(self.router.db_for_read(Book))
+        with db.use_replicas():
+            self.assertEqual(self.router.db_for_read(Book), 'replica')
+            self.assertIsNone(self.router.db_for_read(CustomUser))
+            self.assertEqual(self.router.db_for_write(Book), DEFAULT_DB_ALIAS)
+
+        with override_settings(REPLICA_DATABASES=[]), db.use_replicas():
+            self.assertIsNone(self.router.db_for_read(Book))
+
+    def test_read_views_use_replicas(self):
+        response, primary, replica = self.get(reverse("books:detail", kwargs={"id": self.book.id}))
+        self.assertContains(response, 'sport')
+        self.assertTrue(any('"books_book"' in query['sql'] for query in replica))
+        self.assertFalse(any('"books_book"' in query['sql'] for query in primary))
+
+        self.client.login(username='sayitkamol', password='qiyinparol')
+        response, primary, replica = self.get(reverse("api:review-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(any('"books_bookreview"' in query['sql'] for query in replica))
+        # Sessions stay on the primary.
+        self.assertFalse(any('"django_session"' in query['sql'] for query in replica))
+
+    def test_writes_and_pinned_sessions_use_the_primary(self):
+        self.client.login(username='sayitkamol', password='qiyinparol')
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            self.client.post(reverse("books:reviews", kwargs={"id": self.book.id}), data={
+                "stars_given": 3,
+                "comment": "Nice book"
+            })
+        self.assertTrue(any(
+            query['sql'].startswith('INSERT INTO "books_bookreview"') for query in primary.captured_queries
+        ))
+        self.assertEqual(replica.captured_queries, [])
+        self.assertIn(db.PIN_SESSION_KEY, self.client.session)
+
+        response, primary, replica = self.get(reverse("books:detail", kwargs={"id": self.book.id}))
+        self.assertContains(response, 'Nice book')
+        self.assertEqual(replica, [])
+
+        with mock.patch('goodreads.db.time.time', return_value=self.client.session[db.PIN_SESSION_KEY] + 1):
+            _, primary, replica = self.get(reverse("books:detail", kwargs={"id": self.book.id}))
+        self.assertTrue(any('"books_book"' in query['sql'] for query in replica))
+
+
+class ConnectionTimingTestCase(TestCase):
+    def setUp(self):
+        db.connection_stats.reset()
+        self.addCleanup(db.connection_stats.reset)
+
+    def wrapper(self):
+        from django.db import connection
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+
+        class TimedWrapper(db.AcquireTimingMixin, DatabaseWrapper):
+            pass
+
+        return TimedWrapper({**connection.settings_dict, 'NAME': ':memory:'}, alias='timed')
+
+    def test_acquire_time_is_recorded(self):
+        wrapper = self.wrapper()
+        wrapper.ensure_connection()
+        wrapper.close()
+
+        stats = db.connection_stats.snapshot()
+        self.assertEqual(stats['timed']['connections'], 1)
+        self.assertGreaterEqual(stats['timed']['max_ms'], stats['timed']['avg_ms'])
+
+    @override_settings(DB_ACQUIRE_WARN_MS=0)
+    def test_slow_acquire_is_logged(self):
+        wrapper = self.wrapper()
+        with self.assertLogs('goodreads.db', 'WARNING'):
+            wrapper.ensure_connection()
+        wrapper.close()
+
+
+@override_settings(METRICS_SAMPLE_RATE=1.0, SERVER_TIMING=True)
+class MetricsTestCase(TestCase):
+    def setUp(self):
+        self.book = Book.objects.create(title='sport', description='description1', isbn='1234234')
+        self.user = CustomUser.objects.create(username='sayitkamol')
+        BookReview.objects.create(book=self.book, user=self.user, stars_given=4, comment='Nice book')
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+
+    def test_server_timing(self):
+        response = self.client.get(reverse("books:detail", kwargs={"id": self.book.id}))
+
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'^db;dur=[\d.]+;desc="[1-9]\d* queries", template;dur=[\d.]+, serializer;dur=0\.0, total;')
+        self.assertEqual(metrics.registry.queries['books:detail'].count, 1)
+        self.assertGreater(metrics.registry.seconds['books:detail']['template'], 0)
+
+    def test_serializer_time(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("api:review-list"))
+        self.assertGreater(metrics.registry.seconds['api:review-list']['serializer'], 0)
+
+    @override_settings(METRICS_SAMPLE_RATE=0.0)
+    def test_unsampled_requests_only_count(self):
+        response = self.client.get(reverse("books:detail", kwargs={"id": self.book.id}))
+
+        self.assertNotIn('Server-Timing', response)
+        self.assertEqual(metrics.registry.latency['books:detail'].count, 1)
+        self.assertNotIn('books:detail', metrics.registry.queries)
+
+    def test_metrics_endpoint(self):
+        self.client.get(reverse("books:detail", kwargs={"id": self.book.id}))
+
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'goodreads_requests_total{route="books:detail",method="GET",status="200"} 1')
+        self.assertContains(response, 'goodreads_request_duration_seconds_bucket{route="books:detail",le="+Inf"} 1')
+
+        response = self.client.get(reverse("metrics"), REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 403)
+
+
+class PaginationPolicyTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='sayitkamol')
+        for i in range(3):
+            book = Book.objects.create(title=f'book{i}', description='description', isbn=f'99{i}')
+            BookReview.objects.create(book=book, user=self.user, stars_given=3, comment=f'comment{i}')
+        metrics.registry.reset()
+        self.addCleanup(metrics.registry.reset)
+
+    @override_settings(PAGINATION={'default': {'default': 20, 'max': 2, 'count': True}})
+    def test_page_size_is_clamped(self):
+        response = self.client.get(reverse('home_page') + '?page_size=1000000')
+
+        self.assertEqual(len(response.context['page_obj']), 2)
+        self.assertEqual(metrics.registry.page_size_outcomes, {('home_page', 'clamped'): 1})
+        self.assertEqual(metrics.registry.page_sizes['home_page'].sum, 1000000)
+
+    def test_invalid_page_size_uses_default(self):
+        response = self.client.get(reverse('books:list') + '?page_size=lots')
+
+        self.assertEqual(len(response.context['page_obj']), 3)
+        self.assertEqual(metrics.registry.page_size_outcomes, {('books:list', 'invalid'): 1})
+
+    def test_countless_books_list(self):
+        response = self.client.get(reverse('books:list') + '?page_size=2&sort=rating')
+
+        page_obj = response.context['page_obj']
+        self.assertTrue(page_obj.has_next())
+        self.assertFalse(page_obj.has_previous())
+        self.assertContains(response, 'href="?page_size=2&amp;sort=rating&amp;page=2"')
+        self.assertNotContains(response, 'last &raquo;')
+
+        response = self.client.get(reverse('books:list') + '?page_size=2&page=2')
+        self.assertEqual(len(response.context['page_obj']), 1)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_huge_page_numbers_are_empty(self):
+        response = self.client.get(reverse('books:list') + '?sort=rating&page=99999999999999999999')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('api:review-list') + '?count=false&page=99999999999999999999')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+        self.assertIsNone(response.data['next'])
+
+    def test_api_count_opt_out(self):
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('api:review-list') + '?page_size=2')
+        self.assertEqual(response.data['count'], 3)
+
+        response = self.client.get(reverse('api:review-list') + '?page_size=2&count=false')
+        self.assertNotIn('count', response.data)
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIn('page=2', response.data['next'])
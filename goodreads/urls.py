@@ -3,15 +3,17 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
-from .views import landing_page, home_page
+from .routing import select_view
+from .views import landing_page, home_page, home_page_async, metrics_view
 
 urlpatterns = [
     path('', landing_page, name='landing_page'),
-    path('home/', home_page, name='home_page'),
+    path('home/', select_view('home_page', home_page, home_page_async), name='home_page'),
     path('books/', include('books.urls')),
     path('users/', include('users.urls')),
     path('api/', include('api.urls')),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('api-auth/', include('rest_framework.urls')),
 ]
 
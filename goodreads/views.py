@@ -1,19 +1,60 @@
-from django.core.paginator import Paginator
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import render
 
+from books import feeds, rankings
 from books.models import BookReview
+from goodreads import metrics
+from goodreads.db import replica_reads
+from goodreads.pagination import CursorPaginator, InvalidCursor, get_page_size
+from goodreads.routing import resolve_user
 
 
+TRENDING_SHOWN = 6
+
+
+@replica_reads
 def landing_page(request):
-    return render(request, "landing.html")
+    trending = rankings.ranked('weekly', TRENDING_SHOWN)
+    return render(request, "landing.html", {'trending': trending})
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint for this worker; scrapers must come from METRICS_ALLOWED_IPS."""
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS and not request.user.is_staff:
+        return HttpResponse(status=403)
+    return HttpResponse(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+def home_paginator(user, page_size):
+    """The reader's own feed, or everyone's latest reviews for anonymous visitors."""
+    if user.is_authenticated:
+        return feeds.feed_paginator(user, page_size)
+    return CursorPaginator(BookReview.objects.for_feed(), page_size)
 
 
+@replica_reads
 def home_page(request):
-    book_reviews = BookReview.objects.all().order_by('-created_at')
-    page_size = request.GET.get('page_size', 10)
-    paginator = Paginator(book_reviews, page_size)
+    paginator = home_paginator(request.user, get_page_size(request))
+
+    try:
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+    except InvalidCursor:
+        page_obj = paginator.get_page()
+
+    return render(request, 'home.html', {'page_obj': page_obj})
+
+
+@replica_reads
+async def home_page_async(request):
+    await resolve_user(request)
+
+    paginator = await sync_to_async(home_paginator)(request.user, get_page_size(request))
 
-    page_num = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_num)
+    try:
+        page_obj = await paginator.aget_page(request.GET.get('cursor'))
+    except InvalidCursor:
+        page_obj = await paginator.aget_page()
 
-    return render(request, 'home.html', {'page_obj': page_obj})
\ No newline at end of file
+    return render(request, 'home.html', {'page_obj': page_obj})
@@ -0,0 +1,82 @@
+from collections import defaultdict
+
+from django.db.models import Count, F, Max, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from books.ratings import running_average
+from goodreads.auth import forget_users
+
+ACTIVITY_COUNTERS = ('review_count', 'stars_given_total', 'average_stars_given')
+
+
+def activity_deltas(changes):
+    """Fold ``(old, new)`` review states into per-user counter deltas (see ``rating_deltas``)."""
+    deltas = defaultdict(lambda: defaultdict(int))
+
+    for old, new in changes:
+        if old == new:
+            continue
+        for state, sign in ((old, -1), (new, 1)):
+            if state is None or state[1] is None or state[2] is None:
+                continue
+            _, stars, user_id = state
+            deltas[user_id]['review_count'] += sign
+            deltas[user_id]['stars_given_total'] += sign * stars
+
+    return {
+        user_id: {field: value for field, value in delta.items() if value}
+        for user_id, delta in deltas.items()
+        if any(delta.values())
+    }
+
+
+def last_active(events):
+    """Latest write per user in a batch of review events."""
+    latest = {}
+    for event in events:
+        user_id = event.new_user_id or event.old_user_id
+        if user_id is not None and (user_id not in latest or event.created_at > latest[user_id]):
+            latest[user_id] = event.created_at
+    return latest
+
+
+def apply_activity(deltas, active):
+    """One ``UPDATE`` per user for the counter deltas and the newest activity time."""
+    from users.models import CustomUser
+
+    for user_id in deltas.keys() | active.keys():
+        delta = deltas.get(user_id, {})
+        updates = {field: F(field) + value for field, value in delta.items()}
+        if delta:
+            updates['average_stars_given'] = running_average(
+                F('stars_given_total') + delta.get('stars_given_total', 0),
+                F('review_count') + delta.get('review_count', 0),
+            )
+        if user_id in active:
+            seen = Value(active[user_id])
+            updates['last_active_at'] = Greatest(Coalesce('last_active_at', seen), seen)
+        CustomUser.objects.filter(pk=user_id).update(**updates)
+    # Profile pages show these counters from the cached request.user.
+    forget_users(deltas.keys() | active.keys())
+
+
+def compute_activity(user_ids):
+    """Exact activity counters for ``user_ids``, aggregated from BookReview."""
+    from books.models import BookReview
+
+    rows = BookReview.objects.filter(user_id__in=user_ids).values('user_id').annotate(
+        review_count=Count('id'),
+        stars_given_total=Sum('stars_given'),
+        last_active_at=Max('updated_at'),
+    ).order_by()
+
+    activity = {
+        user_id: {'review_count': 0, 'stars_given_total': 0, 'average_stars_given': 0.0, 'last_active_at': None}
+        for user_id in user_ids
+    }
+    for row in rows:
+        user_id = row.pop('user_id')
+        row['average_stars_given'] = row['stars_given_total'] / row['review_count']
+        activity[user_id] = row
+
+    return activity
@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class UsersConfig(AppConfig):
@@ -7,3 +8,6 @@ class UsersConfig(AppConfig):
 
     def ready(self):
         import users.signals
+        from goodreads.auth import check_shared_caches
+
+        checks.register(check_shared_caches, checks.Tags.caches)
@@ -0,0 +1,34 @@
+from goodreads.auth import forget_users
+from goodreads.counters import RebuildCountersCommand
+from users.activity import ACTIVITY_COUNTERS, compute_activity
+from users.models import CustomUser
+
+
+class Command(RebuildCountersCommand):
+    help = "Recompute the per-user review counters on CustomUser from BookReview, or verify them."
+    label = 'User'
+    plural = 'users'
+    event_fields = ('old_user_id', 'new_user_id')
+
+    def queryset(self):
+        return CustomUser.objects.only('id', *ACTIVITY_COUNTERS, 'last_active_at')
+
+    def compute(self, pks):
+        return compute_activity(pks)
+
+    def stored(self, user):
+        return {field: getattr(user, field) for field in ACTIVITY_COUNTERS}
+
+    def drifted(self, user, expected):
+        return any(abs(getattr(user, field) - expected[field]) > 1e-9 for field in ACTIVITY_COUNTERS)
+
+    def refresh(self, user, expected):
+        for field in ACTIVITY_COUNTERS:
+            setattr(user, field, expected[field])
+        # Activity can only move forward; deleted reviews don't roll it back.
+        if user.last_active_at is None:
+            user.last_active_at = expected['last_active_at']
+
+    def save(self, stale):
+        CustomUser.objects.bulk_update(stale, [*ACTIVITY_COUNTERS, 'last_active_at'])
+        forget_users([user.pk for user in stale])
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.1 on 2026-10-18 20:55
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Sum
+
+
+def populate_activity(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    BookReview = apps.get_model('books', 'BookReview')
+    last_pk = 0
+
+    while True:
+        batch = list(CustomUser.objects.filter(pk__gt=last_pk).order_by('pk').only('pk')[:2000])
+        if not batch:
+            break
+        last_pk = batch[-1].pk
+
+        rows = BookReview.objects.filter(user_id__in=[user.pk for user in batch]).values('user_id').annotate(
+            count=Count('id'), total=Sum('stars_given'), last=Max('updated_at'),
+        ).order_by()
+        activity = {row['user_id']: row for row in rows}
+
+        for user in batch:
+            row = activity.get(user.pk)
+            if row:
+                user.review_count = row['count']
+                user.stars_given_total = row['total']
+                user.average_stars_given = row['total'] / row['count']
+                user.last_active_at = row['last']
+        CustomUser.objects.bulk_update(
+            [user for user in batch if user.pk in activity],
+            ['review_count', 'stars_given_total', 'average_stars_given', 'last_active_at'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_customuser_profile_picture_variants'),
+        ('books', '0010_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='average_stars_given',
+            field=models.FloatField(default=0.0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='last_active_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='stars_given_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_activity, migrations.RunPython.noop),
+    ]
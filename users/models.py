@@ -4,3 +4,12 @@ from django.contrib.auth.models import AbstractUser
 
 class CustomUser(AbstractUser):
     profile_picture = models.ImageField(default='default.jpg')
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
+
+    # Reading activity, maintained by the review event consumer (users.activity).
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    stars_given_total = models.PositiveIntegerField(default=0, editable=False)
+    average_stars_given = models.FloatField(default=0.0, editable=False)
+    last_active_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Maintained by the Follow signals (books.signals); decides fan-out in books.feeds.
+    follower_count = models.PositiveIntegerField(default=0, editable=False)
@@ -1,17 +1,35 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from django.core.mail import send_mail
 
 from users.models import CustomUser
-from users.tasks import send_email
+from goodreads.auth import forget_users
+from goodreads.images import needs_variants
+from users.tasks import generate_profile_picture_variants, send_email
 
 
 @receiver(post_save, sender=CustomUser)
 def send_welcome_email(sender, instance, created, **kwargs):
     if created:
-        send_email.delay(
-            "Welcome to Goodreads Clone.",
-            f"Hi, {instance.username}. Welcome to Goodreads Clone. Enjoy the books and reviews.",
-            "azimjonovsayitkamol@gmail.com",
-            [instance.email],
-        )
\ No newline at end of file
+        subject = "Welcome to Goodreads Clone."
+        message = f"Hi, {instance.username}. Welcome to Goodreads Clone. Enjoy the books and reviews."
+        recipients = [instance.email]
+        # Queue only once the user row is committed, and never from inside the request.
+        transaction.on_commit(lambda: send_email.delay(subject, message, recipients))
+
+
+@receiver(post_save, sender=CustomUser)
+def schedule_profile_picture_variants(sender, instance, update_fields=None, **kwargs):
+    if update_fields and 'profile_picture' not in update_fields:
+        return
+    if {'profile_picture', 'profile_picture_variants'} & instance.get_deferred_fields():
+        return
+    if needs_variants(instance.profile_picture, instance.profile_picture_variants):
+        transaction.on_commit(lambda: generate_profile_picture_variants.delay(instance.pk))
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def forget_cached_user(sender, instance, **kwargs):
+    # Covers profile edits, password changes (which end other sessions) and deactivation.
+    forget_users([instance.pk])
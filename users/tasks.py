@@ -1,6 +1,10 @@
 from django.core.mail import send_mail
+from django.core.management import call_command
 
+from goodreads.auth import forget_users
 from goodreads.celery import app
+from goodreads.images import build_variants, needs_variants
+from users.models import CustomUser
 
 
 @app.task()
@@ -10,4 +14,28 @@ def send_email(subject, message, recipient_list):
         message,
         "sayitkamol@gmail.com",
         recipient_list
-    )
\ No newline at end of file
+    )
+
+
+@app.task()
+def generate_profile_picture_variants(user_id):
+    user = CustomUser.objects.only('id', 'profile_picture', 'profile_picture_variants').filter(pk=user_id).first()
+    if user is None or not needs_variants(user.profile_picture, user.profile_picture_variants):
+        return
+
+    variants = build_variants(user.profile_picture, 'avatar')
+    if variants is not None:
+        CustomUser.objects.filter(pk=user_id, profile_picture=user.profile_picture.name).update(
+            profile_picture_variants=variants,
+        )
+        forget_users([user_id])
+
+        from books.signals import reviewed_books_changed
+
+        reviewed_books_changed(user_id)
+
+
+@app.task(acks_late=True)
+def clear_expired_sessions():
+    # A no-op for the cache and signed cookie engines, which expire on their own.
+    call_command('clearsessions')
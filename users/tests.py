@@ -1,8 +1,16 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest import mock
+
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user
+from django.contrib.sessions.models import Session
+from django.utils import timezone
 from django.urls import reverse, reverse_lazy
 
+from goodreads.auth import check_shared_caches
+from goodreads.testing import shared_cache
 from users.models import CustomUser
+from users.tasks import clear_expired_sessions
 
 
 class RegistrationTestCase(TestCase):
@@ -26,6 +34,18 @@ class RegistrationTestCase(TestCase):
         self.assertNotEqual(user.password, 'qiyinparol')
         self.assertTrue(user.check_password('qiyinparol'))
 
+    @mock.patch('users.signals.generate_profile_picture_variants.delay')
+    @mock.patch('users.signals.send_email.delay')
+    def test_welcome_email_is_queued_on_commit(self, delay, generate_variants):
+        with self.captureOnCommitCallbacks(execute=True):
+            CustomUser.objects.create(username='sayitkamol', email='sayitkamol@gmail.com')
+
+        delay.assert_called_once_with(
+            "Welcome to Goodreads Clone.",
+            "Hi, sayitkamol. Welcome to Goodreads Clone. Enjoy the books and reviews.",
+            ['sayitkamol@gmail.com'],
+        )
+
     def test_required_fields(self):
         response = self.client.post(
             reverse('users:register'),
@@ -196,3 +216,59 @@ class ProfileTestCase(TestCase):
         self.assertEqual(user1.email, 'jasurismoil@gmail.com')
         self.assertEqual(response.url, reverse("users:profile"))
 
+
+@shared_cache()
+class SessionUserCacheTestCase(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create(username='sayitkamol', first_name='sayitkamol')
+        self.client.force_login(self.user)
+
+    def test_user_and_session_are_cached(self):
+        self.client.get(reverse('users:profile'))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('users:profile'))
+        self.assertContains(response, 'sayitkamol')
+
+    def test_profile_update_refreshes_cached_user(self):
+        self.client.get(reverse('users:profile'))
+        self.client.post(reverse('users:profile_edit'), data={
+            "username": "jasur", "first_name": "jasur", "last_name": "ismoilov", "email": "jasur@gmail.com",
+        })
+
+        response = self.client.get(reverse('users:profile'))
+        self.assertContains(response, '@jasur')
+
+    def test_deactivated_users_are_logged_out(self):
+        self.client.get(reverse('users:profile'))
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertFalse(get_user(self.client).is_authenticated)
+
+    def test_expired_sessions_are_purged(self):
+        Session.objects.create(
+            session_key='expired', session_data='', expire_date=timezone.now() - timedelta(days=1),
+        )
+
+        clear_expired_sessions.delay()
+
+        self.assertFalse(Session.objects.filter(session_key='expired').exists())
+        self.assertTrue(Session.objects.exists())
+
+
+class SharedCacheCheckTestCase(TestCase):
+    def test_defaults_pass(self):
+        self.assertEqual(check_shared_caches(None), [])
+
+    @shared_cache()
+    def test_per_process_caches_fail(self):
+        self.assertEqual(
+            [error.id for error in check_shared_caches(None)],
+            ['goodreads.E001', 'goodreads.E002', 'goodreads.E003'],
+        )
+
+    @override_settings(AUTH_USER_CACHE_SECONDS=0, SESSION_ENGINE='django.contrib.sessions.backends.db')
+    def test_uncached_users_and_sessions_pass(self):
+        with override_settings(API_TOKEN_DENYLIST_CACHE='default'):
+            self.assertEqual([error.id for error in check_shared_caches(None)], ['goodreads.E003'])